@@ -4,11 +4,13 @@ Notes:
 
 '''
 from fabric.contrib.files import append, exists, sed
-from fabric.api import env, local, run, put
+from fabric.api import env, local, run, put, sudo
 from pathlib import Path
 from django.utils.crypto import get_random_string
 
 REPO_URL = 'git@github.com:holden-nelson/retailtimecard.git'
+# systemd units made from deploy_tools/<name>-systemd.template.service
+SERVICES = ('gunicorn', 'task-workers', 'sync-alerts')
 
 def deploy():
     site_folder = f'/home/{env.user}/sites/{env.host}'
@@ -22,6 +24,7 @@ def deploy():
     _install_requirements(source_folder)
     _collect_static(source_folder)
     _run_migrations(source_folder)
+    _install_services(source_folder, env.host)
 
 def _create_directory_structure_if_necessary(site_folder):
     for subfolder in ('database', 'static', 'source'):
@@ -77,3 +80,12 @@ def _collect_static(source_folder):
 def _run_migrations(source_folder):
     run(f'cd {source_folder} && python manage.py migrate --noinput')
 
+def _install_services(source_folder, site_name):
+    for service in SERVICES:
+        template = f'{source_folder}/deploy_tools/{service}-systemd.template.service'
+        unit = f'/etc/systemd/system/{service}-{site_name}.service'
+        sudo(f'sed "s/SITENAME/{site_name}/g" {template} > {unit}')
+    sudo('systemctl daemon-reload')
+    for service in SERVICES:
+        sudo(f'systemctl enable {service}-{site_name}')
+        sudo(f'systemctl restart {service}-{site_name}')
@@ -3,4 +3,7 @@ from timecardsite.models import *
 
 # Register your models here.
 admin.site.register(Account)
-admin.site.register(Profile)
\ No newline at end of file
+admin.site.register(Profile)
+admin.site.register(Membership)
+admin.site.register(Alert)
+admin.site.register(Task)
@@ -0,0 +1,128 @@
+'''
+Admission control for views that call Lightspeed.
+
+AdmissionMiddleware counts the Lightspeed bound requests each process is
+running, overall and per account. The count is kept in memory, so
+admitting a request costs nothing on the database. Past ADMISSION_MAX_INFLIGHT or
+ADMISSION_ACCOUNT_MAX_INFLIGHT a request isn't queued behind the others.
+It runs in cache only mode instead: cached periods are served however old
+they are, and anything that would have to call Lightspeed raises
+LightspeedBusy, which the middleware turns into a 503 with Retry-After.
+'''
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# whether this request is over the limits and may only use cached data
+_cache_only = ContextVar('cache_only', default=False)
+
+HTML = 'html'
+JSON = 'json'
+
+
+class LightspeedBusy(Exception):
+    pass
+
+
+def lightspeed_bound(json=False):
+    '''
+    marks a view as one that may call Lightspeed, for AdmissionMiddleware
+    :param json: answer with JSON instead of the busy page when shedding
+    '''
+    def decorator(view):
+        view.lightspeed_bound = JSON if json else HTML
+        return view
+    return decorator
+
+
+def cache_only():
+    return _cache_only.get()
+
+
+def check_outbound():
+    '''
+    raises LightspeedBusy if this request isn't allowed to call Lightspeed
+    '''
+    if _cache_only.get():
+        raise LightspeedBusy('Over the admission limits.')
+
+
+def run_cache_only(view, *args, **kwargs):
+    token = _cache_only.set(True)
+    try:
+        return view(*args, **kwargs)
+    finally:
+        _cache_only.reset(token)
+
+
+class AdmissionController():
+    def __init__(self, max_inflight, account_max_inflight):
+        '''
+        limits of 0 turn that check off
+        '''
+        self.max_inflight = max_inflight
+        self.account_max_inflight = account_max_inflight
+
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._accounts = dict()
+        self._counts = {
+            'admitted': 0,
+            'over_worker_limit': 0,
+            'over_account_limit': 0,
+            'served_from_cache': 0,
+            'shed': 0
+        }
+
+    def admit(self, account_id):
+        '''
+        counts a request in, if there's room
+        :return: a ticket to release it with, or None if it wasn't admitted
+        '''
+        with self._lock:
+            account_inflight = self._accounts.get(account_id, 0)
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                self._counts['over_worker_limit'] += 1
+                return None
+            if self.account_max_inflight and account_inflight >= self.account_max_inflight:
+                self._counts['over_account_limit'] += 1
+                return None
+
+            self._inflight += 1
+            self._accounts[account_id] = account_inflight + 1
+            self._counts['admitted'] += 1
+            return account_id
+
+    def release(self, ticket):
+        with self._lock:
+            self._inflight -= 1
+            self._accounts[ticket] -= 1
+            if not self._accounts[ticket]:
+                del self._accounts[ticket]
+
+    def count(self, outcome):
+        '''
+        records what happened to a request that wasn't admitted
+        :param outcome: 'served_from_cache' or 'shed'
+        '''
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, inflight=self._inflight,
+                        accounts_inflight=dict(self._accounts))
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(settings.ADMISSION_MAX_INFLIGHT,
+                                              settings.ADMISSION_ACCOUNT_MAX_INFLIGHT)
+        return _controller
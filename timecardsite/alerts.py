@@ -0,0 +1,292 @@
+'''
+Shift alerts.
+
+Every sync hands the AlertEngine only the shifts that are new or were
+open last time. Each one is checked against the rules using compact
+per-employee state (hours so far this workweek, shops worked at), and
+then folded into that state, so history is never rescanned. Alerts are
+stored and later emailed to each account's managers in one digest.
+
+Every sync_alerts process sends digests after its round. Each one first
+claims the unsent alerts with a conditional UPDATE and only sends those
+it claimed, so an alert goes out once however many are running.
+'''
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone as django_timezone
+
+from timecardsite import localtime, overtime, services, slots
+from timecardsite.models import Alert, EmployeeAlertState, Membership, OpenShift, Profile
+
+LONG_SHIFT_HOURS = 10
+# warn this many hours before weekly overtime starts
+OVERTIME_WARNING_HOURS = 4
+# shifts an employee needs before a new shop counts as unusual
+USUAL_SHOPS_MIN_SHIFTS = 10
+# how long after closing an open shift is reported
+CLOSING_GRACE_MINUTES = 30
+# a sender that dies after claiming alerts holds them for this long
+DIGEST_CLAIM_SECONDS = 300
+
+
+class LongShiftRule():
+    kind = 'long'
+
+    def __call__(self, engine, shift, state):
+        if shift.is_open and shift.seconds > LONG_SHIFT_HOURS * 3600:
+            return (f'long:{shift.shift_id}',
+                    f'{shift.name} has been clocked in at {shift.shop} '
+                    f'for {shift.shift_time:.1f} hours')
+
+
+class WeeklyOvertimeRule():
+    kind = 'overtime'
+
+    def __call__(self, engine, shift, state):
+        # the rolling total is only for the latest workweek. a shift that
+        # turns up late from an earlier one doesn't count against it
+        week = engine.week_of(shift)
+        if week != state.week:
+            return None
+
+        limit = engine.calculator.weekly_limit
+        worked = state.week_seconds + shift.seconds
+        if worked >= limit - OVERTIME_WARNING_HOURS * 3600:
+            return (f'overtime:{shift.employee_id}:{week}',
+                    f'{shift.name} has worked {worked / 3600:.1f} hours this week '
+                    f'and is approaching overtime')
+
+
+class UnusualShopRule():
+    kind = 'shop'
+
+    def __call__(self, engine, shift, state):
+        if (engine.is_new(shift) and state.shift_count >= USUAL_SHOPS_MIN_SHIFTS
+                and shift.shop_id not in state.shop_ids):
+            return (f'shop:{shift.shift_id}',
+                    f'{shift.name} clocked in at {shift.shop}, '
+                    f'where they don\'t usually work')
+
+
+class NoClockOutRule():
+    kind = 'close'
+
+    def __call__(self, engine, shift, state):
+        closing = engine.account.closing_time
+        if not shift.is_open or closing is None:
+            return None
+
+        day = engine.clock.local_day(shift.check_in_ts)
+        closes = (engine.clock.day_start(day) +
+                  closing.hour * 3600 + closing.minute * 60)
+        if closes < shift.check_in_ts:
+            # clocked in after closing, so it's the next day's close
+            closes += 86400
+
+        if engine.now > closes + CLOSING_GRACE_MINUTES * 60:
+            return (f'close:{shift.shift_id}',
+                    f'{shift.name} is still clocked in at {shift.shop} '
+                    f'after closing')
+
+
+RULES = [LongShiftRule(), WeeklyOvertimeRule(), UnusualShopRule(), NoClockOutRule()]
+
+
+class AlertEngine():
+    '''
+    applies the rules to one account's new and changed shifts
+    '''
+    def __init__(self, account, rules=RULES, now=None):
+        self.account = account
+        self.rules = rules
+        self.now = now if now is not None else int(time.time())
+
+        # the UTC date only sets the clock's range, which is padded either
+        # side. the account's own day comes from the clock
+        utc_today = datetime.fromtimestamp(self.now, timezone.utc).date()
+        self.clock = localtime.for_account(account, utc_today - timedelta(weeks=2),
+                                           utc_today + timedelta(days=1))
+        self.calculator = overtime.for_account(account, self.clock)
+        self.today = self.clock.local_day(self.now)
+
+        self.last_seen_id = account.last_employee_hours_id
+        self.states = {state.employee_id: state for state in
+                       EmployeeAlertState.objects.filter(account=account)}
+        self.open_ids = set(OpenShift.objects.filter(account=account)
+                            .values_list('employee_hours_id', flat=True))
+        self.still_open = dict()
+        self.seen_ids = set()
+        self.changed_states = set()
+        self.alerts = []
+
+    def is_new(self, shift):
+        return shift.shift_id > self.last_seen_id
+
+    def week_of(self, shift):
+        '''
+        the workweek of the local day the shift started on
+        '''
+        return self.calculator.week_of(self.clock.local_day(shift.check_in_ts))
+
+    def _state(self, employee_id):
+        employee_id = str(employee_id)
+        if employee_id not in self.states:
+            self.states[employee_id] = EmployeeAlertState(
+                account=self.account, employee_id=employee_id)
+        return self.states[employee_id]
+
+    def ingest(self, shift):
+        '''
+        checks a new or changed shift against the rules, then updates the
+        employee's rolling state with it
+        '''
+        self.seen_ids.add(shift.shift_id)
+        state = self._state(shift.employee_id)
+        self.changed_states.add(state.employee_id)
+
+        week = self.week_of(shift)
+        if week > state.week:
+            state.week = week
+            state.week_seconds = 0
+
+        for rule in self.rules:
+            found = rule(self, shift, state)
+            if found:
+                key, message = found
+                self.alerts.append(Alert(account=self.account, employee_id=str(shift.employee_id),
+                                         kind=rule.kind, key=key, message=message[:255]))
+
+        if self.is_new(shift):
+            state.shift_count += 1
+            if shift.shop_id not in state.shop_ids:
+                state.shops = ','.join(str(shop) for shop in sorted(state.shop_ids | {shift.shop_id}))
+
+        if shift.is_open:
+            self.still_open[shift.shift_id] = str(shift.employee_id)
+        elif week == state.week:
+            state.week_seconds += shift.seconds
+
+    def save(self, guard=None):
+        '''
+        stores alerts, rolling state, open shifts and the new cursor, all
+        or nothing
+        :param guard: called first in the transaction. if it raises,
+                      nothing is saved
+        '''
+        with transaction.atomic():
+            if guard is not None:
+                guard()
+            return self._save()
+
+    def _save(self):
+        existing = set(Alert.objects.filter(
+            account=self.account, key__in=[alert.key for alert in self.alerts]
+        ).values_list('key', flat=True))
+        new_alerts = dict()
+        for alert in self.alerts:
+            if alert.key not in existing:
+                new_alerts.setdefault(alert.key, alert)
+        Alert.objects.bulk_create(new_alerts.values())
+
+        for employee_id in self.changed_states:
+            self.states[employee_id].save()
+
+        # open shifts that closed, or vanished from Lightspeed entirely
+        OpenShift.objects.filter(account=self.account).exclude(
+            employee_hours_id__in=list(self.still_open)).delete()
+        OpenShift.objects.bulk_create([
+            OpenShift(account=self.account, employee_hours_id=shift_id, employee_id=employee_id)
+            for shift_id, employee_id in self.still_open.items()
+            if shift_id not in self.open_ids
+        ])
+
+        if self.seen_ids and max(self.seen_ids) > self.account.last_employee_hours_id:
+            self.account.last_employee_hours_id = max(self.seen_ids)
+            self.account.save(update_fields=['last_employee_hours_id'])
+
+        return list(new_alerts.values())
+
+
+def sync_account(account, now=None, guard=None):
+    '''
+    pulls an account's new and changed shifts and runs them through the rules
+    :param guard: see AlertEngine.save
+    :return: list of new Alerts
+    '''
+    engine = AlertEngine(account, now=now)
+
+    # first sync starts at the beginning of the current workweek
+    since = None
+    if not account.last_employee_hours_id:
+        week_start = engine.calculator.anchor + engine.calculator.week_of(engine.today) * 7
+        since = datetime.fromtimestamp(engine.clock.day_start(week_start), timezone.utc)
+
+    for shift in services.get_shift_changes(account, engine.open_ids, since=since):
+        engine.ingest(shift)
+
+    return engine.save(guard=guard)
+
+
+def _manager_emails(account):
+    '''
+    managers through their profile, then owners who manage the account
+    through a Membership, each once
+    '''
+    emails = list(Profile.objects.filter(account=account, role='mgr')
+                  .values_list('user__email', flat=True))
+    emails += Membership.objects.filter(account=account, role='mgr').values_list(
+        'user__email', flat=True)
+    return list(dict.fromkeys(emails))
+
+
+def send_digests():
+    '''
+    emails each account's managers one message with all unsent alerts
+    that nobody else is sending
+    :return: number of alerts sent
+    '''
+    owner = slots.new_owner()
+    now = django_timezone.now()
+    Alert.objects.filter(Q(claimed_by='') | Q(claim_expires__lt=now), sent__isnull=True).update(
+        claimed_by=owner, claim_expires=now + timedelta(seconds=DIGEST_CLAIM_SECONDS))
+
+    try:
+        return _send_claimed(owner)
+    finally:
+        # alerts that weren't sent, say for want of a manager, go back
+        Alert.objects.filter(claimed_by=owner, sent__isnull=True).update(
+            claimed_by='', claim_expires=None)
+
+
+def _send_claimed(owner):
+    alerts = list(Alert.objects.filter(claimed_by=owner, sent__isnull=True)
+                  .select_related('account').order_by('account_id', 'created'))
+
+    messages = []
+    sent = []
+    for account, account_alerts in groupby(alerts, key=lambda alert: alert.account):
+        account_alerts = list(account_alerts)
+        recipients = _manager_emails(account)
+        if not recipients:
+            continue
+
+        subject = f'ShiftAlert: {len(account_alerts)} alert{"s" if len(account_alerts) > 1 else ""} for {account.name}'
+        body = render_to_string('alerts/email_digest.txt', {
+            'account': account,
+            'alerts': account_alerts
+        })
+        messages.append((subject, body, None, recipients))
+        sent.extend(alert.pk for alert in account_alerts)
+
+    # one connection for every digest
+    send_mass_mail(messages, fail_silently=False)
+    Alert.objects.filter(pk__in=sent, claimed_by=owner).update(
+        sent=django_timezone.now(), claimed_by='', claim_expires=None)
+
+    return len(sent)
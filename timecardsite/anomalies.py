@@ -0,0 +1,99 @@
+'''
+Punch anomalies: overlapping, duplicate, forgotten and overly long shifts.
+
+Shifts are indexed per employee in check in order. One sweep over each
+employee's sorted shifts then finds every overlap by remembering the shift
+that reaches furthest so far, which keeps the whole report O(n log n).
+'''
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from timecardsite.shifts import Shift
+
+# punches this close together at both ends are treated as the same punch
+DUPLICATE_SECONDS = 60
+# closed shifts longer than this are flagged
+LONG_SHIFT_HOURS = 12
+# open shifts older than this probably missed their clock out
+OPEN_SHIFT_HOURS = 16
+
+DUPLICATE = 'duplicate'
+OVERLAP = 'overlap'
+OPEN = 'open'
+LONG = 'long'
+
+LABELS = {
+    DUPLICATE: 'Duplicate punch',
+    OVERLAP: 'Overlapping shifts',
+    OPEN: 'Missing clock out',
+    LONG: 'Long shift',
+}
+
+
+@dataclass(frozen=True)
+class Anomaly:
+    kind: str
+    shift: Shift
+    # the shift this one collides with, for duplicates and overlaps
+    other: Optional[Shift] = None
+
+    @property
+    def label(self):
+        return LABELS[self.kind]
+
+
+class IntervalIndex():
+    '''
+    an employee's shifts sorted by check in, as (start, end, shift)
+    '''
+    def __init__(self, shifts):
+        self.intervals = sorted(
+            ((shift.check_in_ts, shift.check_in_ts + shift.seconds, shift) for shift in shifts),
+            key=lambda interval: (interval[0], interval[1])
+        )
+
+    def collisions(self):
+        '''
+        yields (kind, shift, other) for each shift that starts before an
+        earlier shift has ended. `other` is whichever earlier shift runs
+        latest, so a single long shift swallowing several others is
+        reported against each of them
+        '''
+        latest = None
+        for start, end, shift in self.intervals:
+            if latest is not None and start < latest[1]:
+                if (abs(start - latest[0]) <= DUPLICATE_SECONDS and
+                        abs(end - latest[1]) <= DUPLICATE_SECONDS):
+                    yield (DUPLICATE, shift, latest[2])
+                else:
+                    yield (OVERLAP, shift, latest[2])
+
+            if latest is None or end > latest[1]:
+                latest = (start, end, shift)
+
+
+def find_anomalies(shifts, long_hours=LONG_SHIFT_HOURS, open_hours=OPEN_SHIFT_HOURS):
+    '''
+    :param shifts: Shifts for any number of employees. open shifts should
+                   already be measured up to now
+    :return: list of Anomalies, ordered by check in
+    '''
+    by_employee = defaultdict(list)
+    anomalies = []
+
+    for shift in shifts:
+        by_employee[shift.employee_id].append(shift)
+
+        if shift.is_open:
+            if shift.seconds > open_hours * 3600:
+                anomalies.append(Anomaly(OPEN, shift))
+        elif shift.seconds > long_hours * 3600:
+            anomalies.append(Anomaly(LONG, shift))
+
+    for employee_shifts in by_employee.values():
+        for kind, shift, other in IntervalIndex(employee_shifts).collisions():
+            anomalies.append(Anomaly(kind, shift, other))
+
+    anomalies.sort(key=lambda anomaly: anomaly.shift.check_in_ts)
+    return anomalies
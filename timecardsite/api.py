@@ -0,0 +1,187 @@
+'''
+Versioned JSON API for the punch log and timecard.
+
+Responses are compact: times are epoch seconds, each shift is an array in
+the order given by `fields`, and shops and employees are sent once, as ID
+to name maps, on the first page. Pages are whole local days, most recent
+first, and `next` is an opaque cursor for the page after. The first page
+also carries totals for the whole range. Every page is cut from the same
+cached whole-range period, so only the first one calls Lightspeed.
+
+A range that doesn't validate gets a 400 with the form errors. When
+Lightspeed is too slow to send the whole range in time, `partial` says how
+many of its shifts were fetched out of how many; asking again carries on.
+'''
+from datetime import date, timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core import signing
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+
+from timecardsite import services
+from timecardsite.admission import lightspeed_bound
+from timecardsite.deadline import Deadline
+from timecardsite.forms import read_range
+
+PAGE_DAYS = 7
+MAX_PAGE_DAYS = 31
+SHIFT_FIELDS = ['id', 'employee', 'shop', 'check_in', 'check_out']
+CURSOR_SALT = 'timecardsite.api.cursor'
+
+
+def _error(message, status, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def api_view(manager=False):
+    '''
+    session authenticated JSON endpoint. answers 401/403 instead of
+    redirecting to the login page, and gzips the response
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated or not request.shift_account:
+                return _error('Not logged in.', 401)
+            if manager and not request.shift_account.is_manager:
+                return _error('Managers only.', 403)
+            return view(request, *args, **kwargs)
+        return lightspeed_bound(json=True)(
+            gzip_page(cache_control(private=True, no_cache=True)(wrapper)))
+    return decorator
+
+
+class RangeError(Exception):
+    def __init__(self, errors):
+        super().__init__('invalid range')
+        self.errors = errors
+
+
+def _hours(hours):
+    return round(hours, 4)
+
+
+def _encode_shift(shift):
+    return [shift.shift_id, shift.employee_id, shift.shop_id,
+            shift.check_in_ts, shift.check_out_ts]
+
+
+def _read_page(request):
+    '''
+    works out the range and the days on this page, from the cursor if
+    there is one and from the range parameters if not
+    :return: tuple of start, end, page start, page end and page length, or
+             None if the request doesn't make sense
+    :raise RangeError: if the range parameters don't validate
+    '''
+    shift_account = request.shift_account
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            state = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+        if state['account'] != shift_account.account_id:
+            return None
+
+        start = date.fromisoformat(state['start'])
+        end = date.fromisoformat(state['end'])
+        page_end = date.fromisoformat(state['next'])
+        page_days = state['days']
+    else:
+        form, range, start, end = read_range(request, shift_account.pay_period)
+        if form.errors:
+            raise RangeError(form.errors)
+        page_end = end
+        try:
+            page_days = min(max(int(request.GET.get('days', PAGE_DAYS)), 1), MAX_PAGE_DAYS)
+        except ValueError:
+            return None
+
+    page_start = max(start, page_end - timedelta(days=page_days - 1))
+    return (start, end, page_start, page_end, page_days)
+
+
+def _shift_log_response(request, employee_id=None, employees=None):
+    try:
+        page = _read_page(request)
+    except RangeError as e:
+        return _error('Bad range.', 400, errors=e.errors.get_json_data())
+    if page is None:
+        return _error('Bad range or cursor.', 400)
+    start, end, page_start, page_end, page_days = page
+
+    shift_account = request.shift_account
+    first_page = page_end == end
+
+    # every page asks for the whole range, which the first page fetched
+    # and cached for its totals, and keeps its own days
+    log = services.get_shift_log(
+        shift_account.account,
+        start,
+        end,
+        employee_id=employee_id,
+        totals=first_page,
+        deadline=Deadline(settings.REQUEST_DEADLINE_SECONDS)
+    )
+
+    response = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'fields': SHIFT_FIELDS,
+        'days': [
+            {'date': day.isoformat(), 'shifts': [_encode_shift(shift) for shift in shifts]}
+            for day, shifts in sorted(log['days'].items(), reverse=True)
+            if page_start <= day <= page_end
+        ],
+        'next': None,
+        'partial': log['partial']
+    }
+
+    if page_start > start:
+        response['next'] = signing.dumps({
+            'account': shift_account.account_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'next': (page_start - timedelta(days=1)).isoformat(),
+            'days': page_days
+        }, salt=CURSOR_SALT, compress=True)
+
+    if first_page:
+        response['shops'] = log['shops']
+        response['employees'] = log['employees'] if employees is None else employees
+        response['totals'] = {
+            'hours': _hours(log['total_hours']),
+            'shops': {shop: _hours(hours) for shop, hours in log['shop_totals'].items()},
+            'employees': {employee: _hours(hours)
+                          for employee, hours in log['employee_totals'].items()},
+            'overtime': {employee: {kind: _hours(hours) for kind, hours in split.items()}
+                         for employee, split in log['overtime'].items()}
+        }
+
+    return JsonResponse(response, json_dumps_params={'separators': (',', ':')})
+
+
+@api_view(manager=True)
+def punch_log(request):
+    '''
+    every employee's shifts, like the punch log page
+    '''
+    return _shift_log_response(request)
+
+
+@api_view()
+def timecard(request):
+    '''
+    the logged in employee's shifts, like the timecard page
+    '''
+    shift_account = request.shift_account
+    return _shift_log_response(
+        request,
+        employee_id=shift_account.employee_id,
+        employees={shift_account.employee_id: shift_account.name}
+    )
@@ -0,0 +1,5 @@
+def shift_account(request):
+    '''
+    makes the request's ShiftAccount available to templates
+    '''
+    return {'shift_account': getattr(request, 'shift_account', None)}
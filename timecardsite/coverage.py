@@ -0,0 +1,139 @@
+'''
+Staffing coverage: how many people were on the clock, per shop, per slot.
+
+Rather than testing every slot against every shift, each shift becomes a
+check in and a check out event. The events are sorted once and swept in
+order, carrying a running headcount across slot boundaries, so the cost
+is O(n log n) in shifts plus O(slots), however long the range.
+'''
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import time
+
+from timecardsite.localtime import SECONDS_PER_DAY, day_number
+
+# number of shades used for the heatmap, not counting empty
+HEAT_LEVELS = 4
+
+# dst is SKIPPED for a slot the clocks jumped over, when count and level
+# are None, and REPEATED for one the clocks went through twice, when
+# they're for the busier of the two. empty otherwise
+Cell = namedtuple('Cell', ['count', 'level', 'dst'])
+SKIPPED = 'skipped'
+REPEATED = 'repeated'
+
+
+def peak_headcount(intervals, boundaries):
+    '''
+    the most intervals open at once within each slot
+    :param intervals: iterable of (start, end) epoch seconds
+    :param boundaries: sorted slot start times, plus the end of the last slot
+    :return: list with one headcount per slot
+    '''
+    first = boundaries[0]
+    last = boundaries[-1]
+    num_slots = len(boundaries) - 1
+
+    events = []
+    for start, end in intervals:
+        start = max(start, first)
+        end = min(end, last)
+        if start < end:
+            events.append((start, 1))
+            events.append((end, -1))
+
+    # check outs sort before check ins at the same second, so a handoff
+    # doesn't count as two people on the clock
+    events.sort()
+
+    counts = [0] * num_slots
+    headcount = 0
+    slot = 0
+    for ts, change in events:
+        event_slot = bisect_right(boundaries, ts, lo=slot) - 1
+
+        # the running headcount holds in every slot from the last event up
+        # to this one, and in this one too unless the event is right on
+        # its boundary
+        for carried in range(slot, min(event_slot, num_slots)):
+            if headcount > counts[carried]:
+                counts[carried] = headcount
+        slot = event_slot
+        if slot < num_slots and ts > boundaries[slot] and headcount > counts[slot]:
+            counts[slot] = headcount
+
+        headcount += change
+        if slot < num_slots and headcount > counts[slot]:
+            counts[slot] = headcount
+
+    return counts
+
+
+def _align(clock, day, slot_starts, cells, slot_minutes):
+    '''
+    lines a day's cells up under the slots of a regular day, by the local
+    time each one starts at. on DST days that leaves a skipped slot or
+    puts two in the same column
+    '''
+    columns = [[] for _ in range(24 * 60 // slot_minutes)]
+    for ts, cell in zip(slot_starts, cells):
+        local_minutes = (ts + clock.offset(ts) - day * SECONDS_PER_DAY) // 60
+        columns[local_minutes // slot_minutes].append(cell)
+
+    aligned = []
+    for column in columns:
+        if not column:
+            aligned.append(Cell(None, None, SKIPPED))
+        elif len(column) == 1:
+            aligned.append(column[0])
+        else:
+            busiest = max(column, key=lambda cell: cell.count)
+            aligned.append(Cell(busiest.count, busiest.level, REPEATED))
+    return aligned
+
+
+def staffing_grid(shifts, clock, start_date, end_date, slot_minutes=60):
+    '''
+    headcount per shop, per local day, per slot of the day
+    :param shifts: Shifts, open ones already measured to now
+    :param clock: LocalClock covering start_date through end_date
+    :param slot_minutes: must divide a day evenly
+    :return: dict with the slot start times and, for each shop, a list of
+             (date, cells) rows of one Cell per slot
+    '''
+    slot_seconds = slot_minutes * 60
+
+    # slots are laid out day by day from local midnight, so a DST day has
+    # an hour's worth of slots more or less than the others. they're put
+    # back in line with the header when the rows are built
+    days = range(day_number(start_date), day_number(end_date) + 1)
+    boundaries = []
+    day_slots = []
+    for day in days:
+        day_start = clock.day_start(day)
+        next_day_start = clock.day_start(day + 1)
+        first_slot = len(boundaries)
+        boundaries.extend(range(day_start, next_day_start, slot_seconds))
+        day_slots.append((day, clock.local_date(day_start), first_slot, len(boundaries)))
+    boundaries.append(clock.day_start(days[-1] + 1))
+
+    by_shop = defaultdict(list)
+    for shift in shifts:
+        by_shop[shift.shop].append((shift.check_in_ts, shift.check_in_ts + shift.seconds))
+
+    grid = dict()
+    for shop in sorted(by_shop):
+        counts = peak_headcount(by_shop[shop], boundaries)
+
+        # shade each cell relative to the shop's busiest slot
+        peak = max(counts) or 1
+        cells = [Cell(count, -(-count * HEAT_LEVELS // peak), '') for count in counts]
+        grid[shop] = [(local_date, _align(clock, day, boundaries[first:end], cells[first:end],
+                                          slot_minutes))
+                      for day, local_date, first, end in day_slots]
+
+    return {
+        'slots': [time(minutes // 60, minutes % 60)
+                  for minutes in range(0, 24 * 60, slot_minutes)],
+        'shops': grid
+    }
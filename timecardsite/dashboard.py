@@ -0,0 +1,137 @@
+'''
+Owner dashboard across every account a user manages.
+
+Each account's current period summary is fetched on its own thread, at
+most DASHBOARD_WORKERS at a time, and the page waits for them for no more
+than DASHBOARD_ACCOUNT_TIMEOUT_SECONDS. Accounts that haven't answered by
+then are rendered as placeholders the page loads on its own afterwards,
+so one slow Lightspeed account doesn't hold up the rest. Their fetches
+carry on in the background and land in the period cache either way.
+
+The request itself is admitted under the user's own account, but each
+fetch calls Lightspeed for a different one, so each is admitted under its
+own account as well. An account already at its admission limit is only
+shown from the cache, the same as a request over the limits would be.
+'''
+import contextvars
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+
+from timecardsite import admission, services
+from timecardsite.admission import LightspeedBusy
+from timecardsite.deadline import Deadline
+from timecardsite.models import Account
+
+logger = logging.getLogger(__name__)
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+
+# summary is None unless status is READY
+AccountRow = namedtuple('AccountRow', ['account', 'status', 'summary'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_WORKERS,
+                                           thread_name_prefix='dashboard')
+        return _executor
+
+
+def accounts_for(user):
+    '''
+    onboarded accounts the user manages, through their profile or a
+    Membership, by name
+    '''
+    return list(Account.objects.filter(
+        Q(profile__user=user, profile__role='mgr') |
+        Q(membership__user=user, membership__role='mgr'),
+        is_onboarded=True
+    ).distinct().order_by('name'))
+
+
+def _summarize(account, timeout, admitted):
+    controller = admission.get_controller()
+    # a cache only request has nothing to admit, and the request's own
+    # account was admitted with it
+    skip = admission.cache_only() or account.account_id == admitted
+    ticket = None if skip else controller.admit(account.account_id)
+    try:
+        # the deadline starts when a worker picks the account up, so
+        # accounts queued behind others still get their full time
+        if skip or ticket is not None:
+            return services.get_period_summary(account, deadline=Deadline(timeout))
+
+        try:
+            result = admission.run_cache_only(services.get_period_summary, account,
+                                              deadline=Deadline(timeout))
+        except LightspeedBusy:
+            controller.count('shed')
+            raise
+        controller.count('served_from_cache')
+        return result
+    finally:
+        if ticket is not None:
+            controller.release(ticket)
+        close_old_connections()
+
+
+def collect(accounts, timeout=None, admitted=None):
+    '''
+    fetches every account's summary concurrently
+    :param timeout: seconds to wait before giving up on the stragglers.
+                    defaults to DASHBOARD_ACCOUNT_TIMEOUT_SECONDS
+    :param admitted: ID of the account the request was admitted under
+    :return: list of AccountRows, in the same order as accounts
+    '''
+    if timeout is None:
+        timeout = settings.DASHBOARD_ACCOUNT_TIMEOUT_SECONDS
+
+    executor = _get_executor()
+    # each worker runs in a copy of this request's context, so a request
+    # over the admission limits stays cache only on the workers too
+    futures = [executor.submit(contextvars.copy_context().run, _summarize, account, timeout,
+                               admitted)
+               for account in accounts]
+    wait(futures, timeout=timeout)
+
+    rows = []
+    for account, future in zip(accounts, futures):
+        if not future.done() or isinstance(future.exception(), LightspeedBusy):
+            rows.append(AccountRow(account, PENDING, None))
+        elif future.exception() is not None:
+            logger.error('Dashboard summary failed for account %s', account.account_id,
+                         exc_info=future.exception())
+            rows.append(AccountRow(account, FAILED, None))
+        else:
+            rows.append(AccountRow(account, READY, future.result()))
+    return rows
+
+
+def merge(rows):
+    '''
+    totals over the accounts that answered
+    :return: dict of closed hours, shifts and open shifts summed across
+             accounts, and how many accounts are in and still missing
+    '''
+    totals = {'total_hours': 0, 'shift_count': 0, 'open_shifts': 0}
+    for row in rows:
+        if row.status == READY:
+            for key in totals:
+                totals[key] += row.summary[key]
+
+    totals['accounts'] = sum(1 for row in rows if row.status == READY)
+    totals['missing'] = len(rows) - totals['accounts']
+    return totals
@@ -0,0 +1,40 @@
+'''
+SQLite tuning for several gunicorn workers sharing one database file.
+
+Every new connection gets the pragmas below. WAL lets report reads carry
+on while a token or session write commits, instead of waiting for it,
+and busy_timeout makes a writer that finds another one mid-commit wait
+its turn rather than fail with "database is locked". With WAL,
+synchronous=NORMAL only syncs at checkpoints, which keeps commits cheap
+without risking corruption. Connections are kept for CONN_MAX_AGE, so
+the pragmas and page cache aren't redone for every request.
+'''
+from django.conf import settings
+
+
+def pragmas():
+    '''
+    :return: the PRAGMA statements run on each new connection
+    '''
+    return [
+        f'PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}',
+        f'PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}',
+        f'PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}',
+        # negative sizes are in KiB rather than pages
+        f'PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}'
+    ]
+
+
+def tune(cursor):
+    for pragma in pragmas():
+        cursor.execute(pragma)
+
+
+def tune_connection(connection):
+    '''
+    applies the pragmas to a new Django connection, if it's SQLite
+    '''
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        tune(cursor)
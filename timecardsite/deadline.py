@@ -0,0 +1,21 @@
+'''
+Time budgets for requests.
+
+A view starts a Deadline and hands it down through the services layer,
+which checks it between Lightspeed pages and stops paginating once it
+has passed, returning what it has so far instead of running into the
+gunicorn timeout.
+'''
+import time
+
+
+class Deadline():
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0)
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
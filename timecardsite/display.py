@@ -0,0 +1,77 @@
+'''
+Display values for punch log and timecard rows.
+
+Templates used to format every cell with the `date` and `floatformat`
+filters. Rows are now formatted once here, in plain Python, from the
+Shift's epoch seconds and the account's LocalClock, so the templates only
+print strings. The output matches what the filters produced.
+'''
+from collections import namedtuple
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.formats import date_format
+from django.utils.safestring import mark_safe
+
+from timecardsite.localtime import SECONDS_PER_DAY
+
+ShiftRow = namedtuple('ShiftRow', [
+    'name', 'shop', 'date', 'check_in', 'check_out', 'hours',
+    'is_open', 'check_in_ts', 'employee_id'
+])
+
+
+def format_time(clock, ts):
+    '''
+    local time of day like the "g:i A" date format, e.g. "9:05 AM"
+    '''
+    minutes = (ts + clock.offset(ts)) % SECONDS_PER_DAY // 60
+    hour, minute = divmod(minutes, 60)
+    return f'{(hour - 1) % 12 + 1}:{minute:02} {"AM" if hour < 12 else "PM"}'
+
+
+def format_hours(seconds):
+    '''
+    hours to two places, rounding halves up like floatformat:2
+    '''
+    hundredths = (seconds * 100 + 1800) // 3600
+    return f'{hundredths // 100}.{hundredths % 100:02}'
+
+
+def shift_row(shift, clock):
+    return ShiftRow(
+        name=shift.name,
+        shop=shift.shop,
+        # like the "D M d" date format, e.g. "Tue Jun 01"
+        date=clock.local_date(shift.check_in_ts).strftime('%a %b %d'),
+        check_in=format_time(clock, shift.check_in_ts),
+        check_out='' if shift.is_open else format_time(clock, shift.check_out_ts),
+        hours='' if shift.is_open else format_hours(shift.seconds),
+        is_open=shift.is_open,
+        check_in_ts=shift.check_in_ts,
+        employee_id=shift.employee_id
+    )
+
+
+def render_rows(template_name, context):
+    '''
+    renders a row template with ROW_TEMPLATE_ENGINE, for the page
+    template to drop in as is
+    '''
+    template = get_template(template_name, using=settings.ROW_TEMPLATE_ENGINE)
+    return mark_safe(template.render(context))
+
+
+def render_day(day, shops):
+    '''
+    one day of the punch log table
+    :param shops: shop name to list of ShiftRows
+    '''
+    return render_rows('includes/punch_log_day.html', {
+        'day': date_format(day),
+        'shops': shops
+    })
+
+
+def render_timecard(rows):
+    return render_rows('includes/timecard_rows.html', {'rows': rows})
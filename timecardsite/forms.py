@@ -1,15 +1,13 @@
 from django import forms
 from timezone_field import TimeZoneFormField
 
+from timecardsite import localtime
+from timecardsite.payperiod import PAY_PERIOD_CHOICES
 from timecardsite.services import get_employee_ids_and_names
 
 class OnboardingForm(forms.Form):
-    pay_period_choices = [
-        ('biweekly', 'Bi-weekly'),
-    ]
-
     pay_periods = forms.ChoiceField(
-        choices=pay_period_choices
+        choices=PAY_PERIOD_CHOICES
     )
     reference_date = forms.DateField()
 
@@ -41,4 +39,66 @@ class RangeForm(forms.Form):
         choices=range_choices
     )
     start_date = forms.DateField(required=False)
-    end_date = forms.DateField(required=False)
\ No newline at end of file
+    end_date = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('range') == 'custom' and not self.errors:
+            start = cleaned_data.get('start_date')
+            end = cleaned_data.get('end_date')
+            if not start or not end:
+                raise forms.ValidationError('A custom range needs a start and end date.')
+            if start > end:
+                raise forms.ValidationError('The start date has to be before the end date.')
+        return cleaned_data
+
+class CoverageForm(RangeForm):
+    slot_choices = [
+        ('60', 'Hourly'),
+        ('30', '30 Minutes'),
+        ('15', '15 Minutes'),
+    ]
+
+    slot_minutes = forms.TypedChoiceField(
+        choices=slot_choices, coerce=int, required=False, empty_value=60
+    )
+
+class TrendForm(forms.Form):
+    period_choices = [
+        ('3', '3 Pay Periods'),
+        ('6', '6 Pay Periods'),
+        ('12', '12 Pay Periods'),
+    ]
+
+    periods = forms.TypedChoiceField(
+        choices=period_choices, coerce=int, required=False, empty_value=6
+    )
+
+def read_range(request, bwp, form_class=RangeForm):
+    '''
+    reads the range selection shared by the report views and the API. an
+    invalid selection falls back to the current period, with the bound
+    form carrying the errors
+    :return: tuple of the form, the range choice, start date, end date
+    '''
+    today = localtime.today(request.shift_account.timezone)
+    if any(field in request.GET for field in form_class.base_fields):
+        form = form_class(request.GET)
+        if form.is_valid():
+            range = form.cleaned_data['range']
+
+            if range == 'current':
+                (start, end) = bwp.current(today)
+            elif range == 'previous':
+                (start, end) = bwp.previous(today)
+            else:
+                start = form.cleaned_data['start_date']
+                end = form.cleaned_data['end_date']
+
+            return (form, range, start, end)
+    else:
+        form = form_class()
+
+    # do current by default
+    (start, end) = bwp.current(today)
+    return (form, 'current', start, end)
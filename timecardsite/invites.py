@@ -0,0 +1,33 @@
+'''
+Invite emails, sent from the task queue instead of the request.
+'''
+from urllib.parse import urljoin
+
+from invitations.utils import get_invitation_model
+
+from timecardsite.tasks import task
+
+
+class _SiteRoot():
+    '''
+    stands in for the request Invitation.send_invitation wants, which it
+    only uses to turn the accept link into an absolute URL
+    '''
+    def __init__(self, root_url):
+        self.root_url = root_url
+
+    def build_absolute_uri(self, location):
+        return urljoin(self.root_url, location)
+
+
+@task()
+def send_invite(invite_id, root_url):
+    '''
+    :param root_url: the site's absolute URL, from the request that invited
+    '''
+    invite = get_invitation_model().objects.get(pk=invite_id)
+    # a retry after the email went out but before the task was marked done
+    if invite.sent:
+        return
+    invite.send_invitation(_SiteRoot(root_url))
+
@@ -0,0 +1,187 @@
+'''
+Who is on the clock right now.
+
+Each process keeps one LiveBoard per account holding that account's open
+shifts. A board refreshes from Lightspeed at most once every
+LIVE_REFRESH_SECONDS, however many dashboards are polling it, and only
+asks for shifts newer than the last one it saw plus the ones it already
+knows are open. Every shift opening or closing is numbered, so a client
+that sends back the cursor from its last poll gets just the changes.
+'''
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from timecardsite import services
+
+# how far back the first refresh looks for shifts that are still open
+LIVE_WINDOW_HOURS = 24
+# changes kept for delta polls. older cursors get the full board again
+CHANGE_LOG_SIZE = 500
+
+OPENED = 'open'
+CLOSED = 'close'
+
+
+def _shift_json(shift):
+    return {
+        'id': shift.shift_id,
+        'employee': shift.name,
+        'shop': shift.shop,
+        'check_in': shift.check_in_ts
+    }
+
+
+class LiveBoard():
+    '''
+    one account's open shifts and the numbered changes to them
+    '''
+    def __init__(self, account_id):
+        self.account_id = account_id
+        # cursors from another process, or from before a restart, don't
+        # line up with this board's numbering, so they carry its generation
+        self.generation = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.open = dict()
+        self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self.last_seen_id = 0
+        self.refreshed = None
+        # guards the board's state. refresh_lock is held across fetches
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    @property
+    def cursor(self):
+        return f'{self.generation}:{self.version}'
+
+    def _record(self, kind, shift):
+        self.version += 1
+        self.changes.append((self.version, kind, shift))
+
+    def apply(self, shifts):
+        '''
+        folds new and rechecked shifts into the board. called with the lock held
+        :param shifts: list of every shift newer than last_seen_id, and the
+                       current state of every shift on the board
+        '''
+        last_seen_id = self.last_seen_id
+        still_open = dict()
+        for shift in shifts:
+            last_seen_id = max(last_seen_id, shift.shift_id)
+            if shift.is_open:
+                still_open[shift.shift_id] = shift
+
+        for shift_id, shift in self.open.items():
+            if shift_id not in still_open:
+                self._record(CLOSED, shift)
+        for shift_id, shift in still_open.items():
+            if shift_id not in self.open:
+                self._record(OPENED, shift)
+
+        self.open = still_open
+        self.last_seen_id = last_seen_id
+
+    def refresh(self, account, now=None):
+        '''
+        pulls changes from Lightspeed unless the board is fresh enough.
+        polls aren't held up while it does, and the board only changes
+        once the whole fetch has come back, so a failure partway leaves
+        it as it was
+        '''
+        now = now if now is not None else time.time()
+        # one refresh at a time. the others wait, then find the board fresh
+        with self.refresh_lock:
+            with self.lock:
+                if self.refreshed is not None and \
+                        now - self.refreshed < settings.LIVE_REFRESH_SECONDS:
+                    return
+                open_ids = list(self.open)
+                last_seen_id = self.last_seen_id
+
+            since = None
+            if not last_seen_id:
+                since = datetime.fromtimestamp(now - LIVE_WINDOW_HOURS * 3600, timezone.utc)
+
+            shifts = list(services.get_shift_changes(
+                account, open_ids, since=since, after_id=last_seen_id))
+
+            with self.lock:
+                self.apply(shifts)
+                self.refreshed = now
+
+    def snapshot(self):
+        '''
+        :return: the open shifts grouped by shop
+        '''
+        shops = dict()
+        for shift in sorted(self.open.values(), key=lambda shift: shift.check_in_ts):
+            shops.setdefault(shift.shop, []).append(_shift_json(shift))
+        return shops
+
+    def changes_since(self, cursor):
+        '''
+        :param cursor: a cursor this board handed out earlier
+        :return: list of changes, or None if the cursor can't be served
+                 and the client needs the full board
+        '''
+        try:
+            generation, version = cursor.split(':')
+            version = int(version)
+        except (AttributeError, ValueError):
+            return None
+
+        if generation != self.generation or version > self.version:
+            return None
+        # the change right after the cursor has already dropped off the log
+        if version < self.version and self.changes[0][0] > version + 1:
+            return None
+
+        changes = []
+        for change_version, kind, shift in self.changes:
+            if change_version > version:
+                if kind == OPENED:
+                    changes.append(dict(_shift_json(shift), op=OPENED))
+                else:
+                    changes.append({'op': CLOSED, 'id': shift.shift_id})
+        return changes
+
+    def poll(self, cursor=None):
+        '''
+        what the live endpoint returns: the full board, or just the
+        changes since cursor if it's still good
+        '''
+        with self.lock:
+            response = {
+                'cursor': self.cursor,
+                'now': int(self.refreshed or time.time())
+            }
+            changes = self.changes_since(cursor) if cursor else None
+            if changes is None:
+                response['shops'] = self.snapshot()
+            else:
+                response['changes'] = changes
+            return response
+
+
+_boards = dict()
+_boards_lock = threading.Lock()
+
+
+def board_for(account):
+    '''
+    this process's LiveBoard for account, created on first use
+    '''
+    with _boards_lock:
+        if account.pk not in _boards:
+            _boards[account.pk] = LiveBoard(account.pk)
+        return _boards[account.pk]
+
+
+def on_the_clock(account, cursor=None):
+    board = board_for(account)
+    board.refresh(account)
+    return board.poll(cursor)
@@ -0,0 +1,162 @@
+'''
+Fast local day lookups for an account's timezone.
+
+Converting every shift with astimezone() is the slow part of building a
+punch log. A LocalClock instead precomputes the handful of UTC offset
+transitions that fall inside the requested range, after which mapping an
+epoch timestamp to a local day (or pay period) is a bisect and some
+integer arithmetic.
+'''
+import time
+from bisect import bisect_right
+from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    import zoneinfo
+except ImportError: # python < 3.9
+    from backports import zoneinfo
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# how far past each end of the range the transition table reaches.
+# shifts are fetched by check in, so check outs can run a little past the end
+PADDING_DAYS = 3
+
+
+def day_number(given_date):
+    '''
+    days since 1970-01-01 for a date
+    '''
+    return given_date.toordinal() - EPOCH_ORDINAL
+
+
+class LocalClock():
+    '''
+    UTC offsets for one timezone over a fixed range of days.
+
+    `transitions` holds the epoch seconds at which each entry of `offsets`
+    takes effect, so the offset for any timestamp in range is found with
+    one bisect. timestamps outside the range fall back to asking the
+    timezone directly, which is correct, just slower.
+    '''
+    def __init__(self, tz_name, first_day, last_day):
+        self.tz = zoneinfo.ZoneInfo(tz_name)
+        self.low = (first_day - PADDING_DAYS) * SECONDS_PER_DAY
+        self.high = (last_day + PADDING_DAYS + 1) * SECONDS_PER_DAY
+
+        self.transitions = [self.low]
+        self.offsets = [self._utcoffset(self.low)]
+
+        # offsets only change a couple of times a year, so sampling once a
+        # day finds every change. each one is then narrowed to the second
+        previous = self.low
+        for sample in range(self.low + SECONDS_PER_DAY, self.high + 1, SECONDS_PER_DAY):
+            offset = self._utcoffset(sample)
+            if offset != self.offsets[-1]:
+                self.transitions.append(self._find_transition(previous, sample))
+                self.offsets.append(offset)
+            previous = sample
+
+        self._dates = dict()
+
+    def _utcoffset(self, ts):
+        return int(datetime.fromtimestamp(ts, self.tz).utcoffset().total_seconds())
+
+    def _find_transition(self, before, after):
+        # first second at which the offset is no longer what it was at `before`
+        old_offset = self._utcoffset(before)
+        while after - before > 1:
+            middle = (before + after) // 2
+            if self._utcoffset(middle) == old_offset:
+                before = middle
+            else:
+                after = middle
+        return after
+
+    def offset(self, ts):
+        '''
+        seconds east of UTC at epoch timestamp ts
+        '''
+        if ts < self.low or ts > self.high:
+            return self._utcoffset(ts)
+        return self.offsets[bisect_right(self.transitions, ts) - 1]
+
+    def local_day(self, ts):
+        '''
+        local day number (days since 1970-01-01) containing epoch timestamp ts
+        '''
+        return (ts + self.offset(ts)) // SECONDS_PER_DAY
+
+    def local_date(self, ts):
+        '''
+        local date containing epoch timestamp ts. dates are shared between
+        calls so a punch log holds one date object per day
+        '''
+        day = self.local_day(ts)
+        try:
+            return self._dates[day]
+        except KeyError:
+            return self._dates.setdefault(day, date.fromordinal(day + EPOCH_ORDINAL))
+
+    def day_start(self, day):
+        '''
+        epoch timestamp of local midnight at the start of day number `day`
+        '''
+        local_midnight = day * SECONDS_PER_DAY
+        # the offset in effect at midnight can differ from the one a few
+        # hours either side of it, so settle it with a second lookup
+        ts = local_midnight - self.offset(local_midnight)
+        return local_midnight - self.offset(ts)
+
+    def split_by_day(self, start_ts, end_ts):
+        '''
+        yields (local day number, seconds) for each local day the interval
+        [start_ts, end_ts) touches. handles shifts that run past midnight
+        and over DST changes, where a local day isn't 24 hours long
+        '''
+        day = self.local_day(start_ts)
+        while start_ts < end_ts:
+            next_midnight = self.day_start(day + 1)
+            if next_midnight <= start_ts:
+                day += 1
+                continue
+            piece_end = min(end_ts, next_midnight)
+            yield (day, piece_end - start_ts)
+            start_ts = piece_end
+            day += 1
+
+    def period_index(self, ts, reference_date, length_days):
+        '''
+        index of the fixed length pay period containing ts, counted from
+        the period starting on reference_date
+        '''
+        return (self.local_day(ts) - day_number(reference_date)) // length_days
+
+
+@lru_cache(maxsize=256)
+def _clock(tz_name, first_day, last_day):
+    return LocalClock(tz_name, first_day, last_day)
+
+
+def clock_for(tz_name, start_date, end_date):
+    '''
+    cached LocalClock covering start_date through end_date. accounts that
+    share a timezone and range share a clock
+    '''
+    return _clock(str(tz_name), day_number(start_date), day_number(end_date))
+
+
+def for_account(account, start_date, end_date):
+    return clock_for(account.timezone, start_date, end_date)
+
+
+def today(tz_name, now=None):
+    '''
+    the date it is in tz_name at epoch timestamp now (default: right now).
+    which pay period is current is always decided by this, never by the
+    server's date, so the views and prefetching agree around midnight
+    '''
+    now = now if now is not None else time.time()
+    return datetime.fromtimestamp(now, zoneinfo.ZoneInfo(str(tz_name))).date()
@@ -0,0 +1,115 @@
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.utils import timezone as django_timezone
+
+from timecardsite import display, localtime
+from timecardsite.shifts import Shift
+
+# the punch log day block as it was before rows were preformatted
+FILTERED_DAY_TEMPLATE = '''<tbody>
+    <tr class="table-primary">
+        <td colspan="4">{{ day }}</td>
+    </tr>
+    {% for shop, shifts in shops.items %}
+        <tr class="table-secondary">
+            <td colspan="4">{{ shop }}</td>
+        </tr>
+        {% for shift in shifts %}
+            <tr>
+                <td>{{ shift.name }}</td>
+                <td>{{ shift.check_in|date:"g:i A" }}</td>
+                <td>{{ shift.check_out|date:"g:i A" }}</td>
+                {% if shift.is_open %}
+                    <td class="running-hours" data-check-in="{{ shift.check_in_ts }}" data-shop="{{ shop }}" data-employee="{{ shift.name }}"></td>
+                {% else %}
+                    <td>{{ shift.shift_time|floatformat:2 }}</td>
+                {% endif %}
+            </tr>
+        {% endfor %}
+        {% if forloop.last %}
+            <tr>
+                <td colspan="4"></td>
+            </tr>
+        {% endif %}
+    {% endfor %}
+</tbody>'''
+
+TIMEZONE = 'America/Boise'
+
+
+def build_days(rows, shops=3, employees=25):
+    '''
+    :return: list of (date, {shop: [Shift]}) with rows shifts in all,
+             eight per shop per day
+    '''
+    start = datetime(2021, 6, 1, 15, tzinfo=timezone.utc)
+    days = dict()
+    for shift_id in range(rows):
+        check_in = start + timedelta(days=shift_id // (shops * 8), minutes=shift_id % 480)
+        check_in_ts = int(check_in.timestamp())
+        shift = Shift(shift_id, shift_id % employees, shift_id % shops, check_in_ts,
+                      check_in_ts + 15817, 15817,
+                      f'Ex{shift_id % employees} Employee', f'Shop {shift_id % shops}')
+        days.setdefault(check_in.date(), {}).setdefault(shift.shop, []).append(shift)
+    return list(days.items())
+
+
+class Command(BaseCommand):
+    help = 'Times rendering punch log rows with template filters, preformatted, and with Jinja2'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def _time(self, render, rows, repeat):
+        times = []
+        for attempt in range(repeat):
+            started = time.perf_counter()
+            render()
+            times.append(time.perf_counter() - started)
+        return statistics.median(times) * 1000 * 1000 / rows
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        days = build_days(rows)
+        clock = localtime.clock_for(TIMEZONE, days[0][0], days[-1][0])
+        row_days = [(day, {shop: [display.shift_row(shift, clock) for shift in shifts]
+                           for shop, shifts in shops.items()})
+                    for day, shops in days]
+
+        django_engine = engines['django']
+        filtered = django_engine.from_string(FILTERED_DAY_TEMPLATE)
+        preformatted = django_engine.get_template('includes/punch_log_day.html')
+
+        django_timezone.activate(TIMEZONE)
+
+        results = [
+            ('django, filters', lambda: [filtered.render({'day': day, 'shops': shops})
+                                         for day, shops in days]),
+            ('django, preformatted', lambda: [preformatted.render({'day': day, 'shops': shops})
+                                              for day, shops in row_days]),
+            ('formatting rows', lambda: [[display.shift_row(shift, clock) for shift in shifts]
+                                         for day, shops in days for shifts in shops.values()]),
+        ]
+
+        try:
+            from django.template.backends.jinja2 import Jinja2
+        except ImportError:
+            self.stdout.write('Jinja2 is not installed, skipping it')
+        else:
+            jinja_template = Jinja2({
+                'NAME': 'jinja2', 'DIRS': [], 'APP_DIRS': True, 'OPTIONS': {}
+            }).get_template('includes/punch_log_day.html')
+            results.append(('jinja2, preformatted',
+                            lambda: [jinja_template.render({'day': day, 'shops': shops})
+                                     for day, shops in row_days]))
+
+        self.stdout.write(f'ms per 1,000 rows, median of {repeat} renders of {rows} rows')
+        for name, render in results:
+            self.stdout.write(f'{name:>22}: {self._time(render, rows, repeat):8.2f}')
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from timecardsite import db
+
+ACCOUNTS = 50
+ROWS_PER_ACCOUNT = 400
+
+
+def setup(path):
+    '''
+    a scratch database shaped like the hot tables: accounts whose tokens
+    are saved on refresh, sessions written on most requests, and alert
+    state that report pages read
+    '''
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE account (account_id TEXT PRIMARY KEY, access_token TEXT);
+        CREATE TABLE session (session_key TEXT PRIMARY KEY, data TEXT, expires REAL);
+        CREATE TABLE state (id INTEGER PRIMARY KEY, account_id TEXT,
+                            employee_id TEXT, week_seconds INTEGER);
+        CREATE INDEX state_account ON state (account_id);
+    ''')
+    conn.executemany('INSERT INTO account VALUES (?, ?)',
+                     [(str(account), 'token') for account in range(ACCOUNTS)])
+    conn.executemany('INSERT INTO state (account_id, employee_id, week_seconds) VALUES (?, ?, ?)',
+                     [(str(row % ACCOUNTS), str(row % 40), row)
+                      for row in range(ACCOUNTS * ROWS_PER_ACCOUNT)])
+    conn.commit()
+    conn.close()
+
+
+def connect(path, tuned):
+    # autocommit like Django, with its default five second busy wait
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    if tuned:
+        db.tune(conn.cursor())
+    return conn
+
+
+def reader(path, tuned, stop, latencies, errors):
+    conn = connect(path, tuned)
+    account = 0
+    while not stop.is_set():
+        account = (account + 1) % ACCOUNTS
+        started = time.perf_counter()
+        try:
+            conn.execute('SELECT access_token FROM account WHERE account_id = ?',
+                         (str(account),)).fetchone()
+            conn.execute('SELECT employee_id, SUM(week_seconds) FROM state '
+                         'WHERE account_id = ? GROUP BY employee_id', (str(account),)).fetchall()
+        except sqlite3.OperationalError:
+            errors.append('read')
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def writer(path, tuned, stop, number, latencies, errors):
+    conn = connect(path, tuned)
+    count = 0
+    while not stop.is_set():
+        count += 1
+        started = time.perf_counter()
+        try:
+            conn.execute('BEGIN')
+            conn.execute('UPDATE account SET access_token = ? WHERE account_id = ?',
+                         (f'token {count}', str(count % ACCOUNTS)))
+            conn.execute('INSERT OR REPLACE INTO session VALUES (?, ?, ?)',
+                         (f'{number}:{count % 500}', 'x' * 200, time.time()))
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError:
+            errors.append('write')
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Times report reads on SQLite while other connections write tokens and '
+            'sessions, with default settings and with the pragmas from timecardsite/db.py')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=3)
+
+    def run(self, directory, tuned, options):
+        path = os.path.join(directory, f'{"tuned" if tuned else "default"}.sqlite3')
+        setup(path)
+
+        stop = threading.Event()
+        reads, writes, errors = [], [], []
+        threads = [threading.Thread(target=reader, args=(path, tuned, stop, reads, errors))
+                   for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(path, tuned, stop, number, writes, errors))
+                    for number in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        seconds = options['seconds']
+        return (f'{"tuned" if tuned else "default":>8}: '
+                f'{len(reads) / seconds:8.0f} reads/s, '
+                f'p50 {statistics.median(reads) * 1000 if reads else 0:6.2f} ms, '
+                f'p99 {percentile(reads, 0.99) * 1000:7.2f} ms, '
+                f'max {max(reads, default=0) * 1000:7.1f} ms | '
+                f'{len(writes) / seconds:6.0f} writes/s, '
+                f'p99 {percentile(writes, 0.99) * 1000:7.2f} ms | '
+                f'{errors.count("read")} read and {errors.count("write")} write errors')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{options["readers"]} readers, {options["writers"]} writers, '
+                          f'{options["seconds"]}s each')
+        with tempfile.TemporaryDirectory() as directory:
+            for tuned in (False, True):
+                self.stdout.write(self.run(directory, tuned, options))
@@ -0,0 +1,48 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from timecardsite import tasks
+
+
+class Command(BaseCommand):
+    help = 'Runs queued tasks, such as invite emails, until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.TASK_WORKERS,
+                            help='worker threads. other processes and hosts running '
+                                 'this command share the queue too')
+        parser.add_argument('--drain', action='store_true',
+                            help='stop once nothing is due instead of waiting for more')
+        parser.add_argument('--stats', action='store_true',
+                            help='print counts and timings per task and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, counts in tasks.stats().items():
+                timings = ''
+                if counts.get('mean_seconds') is not None:
+                    timings = (f', waited {counts["mean_waited"]:.2f}s mean '
+                               f'{counts["max_waited"]:.2f}s max, ran {counts["mean_seconds"]:.2f}s '
+                               f'mean {counts["max_seconds"]:.2f}s max')
+                self.stdout.write(f'{name}: {counts["queued"]} queued, {counts["running"]} running, '
+                                  f'{counts["done"]} done, {counts["failed"]} failed{timings}')
+            return
+
+        stop = threading.Event()
+        workers = threading.Thread(target=lambda: self.report(tasks.run_workers(
+            options['concurrency'], stop=stop, drain=options['drain'])))
+        workers.start()
+        try:
+            while workers.is_alive():
+                workers.join(1)
+        except KeyboardInterrupt:
+            # let the tasks already running finish
+            self.stdout.write('stopping...')
+            stop.set()
+            workers.join()
+
+    def report(self, results):
+        for stats in results:
+            self.stdout.write(str(stats))
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from timecardsite import alerts, sync
+
+
+class Command(BaseCommand):
+    help = 'Runs new and changed shifts for every onboarded account through the alert rules and emails the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='keep syncing instead of running once')
+        parser.add_argument('--interval', type=int, default=60,
+                            help='seconds between syncs when looping')
+        parser.add_argument('--workers', type=int, default=settings.SYNC_WORKERS,
+                            help='processes to spread accounts over. other hosts '
+                                 'running this command share the work too')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+
+            shards = sync.run_round(workers=options['workers'])
+            for stats in shards:
+                for account_id, error in stats.errors:
+                    self.stderr.write(f'{account_id}: {error}')
+                self.stdout.write(str(stats))
+
+            synced = sum(stats.synced + stats.failed for stats in shards)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{synced} accounts in {elapsed:.1f}s over {len(shards)} workers')
+
+            sent = alerts.send_digests()
+            if sent:
+                self.stdout.write(f'emailed {sent} alerts')
+
+            if not options['loop']:
+                break
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
@@ -0,0 +1,211 @@
+from datetime import date
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
+
+from timecardsite import admission
+from timecardsite.models import Account, Profile
+from timecardsite.payperiod import calendar_for
+
+SESSION_KEY = '_shift_account'
+SIGNING_SALT = 'timecardsite.shift_account'
+
+
+class ShiftAccount():
+    '''
+    the logged in user's profile and account, loaded once per request.
+
+    views read the plain fields (timezone, role, pay period...) from here
+    instead of walking request.user.profile.account. those fields can also
+    come from a short-lived signed copy in the session, in which case the
+    Profile and Account rows, which hold the API tokens, are only loaded
+    if a view actually asks for them.
+    '''
+    # non-secret fields that are safe to keep in the session
+    FIELDS = ('user_id', 'account_id', 'account_name', 'timezone',
+              'pay_period_type', 'pay_period_reference_date', 'is_onboarded',
+              'role', 'employee_id', 'name', 'is_custom')
+
+    def __init__(self, profile=None, **fields):
+        self._profile = profile
+        self._account = None
+        for field in self.FIELDS:
+            setattr(self, field, fields[field])
+
+    @classmethod
+    def from_profile(cls, profile):
+        account = profile.account
+        reference_date = account.pay_period_reference_date
+
+        return cls(
+            profile=profile,
+            user_id=profile.user_id,
+            account_id=account.account_id,
+            account_name=account.name,
+            timezone=str(account.timezone),
+            pay_period_type=account.pay_period_type,
+            pay_period_reference_date=reference_date.isoformat() if reference_date else None,
+            is_onboarded=account.is_onboarded,
+            role=profile.role,
+            employee_id=profile.employee_id,
+            name=profile.name,
+            is_custom=profile.is_custom
+        )
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @property
+    def profile(self):
+        if self._profile is None:
+            self._profile = Profile.objects.select_related('account').get(
+                user_id=self.user_id)
+        return self._profile
+
+    @property
+    def account(self):
+        if self._profile is not None:
+            return self._profile.account
+        # only the account is wanted, no need to join the profile in
+        if self._account is None:
+            self._account = Account.objects.get(account_id=self.account_id)
+        return self._account
+
+    @property
+    def is_manager(self):
+        return self.role == 'mgr'
+
+    @property
+    def is_administrator(self):
+        return self.employee_id == '00'
+
+    @property
+    def reference_date(self):
+        if self.pay_period_reference_date:
+            return date.fromisoformat(self.pay_period_reference_date)
+        return None
+
+    @property
+    def pay_period(self):
+        return calendar_for(self.pay_period_type, self.reference_date)
+
+
+def _load(request):
+    '''
+    builds the ShiftAccount for a request, from the session cache if it's
+    fresh enough, otherwise with one query for profile and account. the
+    user itself is the one the auth middleware has already loaded
+    '''
+    if not request.user.is_authenticated:
+        return None
+
+    max_age = getattr(settings, 'SHIFT_ACCOUNT_SESSION_CACHE_SECONDS', 0)
+
+    if max_age and SESSION_KEY in request.session:
+        try:
+            fields = signing.loads(request.session[SESSION_KEY],
+                                   salt=SIGNING_SALT, max_age=max_age)
+            if fields['user_id'] == request.user.pk:
+                return ShiftAccount(**fields)
+        except signing.BadSignature: # includes expired
+            pass
+
+    try:
+        profile = Profile.objects.select_related('account').get(
+            user_id=request.user.pk)
+    except Profile.DoesNotExist:
+        return None
+
+    # hand the profile to the already loaded user as well, so code that
+    # still goes through request.user.profile.account shares these objects
+    request.user.profile = profile
+
+    shift_account = ShiftAccount.from_profile(profile)
+    if max_age:
+        request.session[SESSION_KEY] = signing.dumps(shift_account.as_dict(),
+                                                     salt=SIGNING_SALT)
+    return shift_account
+
+
+def get_shift_account(request):
+    if not hasattr(request, '_cached_shift_account'):
+        request._cached_shift_account = _load(request)
+    return request._cached_shift_account
+
+
+def forget_shift_account(request):
+    '''
+    drops the cached ShiftAccount, for views that change profile or account
+    '''
+    request.session.pop(SESSION_KEY, None)
+    if hasattr(request, '_cached_shift_account'):
+        del request._cached_shift_account
+    request.shift_account = SimpleLazyObject(lambda: get_shift_account(request))
+
+
+class ShiftAccountMiddleware():
+    '''
+    exposes the request's ShiftAccount as request.shift_account. it's lazy,
+    so requests that never look at it never pay for it. falsy when the user
+    isn't logged in or has no profile yet
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.shift_account = SimpleLazyObject(lambda: get_shift_account(request))
+        return self.get_response(request)
+
+
+def _busy_response(kind):
+    retry_after = settings.ADMISSION_RETRY_AFTER_SECONDS
+    if kind == admission.JSON:
+        response = JsonResponse({'error': 'Busy, try again shortly.'}, status=503)
+    else:
+        # rendered without the request, so none of the context processors
+        # or the nav's queries run for it
+        response = HttpResponse(render_to_string('busy.html', {'retry_after': retry_after}),
+                                status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class AdmissionMiddleware():
+    '''
+    admission control for views marked with admission.lightspeed_bound.
+    requests within the limits run as usual. the rest run cache only and
+    either get cached data or, if that would need Lightspeed, a 503 with
+    Retry-After straight away. goes after ShiftAccountMiddleware
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            if hasattr(request, '_admission'):
+                admission.get_controller().release(request._admission)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        kind = getattr(view_func, 'lightspeed_bound', None)
+        # requests that aren't logged in are turned away by the view itself
+        if kind is None or not request.shift_account:
+            return None
+
+        controller = admission.get_controller()
+        ticket = controller.admit(request.shift_account.account_id)
+        if ticket is not None:
+            request._admission = ticket
+            return None
+
+        try:
+            response = admission.run_cache_only(view_func, request, *view_args, **view_kwargs)
+        except admission.LightspeedBusy:
+            controller.count('shed')
+            return _busy_response(kind)
+        controller.count('served_from_cache')
+        return response
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timecardsite', '0002_auto_20220106_0151'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='overtime_weekly_hours',
+            field=models.DecimalField(decimal_places=2, default=40, max_digits=4),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='overtime_daily_hours',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=4, null=True),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timecardsite', '0003_account_overtime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='closing_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='last_employee_hours_id',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='EmployeeAlertState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_id', models.CharField(max_length=8)),
+                ('week', models.IntegerField(default=0)),
+                ('week_seconds', models.IntegerField(default=0)),
+                ('shops', models.CharField(blank=True, default='', max_length=255)),
+                ('shift_count', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timecardsite.account')),
+            ],
+            options={
+                'unique_together': {('account', 'employee_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='OpenShift',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_hours_id', models.IntegerField()),
+                ('employee_id', models.CharField(max_length=8)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timecardsite.account')),
+            ],
+            options={
+                'unique_together': {('account', 'employee_hours_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_id', models.CharField(max_length=8)),
+                ('kind', models.CharField(max_length=16)),
+                ('key', models.CharField(max_length=64)),
+                ('message', models.CharField(max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('sent', models.DateTimeField(blank=True, null=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timecardsite.account')),
+            ],
+            options={
+                'unique_together': {('account', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timecardsite', '0005_membership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncLease',
+            fields=[
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='timecardsite.account')),
+                ('owner', models.CharField(blank=True, default='', max_length=128)),
+                ('expires', models.DateTimeField(blank=True, null=True)),
+                ('last_synced', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timecardsite', '0008_profile_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Slot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32)),
+                ('key', models.CharField(blank=True, default='', max_length=64)),
+                ('number', models.IntegerField()),
+                ('owner', models.CharField(blank=True, default='', max_length=128)),
+                ('expires', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='slot',
+            constraint=models.UniqueConstraint(fields=('scope', 'key', 'number'), name='unique_slot'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timecardsite', '0009_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='claim_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
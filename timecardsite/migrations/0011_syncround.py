@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timecardsite', '0010_alert_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncRound',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+            ],
+        ),
+    ]
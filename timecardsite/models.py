@@ -1,9 +1,12 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from timezone_field import TimeZoneField
 from invitations.models import Invitation
 
+from timecardsite.payperiod import calendar_for
+
 class Account(models.Model):
     # TODO don't let these be blank?
 
@@ -16,6 +19,18 @@ class Account(models.Model):
     pay_period_type = models.CharField(max_length=32, default='biweekly')
     pay_period_reference_date = models.DateField(null=True)
     is_onboarded = models.BooleanField(default=False)
+    overtime_weekly_hours = models.DecimalField(max_digits=4, decimal_places=2,
+                                                default=40)
+    overtime_daily_hours = models.DecimalField(max_digits=4, decimal_places=2,
+                                               null=True, blank=True)
+    # stores' closing time, for "no clock out by close" alerts
+    closing_time = models.TimeField(null=True, blank=True)
+    # highest EmployeeHours ID the alert engine has seen
+    last_employee_hours_id = models.IntegerField(default=0)
+
+    @property
+    def pay_period(self):
+        return calendar_for(self.pay_period_type, self.pay_period_reference_date)
 
 class Profile(models.Model):
     roles = [
@@ -35,6 +50,14 @@ class Profile(models.Model):
     name = models.CharField(max_length=64, default='', blank=True)
     is_custom = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # the invite page looks every employee up by ID
+            models.Index(fields=['employee_id']),
+            # an account's managers, for alert digests and the dashboard
+            models.Index(fields=['account', 'role'])
+        ]
+
     @property
     def is_manager(self):
         return self.role == 'mgr'
@@ -43,6 +66,18 @@ class Profile(models.Model):
     def is_administrator(self):
         return self.employee_id == '00'
 
+class Membership(models.Model):
+    '''
+    another account a user manages besides their profile's, for owners
+    with more than one Lightspeed account
+    '''
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    role = models.CharField(max_length=8, choices=Profile.roles, default='mgr')
+
+    class Meta:
+        unique_together = ('user', 'account')
+
 class InvitationMeta(models.Model):
     invite = models.OneToOneField(
         Invitation,
@@ -50,4 +85,131 @@ class InvitationMeta(models.Model):
         primary_key=True
     )
     employee_id = models.CharField(max_length=8)
-    name = models.CharField(max_length=64)
\ No newline at end of file
+    name = models.CharField(max_length=64)
+
+class EmployeeAlertState(models.Model):
+    '''
+    rolling per-employee state the alert engine needs to judge a new
+    punch without looking back through old ones
+    '''
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    employee_id = models.CharField(max_length=8)
+    # index of the workweek week_seconds belongs to
+    week = models.IntegerField(default=0)
+    # closed shift time so far this workweek
+    week_seconds = models.IntegerField(default=0)
+    # shops this employee has worked at, comma separated shop IDs
+    shops = models.CharField(max_length=255, default='', blank=True)
+    shift_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('account', 'employee_id')
+
+    @property
+    def shop_ids(self):
+        return set(int(shop) for shop in self.shops.split(',') if shop)
+
+class OpenShift(models.Model):
+    '''
+    a shift that was still clocked in when last seen. checked again on
+    every sync until it closes, then deleted
+    '''
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    employee_hours_id = models.IntegerField()
+    employee_id = models.CharField(max_length=8)
+
+    class Meta:
+        unique_together = ('account', 'employee_hours_id')
+
+class Alert(models.Model):
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    employee_id = models.CharField(max_length=8)
+    kind = models.CharField(max_length=16)
+    # identifies what the alert is about so it is only raised once
+    key = models.CharField(max_length=64)
+    message = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    # which send_digests is sending it, and until when. see alerts.py
+    claimed_by = models.CharField(max_length=128, default='', blank=True)
+    claim_expires = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('account', 'key')
+
+class SyncLease(models.Model):
+    '''
+    which sync worker has an account claimed, and until when. workers keep
+    extending expires while they sync, so a lease that has run out belongs
+    to a worker that died and the account is up for grabs again
+    '''
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, primary_key=True)
+    # empty when nobody holds it
+    owner = models.CharField(max_length=128, default='', blank=True)
+    expires = models.DateTimeField(null=True, blank=True)
+    last_synced = models.DateTimeField(null=True, blank=True)
+
+class SyncRound(models.Model):
+    '''
+    when the alert sync round every host is working on started. there's
+    only ever the one row. see sync.py
+    '''
+    started = models.DateTimeField()
+
+class Slot(models.Model):
+    '''
+    one of a limited number of places shared by every process through the
+    database, held like a SyncLease until expires. see slots.py
+    '''
+    scope = models.CharField(max_length=32)
+    # e.g. an account ID, for limits per account. empty for overall limits
+    key = models.CharField(max_length=64, default='', blank=True)
+    number = models.IntegerField()
+    # empty when nobody holds it
+    owner = models.CharField(max_length=128, default='', blank=True)
+    expires = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key', 'number'], name='unique_slot')
+        ]
+
+class Task(models.Model):
+    '''
+    a queued call to a function registered with tasks.task. owner and
+    locked_until say which worker is running it and until when, like a
+    SyncLease. see tasks.py
+    '''
+    statuses = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ]
+
+    name = models.CharField(max_length=128)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    # at most one queued or running task per key
+    dedupe_key = models.CharField(max_length=128, null=True, blank=True)
+    status = models.CharField(max_length=8, choices=statuses, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    owner = models.CharField(max_length=128, default='', blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # seconds spent waiting to start after it was due, and running
+    waited = models.FloatField(null=True, blank=True)
+    seconds = models.FloatField(null=True, blank=True)
+    last_error = models.CharField(max_length=255, default='', blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'],
+                                    condition=models.Q(status__in=['queued', 'running']),
+                                    name='unique_pending_task_dedupe_key')
+        ]
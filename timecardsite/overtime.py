@@ -0,0 +1,107 @@
+'''
+Regular and overtime hours from a set of shifts.
+
+Each employee's shifts are sorted once and then walked in a single pass.
+Shifts are cut at local midnight, so each piece belongs to exactly one
+day and one workweek. Workweeks start on a fixed day of the week, the
+same anchor WeeklyPayPeriod uses.
+'''
+from collections import defaultdict
+from datetime import date
+
+from timecardsite.localtime import day_number
+from timecardsite.payperiod import WeeklyPayPeriod
+
+WEEKLY_OVERTIME_HOURS = 40
+
+
+class OvertimeCalculator():
+    '''
+    :param clock: LocalClock for the account's timezone
+    :param dow: weekday workweeks start on, 0 is Monday
+    :param weekly_hours: hours per workweek before overtime
+    :param daily_hours: hours per day before overtime, None for no daily limit
+    '''
+    def __init__(self, clock, dow, weekly_hours=WEEKLY_OVERTIME_HOURS, daily_hours=None):
+        self.clock = clock
+        self.weekly_limit = int(weekly_hours * 3600)
+        self.daily_limit = int(daily_hours * 3600) if daily_hours else None
+
+        # day number of any workweek start. weeks are counted from there
+        self.anchor = day_number(WeeklyPayPeriod(dow).get(date(1970, 1, 1))[0])
+
+    def week_of(self, day):
+        return (day - self.anchor) // 7
+
+    def employee(self, shifts):
+        '''
+        splits one employee's shifts into regular and overtime
+        :param shifts: the employee's Shifts, in any order
+        :return: dict of regular and overtime hours
+        '''
+        regular = 0
+        overtime = 0
+
+        week = day = None
+        week_regular = day_worked = 0
+
+        for shift in sorted(shifts, key=lambda shift: shift.check_in_ts):
+            end = shift.check_in_ts + shift.seconds
+
+            for piece_day, seconds in self.clock.split_by_day(shift.check_in_ts, end):
+                if piece_day != day:
+                    day = piece_day
+                    day_worked = 0
+                    piece_week = self.week_of(piece_day)
+                    if piece_week != week:
+                        week = piece_week
+                        week_regular = 0
+
+                # hours past the daily limit are overtime, and don't count
+                # towards the weekly limit
+                daily_overtime = 0
+                if self.daily_limit is not None:
+                    daily_overtime = min(seconds, max(0, day_worked + seconds - self.daily_limit))
+                day_worked += seconds
+
+                remaining = seconds - daily_overtime
+                weekly_overtime = max(0, week_regular + remaining - self.weekly_limit)
+                weekly_overtime = min(remaining, weekly_overtime)
+
+                week_regular += remaining - weekly_overtime
+                regular += remaining - weekly_overtime
+                overtime += daily_overtime + weekly_overtime
+
+        return {
+            'regular': regular / 3600,
+            'overtime': overtime / 3600
+        }
+
+    def compute(self, shifts, key=lambda shift: shift.employee_id):
+        '''
+        regular and overtime hours for every employee with shifts
+        :param shifts: iterable of Shifts for any number of employees
+        :param key: what to group and label results by
+        :return: dict of key to the dict returned by employee()
+        '''
+        by_employee = defaultdict(list)
+        for shift in shifts:
+            by_employee[key(shift)].append(shift)
+
+        return {employee: self.employee(employee_shifts)
+                for employee, employee_shifts in by_employee.items()}
+
+
+def for_account(account, clock):
+    '''
+    OvertimeCalculator using an account's workweek and overtime settings.
+    workweeks start on the weekday of the pay period reference date
+    '''
+    reference_date = account.pay_period_reference_date
+    dow = reference_date.weekday() if reference_date else 0
+
+    return OvertimeCalculator(
+        clock, dow,
+        weekly_hours=account.overtime_weekly_hours,
+        daily_hours=account.overtime_daily_hours
+    )
@@ -1,49 +1,175 @@
+'''
+Pay period calendars.
+
+Every schedule numbers its periods with plain integers, so a period is
+identified by one int wherever it's cached, rolled up or reported on.
+Mapping a day to its index, and an index back to its first day, is a
+little integer arithmetic with no searching, and with a LocalClock the
+same goes for epoch timestamps.
+
+Weekly and bi-weekly periods repeat from a reference date (weekly ones
+only care about its weekday). Semi-monthly periods run from the 1st to
+the 15th and the 16th to the end of the month, and monthly ones from the
+1st to the end of the month.
+'''
+from collections import defaultdict
 from datetime import timedelta, date
 
-class WeeklyPayPeriod():
-    def __init__(self, dow):
-        self.dow = dow
+from timecardsite.localtime import EPOCH_ORDINAL, day_number
+
+
+def _date(day):
+    return date.fromordinal(day + EPOCH_ORDINAL)
+
+
+class PayPeriodCalendar():
+    def index_of_day(self, day):
+        '''
+        index of the period containing day number `day`
+        '''
+        raise NotImplementedError
 
-    def _weekly(self, given_date):
-        beginning = given_date - timedelta(days=((given_date.weekday() - self.dow) % 7))
-        end = beginning + timedelta(days=6)
+    def first_day(self, index):
+        '''
+        day number of the first day of period `index`
+        '''
+        raise NotImplementedError
 
-        return (beginning, end)
+    def index(self, given_date):
+        return self.index_of_day(day_number(given_date))
+
+    def index_at(self, clock, ts):
+        '''
+        index of the period containing epoch timestamp ts, on clock's local days
+        '''
+        return self.index_of_day(clock.local_day(ts))
+
+    def bounds(self, index):
+        '''
+        :return: (first date, last date) of period `index`
+        '''
+        return (_date(self.first_day(index)), _date(self.first_day(index + 1) - 1))
 
     def get(self, given_date):
-        return self._weekly(given_date)
+        return self.bounds(self.index(given_date))
+
+    def current(self, today=None):
+        '''
+        :param today: the account's local date. see localtime.today
+        '''
+        return self.get(today or date.today())
+
+    def previous(self, today=None):
+        return self.bounds(self.index(today or date.today()) - 1)
+
+    def periods(self, start_date, end_date):
+        '''
+        :return: list of (index, first date, last date) for every period
+                 overlapping start_date through end_date, oldest first
+        '''
+        return [(index,) + self.bounds(index)
+                for index in range(self.index(start_date), self.index(end_date) + 1)]
+
+    def bucket(self, clock, timestamps):
+        '''
+        period index of every timestamp, in the same order. each local day
+        is only mapped to its period once
+        :param clock: LocalClock covering the timestamps
+        :return: list of ints
+        '''
+        by_day = dict()
+        indexes = []
+        for ts in timestamps:
+            day = clock.local_day(ts)
+            index = by_day.get(day)
+            if index is None:
+                index = by_day[day] = self.index_of_day(day)
+            indexes.append(index)
+        return indexes
+
+    def group(self, clock, items, key):
+        '''
+        :param key: epoch timestamp of an item, e.g. a shift's check in
+        :return: dict of period index to the items falling in that period
+        '''
+        items = list(items)
+        groups = defaultdict(list)
+        for item, index in zip(items, self.bucket(clock, map(key, items))):
+            groups[index].append(item)
+        return groups
 
-    def current(self):
-        return self._weekly(date.today())
 
-    def previous(self):
-        return self._weekly(date.today() - timedelta(weeks=1))
+class FixedPayPeriod(PayPeriodCalendar):
+    '''
+    periods of length_days days, period 0 starting on reference_date
+    '''
+    def __init__(self, reference_date, length_days):
+        self.reference_date = reference_date
+        self.dow = reference_date.weekday()
+        self.length_days = length_days
+        self._reference_day = day_number(reference_date)
+
+    def index_of_day(self, day):
+        return (day - self._reference_day) // self.length_days
+
+    def first_day(self, index):
+        return self._reference_day + index * self.length_days
+
+
+class WeeklyPayPeriod(FixedPayPeriod):
+    def __init__(self, dow):
+        # 1970-01-05 was a Monday
+        super().__init__(date(1970, 1, 5) + timedelta(days=dow), 7)
 
-class BiWeeklyPayPeriod():
+
+class BiWeeklyPayPeriod(FixedPayPeriod):
     def __init__(self, reference_date):
         # reference_date is a user supplied first day of pay period
-        self.dow = reference_date.weekday()
-        self.reference_date = reference_date
+        super().__init__(reference_date, 14)
 
-    def _within_two_week_multiple(self, given_date):
-        # is the given date 2x weeks before or after reference date, for any x
-        difference = given_date - self.reference_date
-        return difference.days % 14 == 0
 
-    def _biweekly(self, given_date):
-        beginning = given_date - timedelta(days=((given_date.weekday() - self.dow) % 7))
-        if not self._within_two_week_multiple(beginning):
-            beginning -= timedelta(weeks=1)
+class MonthlyPayPeriod(PayPeriodCalendar):
+    '''
+    calendar months, counted from January 1970
+    '''
+    def index_of_day(self, day):
+        given_date = _date(day)
+        return (given_date.year - 1970) * 12 + given_date.month - 1
 
-        end = beginning + timedelta(days=13)
+    def first_day(self, index):
+        year, month = divmod(index, 12)
+        return day_number(date(1970 + year, month + 1, 1))
 
-        return (beginning, end)
 
-    def get(self, given_date):
-        return self._biweekly(given_date)
+class SemiMonthlyPayPeriod(MonthlyPayPeriod):
+    '''
+    the 1st to the 15th and the 16th to the end of each month
+    '''
+    def index_of_day(self, day):
+        return super().index_of_day(day) * 2 + (_date(day).day > 15)
+
+    def first_day(self, index):
+        month, half = divmod(index, 2)
+        return super().first_day(month) + 15 * half
+
+
+PAY_PERIOD_CHOICES = [
+    ('weekly', 'Weekly'),
+    ('biweekly', 'Bi-weekly'),
+    ('semimonthly', 'Semi-monthly'),
+    ('monthly', 'Monthly'),
+]
 
-    def current(self):
-        return self._biweekly(date.today())
 
-    def previous(self):
-        return self._biweekly(date.today() - timedelta(weeks=2))
\ No newline at end of file
+def calendar_for(pay_period_type, reference_date):
+    '''
+    the calendar for an account's pay_period_type. anything unrecognised
+    is treated as bi-weekly, which used to be the only choice
+    '''
+    if pay_period_type == 'weekly':
+        return WeeklyPayPeriod(reference_date.weekday())
+    if pay_period_type == 'semimonthly':
+        return SemiMonthlyPayPeriod()
+    if pay_period_type == 'monthly':
+        return MonthlyPayPeriod()
+    return BiWeeklyPayPeriod(reference_date)
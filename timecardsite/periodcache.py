@@ -0,0 +1,153 @@
+'''
+In-process cache for each account's shifts over a pay period.
+
+Every employee's timecard and the manager's punch log for a period are
+answered from one fetch of the whole period, kept here for
+SHIFT_CACHE_SECONDS. When several requests miss on the same key at once,
+only the first one fetches and the rest wait for its result.
+
+Past that, an entry is still served as is for up to
+SHIFT_CACHE_STALE_SECONDS while a background thread fetches a fresh one,
+so a slow Lightspeed doesn't hold up the page. Only entries older than
+that make the request wait.
+'''
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# least recently used entries are dropped past this many
+MAX_ENTRIES = 256
+
+
+class Entry():
+    def __init__(self, value, fetched_at):
+        self.value = value
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+class _Fetch():
+    '''
+    a fetch in flight that other requests for the same key can wait on
+    '''
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+_entries = OrderedDict()
+_inflight = dict()
+_lock = threading.Lock()
+
+
+def _store(key, entry):
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def peek(key):
+    '''
+    :return: the Entry for key however old it is, or None
+    '''
+    with _lock:
+        return _entries.get(key)
+
+
+def fetch(key, fetcher):
+    '''
+    runs fetcher and stores its result, unless a fetch for key is already
+    running, in which case it waits for that one instead
+    :return: the new Entry
+    '''
+    with _lock:
+        pending = _inflight.get(key)
+        leader = pending is None
+        if leader:
+            pending = _inflight[key] = _Fetch()
+
+    if not leader:
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.entry
+
+    try:
+        pending.entry = Entry(fetcher(), time.time())
+        _store(key, pending.entry)
+        return pending.entry
+    except Exception as e:
+        pending.error = e
+        raise
+    finally:
+        with _lock:
+            del _inflight[key]
+        pending.done.set()
+
+
+def _refresh(key, fetcher):
+    try:
+        fetch(key, fetcher)
+    except Exception:
+        # the stale entry stays put, and the next request tries again
+        logger.exception('Background refresh of %s failed', key)
+    finally:
+        close_old_connections()
+
+
+def refresh_in_background(key, fetcher):
+    '''
+    starts fetching key on another thread, unless it's already being fetched
+    :return: the thread, or None
+    '''
+    with _lock:
+        if key in _inflight:
+            return None
+
+    thread = threading.Thread(target=_refresh, args=(key, fetcher),
+                              name='periodcache-refresh', daemon=True)
+    thread.start()
+    return thread
+
+
+def get(key, fetcher, max_age=None, max_stale=None, refresher=None):
+    '''
+    the cached value for key if it's younger than max_age seconds. up to
+    max_stale seconds it's still returned, but refreshed in the
+    background. anything older is fetched before returning
+    :param max_age: defaults to SHIFT_CACHE_SECONDS
+    :param max_stale: defaults to SHIFT_CACHE_STALE_SECONDS
+    :param refresher: used instead of fetcher for background refreshes
+    '''
+    if max_age is None:
+        max_age = settings.SHIFT_CACHE_SECONDS
+    if max_stale is None:
+        max_stale = settings.SHIFT_CACHE_STALE_SECONDS
+
+    entry = peek(key)
+    if entry is None or entry.age > max(max_age, max_stale):
+        entry = fetch(key, fetcher)
+    elif entry.age > max_age:
+        refresh_in_background(key, refresher or fetcher)
+
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+    return entry.value
+
+
+def clear():
+    with _lock:
+        _entries.clear()
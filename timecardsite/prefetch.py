@@ -0,0 +1,186 @@
+'''
+Warms the period cache before the views ask for it.
+
+When someone logs in, their account's current and previous pay periods
+are fetched in the background while the browser follows the post login
+redirects, so the landing page is a cache hit (or joins the fetch already
+in flight).
+
+The cache is per process, and the next request may go to any gunicorn
+worker, so each web process runs a prefetch thread that warms its own
+copy. Every PREFETCH_LOGIN_POLL_SECONDS it looks for logins any process
+has taken since it last looked, going by the last_login Django already
+saves, and warms those accounts too. It also fetches every onboarded
+account's new period as soon as it begins.
+'''
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+
+from timecardsite import localtime, services
+from timecardsite.models import Account
+
+logger = logging.getLogger(__name__)
+
+# the prefetch thread looks for newly onboarded accounts at least this often
+ROLLOVER_CHECK_SECONDS = 3600
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PREFETCH_WORKERS,
+                                           thread_name_prefix='prefetch')
+        return _executor
+
+
+def periods_for(account, today=None):
+    '''
+    :return: the account's current and previous pay periods as (start, end)
+    '''
+    today = today or localtime.today(account.timezone)
+    calendar = account.pay_period
+    index = calendar.index(today)
+    return [calendar.bounds(index), calendar.bounds(index - 1)]
+
+
+def warm(account, periods):
+    '''
+    fetches each period into the cache, the same way the views would
+    '''
+    try:
+        for start, end in periods:
+            start_date, end_date = services._localize_range(account, start, end)
+            services.get_period_shifts(account, start_date, end_date)
+    except Exception:
+        # nobody is waiting on this. the view will fetch for itself
+        logger.exception('Prefetch failed for account %s', account.account_id)
+    finally:
+        close_old_connections()
+
+
+def warm_in_background(account, periods=None):
+    if periods is None:
+        periods = periods_for(account)
+    return _get_executor().submit(warm, account, periods)
+
+
+def _warmable():
+    return Account.objects.filter(is_onboarded=True, pay_period_reference_date__isnull=False)
+
+
+def prefetch_for_user(user):
+    '''
+    starts warming the logged in user's account, if it's set up
+    '''
+    account = _warmable().filter(profile__user=user).first()
+    if account is not None:
+        warm_in_background(account)
+
+
+def _local_today(account, now):
+    today = localtime.today(account.timezone, now)
+    clock = localtime.for_account(account, today - timedelta(days=1),
+                                  today + timedelta(days=32))
+    return clock, today
+
+
+def next_period_start(account, now=None):
+    '''
+    :return: epoch seconds of local midnight on the first day of the
+             account's next pay period
+    '''
+    now = now if now is not None else time.time()
+    clock, today = _local_today(account, now)
+    calendar = account.pay_period
+    return clock.day_start(calendar.first_day(calendar.index(today) + 1))
+
+
+class PrefetchThread(threading.Thread):
+    '''
+    warms this process's cache for logins taken by any process, and each
+    account's new period once it begins
+    '''
+    daemon = True
+
+    def __init__(self):
+        super().__init__(name='prefetch')
+        self.next_starts = dict()
+        # last_login of the latest login already warmed for
+        self.logins_since = timezone.now()
+
+    def check_logins(self):
+        '''
+        warms the accounts of users who have logged in since the last look.
+        in the process that took the login the fetch is already cached or
+        in flight, so looking again there costs nothing
+        :return: the accounts warmed
+        '''
+        accounts = list(_warmable()
+                        .filter(profile__user__last_login__gt=self.logins_since)
+                        .annotate(last_login=Max('profile__user__last_login')))
+        for account in accounts:
+            warm_in_background(account)
+            self.logins_since = max(self.logins_since, account.last_login)
+        return accounts
+
+    def check(self, now=None):
+        '''
+        warms accounts whose next period has started since the last check
+        :return: seconds until the next check
+        '''
+        now = now if now is not None else time.time()
+
+        wait = ROLLOVER_CHECK_SECONDS
+        for account in _warmable():
+            next_start = self.next_starts.get(account.pk)
+            if next_start is not None and now >= next_start:
+                today = localtime.today(account.timezone, now)
+                warm_in_background(account, periods_for(account, today)[:1])
+                next_start = None
+
+            if next_start is None:
+                next_start = next_period_start(account, now)
+                self.next_starts[account.pk] = next_start
+            wait = min(wait, next_start - now)
+
+        return max(wait, 1)
+
+    def run(self):
+        next_rollover = 0
+        while True:
+            now = time.time()
+            if now >= next_rollover:
+                try:
+                    next_rollover = now + self.check(now)
+                except Exception:
+                    logger.exception('Rollover check failed')
+                    next_rollover = now + ROLLOVER_CHECK_SECONDS
+            try:
+                self.check_logins()
+            except Exception:
+                logger.exception('Login check failed')
+            close_old_connections()
+            time.sleep(settings.PREFETCH_LOGIN_POLL_SECONDS)
+
+
+_prefetch_thread = None
+
+
+def start_prefetch_thread():
+    global _prefetch_thread
+    if _prefetch_thread is None:
+        _prefetch_thread = PrefetchThread()
+        _prefetch_thread.start()
+    return _prefetch_thread
@@ -0,0 +1,256 @@
+'''
+Fair sharing of outbound Lightspeed calls between accounts.
+
+Every page `services._call_api` fetches first takes a slot from the
+process's FairScheduler. There are LIGHTSPEED_MAX_CONCURRENCY slots in
+all, and an account can hold at most LIGHTSPEED_ACCOUNT_CONCURRENCY of
+them, so one account running a huge report can't take every connection.
+
+Web, sync and task workers are all separate processes, so the same two
+limits are also held across all of them in Slot rows (see slots.py).
+Those cost database writes, so they're taken once per fetch rather than
+per page: `_call_api` holds one for every page of a paginated call, and
+a report fetching several endpoints holds one for all of them with
+fetch(). Waiting for one polls, for no longer than the caller's Deadline
+(or LIGHTSPEED_SLOT_WAIT_SECONDS without one) before giving up with
+LightspeedBusy. The queueing order below is per process; across
+processes it's the per account limit that keeps one account from taking
+every connection.
+
+Callers wait in a queue per account. When a slot frees up it goes to the
+waiting account that has had the least service for its weight (stride
+scheduling): each call moves the account's pass on by 1 / weight, and
+the lowest pass goes next. With equal weights that's round robin. An
+account that has been idle rejoins level with the busy ones, rather than
+with credit saved up from being quiet.
+'''
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from timecardsite import slots
+from timecardsite.admission import LightspeedBusy
+from timecardsite.deadline import Deadline
+
+LIGHTSPEED = 'lightspeed'
+
+# the account whose shared slot this context holds through fetch()
+_holding = ContextVar('lightspeed_holding', default=None)
+
+# polling for a shared slot starts this often and slows down to at most
+SHARED_POLL_SECONDS = 0.01
+SHARED_MAX_POLL_SECONDS = 0.25
+
+
+class _Tenant():
+    def __init__(self, weight):
+        self.weight = weight
+        self.queue = deque()
+        self.running = 0
+        self.pass_ = 0.0
+
+        # stats
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.max_queued = 0
+
+
+class _Waiter():
+    def __init__(self):
+        self.granted = threading.Event()
+        self.enqueued = time.monotonic()
+
+
+class FairScheduler():
+    def __init__(self, max_concurrency, account_concurrency, weights=None, shared=None):
+        '''
+        :param weights: account ID to weight. accounts not in it weigh 1
+        :param shared: slots.Limits to hold across processes as well
+        '''
+        self.max_concurrency = max_concurrency
+        self.account_concurrency = account_concurrency
+        self.weights = weights or dict()
+        self.shared = shared
+
+        self._lock = threading.Lock()
+        self._tenants = dict()
+        self._running = 0
+        # pass of the account most recently given a slot
+        self._virtual_time = 0.0
+
+    def _tenant(self, key):
+        tenant = self._tenants.get(key)
+        if tenant is None:
+            tenant = self._tenants[key] = _Tenant(self.weights.get(key, 1))
+        return tenant
+
+    def _dispatch(self):
+        '''
+        hands free slots to waiters, lowest pass first. called with the lock held
+        '''
+        while self._running < self.max_concurrency:
+            ready = [tenant for tenant in self._tenants.values()
+                     if tenant.queue and tenant.running < self.account_concurrency]
+            if not ready:
+                return
+
+            tenant = min(ready, key=lambda tenant: tenant.pass_)
+            waiter = tenant.queue.popleft()
+            tenant.running += 1
+            self._running += 1
+            self._virtual_time = tenant.pass_
+            tenant.pass_ += 1 / tenant.weight
+
+            waited = time.monotonic() - waiter.enqueued
+            tenant.calls += 1
+            tenant.wait_seconds += waited
+            tenant.max_wait = max(tenant.max_wait, waited)
+
+            waiter.granted.set()
+
+    def acquire(self, key):
+        '''
+        waits for a slot for account `key`
+        '''
+        waiter = _Waiter()
+        with self._lock:
+            tenant = self._tenant(key)
+            if not tenant.queue and not tenant.running:
+                tenant.pass_ = max(tenant.pass_, self._virtual_time)
+            tenant.queue.append(waiter)
+            tenant.max_queued = max(tenant.max_queued, len(tenant.queue))
+            self._dispatch()
+        waiter.granted.wait()
+
+    def release(self, key):
+        with self._lock:
+            self._tenants[key].running -= 1
+            self._running -= 1
+            self._dispatch()
+
+    def _acquire_shared(self, key, deadline=None):
+        '''
+        waits for a slot under the shared limits
+        :param deadline: Deadline to give up at. defaults to
+                         LIGHTSPEED_SLOT_WAIT_SECONDS from now
+        :return: slots.Ticket
+        :raises LightspeedBusy: if none came free in time
+        '''
+        if deadline is None:
+            deadline = Deadline(settings.LIGHTSPEED_SLOT_WAIT_SECONDS)
+        poll = SHARED_POLL_SECONDS
+        while True:
+            ticket, full = self.shared.acquire(key)
+            if ticket is not None:
+                return ticket
+            if deadline.expired:
+                raise LightspeedBusy(f'No shared Lightspeed slot free ({full}).')
+            time.sleep(min(poll, deadline.remaining()))
+            poll = min(poll * 2, SHARED_MAX_POLL_SECONDS)
+
+    @contextmanager
+    def shared_slot(self, key, deadline=None):
+        '''
+        holds a shared slot for account `key`, unless this context already
+        holds one for it through fetch()
+        '''
+        if self.shared is None or (key is not None and _holding.get() == key):
+            yield
+            return
+        ticket = self._acquire_shared(key, deadline)
+        try:
+            yield
+        finally:
+            self.shared.release(ticket)
+
+    @contextmanager
+    def fetch(self, key, deadline=None):
+        '''
+        holds one shared slot for account `key` over every call made inside
+        it. not for use in generators, which would leave it marked held
+        between pages
+        '''
+        with self.shared_slot(key, deadline):
+            token = _holding.set(key)
+            try:
+                yield
+            finally:
+                _holding.reset(token)
+
+    @contextmanager
+    def slot(self, key):
+        '''
+        holds one of this process's slots for account `key`, for one call
+        '''
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def shared_stats(self):
+        '''
+        :return: dict of the shared slots held right now by every process,
+                 overall and per account, or None without shared limits
+        '''
+        if self.shared is None:
+            return None
+        running, accounts = self.shared.held()
+        return {'running': running, 'accounts_running': accounts}
+
+    def stats(self):
+        '''
+        :return: dict of account ID to its weight, calls running and
+                 queued right now, the longest its queue has been, and
+                 how many calls it has made and how long they waited
+        '''
+        with self._lock:
+            return {
+                key: {
+                    'weight': tenant.weight,
+                    'running': tenant.running,
+                    'queued': len(tenant.queue),
+                    'max_queued': tenant.max_queued,
+                    'calls': tenant.calls,
+                    'mean_wait': tenant.wait_seconds / tenant.calls if tenant.calls else 0.0,
+                    'max_wait': tenant.max_wait
+                }
+                for key, tenant in self._tenants.items()
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    '''
+    the process's scheduler, set up from settings on first use
+    '''
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler(
+                settings.LIGHTSPEED_MAX_CONCURRENCY,
+                settings.LIGHTSPEED_ACCOUNT_CONCURRENCY,
+                weights=settings.LIGHTSPEED_ACCOUNT_WEIGHTS,
+                shared=slots.Limits(LIGHTSPEED, settings.LIGHTSPEED_MAX_CONCURRENCY,
+                                    settings.LIGHTSPEED_ACCOUNT_CONCURRENCY,
+                                    settings.LIGHTSPEED_SLOT_SECONDS)
+            )
+        return _scheduler
+
+
+def create_slots(account_ids=()):
+    '''
+    creates the shared slot rows for the overall limit and the accounts'.
+    see slots.py
+    '''
+    shared = get_scheduler().shared
+    if shared is not None:
+        shared.create(account_ids)
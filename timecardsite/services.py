@@ -1,16 +1,21 @@
 """
 Services for Lightspeed API interatcion
 """
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import time
 from dataclasses import dataclass
 import json
 
-from datetime import datetime, date, timedelta, timezone
+from datetime import datetime, timedelta, timezone
 import pytz
 from requests import request
 
+from django.conf import settings
+
+from timecardsite import (admission, anomalies, coverage, display, localtime, overtime,
+                          periodcache, scheduler, trends)
 from timecardsite.secrets import CLIENT_ID, CLIENT_SECRET
+from timecardsite.shifts import PeriodShifts, Shift
 
 AUTH_URL = 'https://cloud.lightspeedapp.com/oauth/access_token.php'
 BASE_URL = 'https://api.lightspeedapp.com/'
@@ -58,17 +63,22 @@ def _call(endpoint, account, params):
         raise InvalidToken('Access Token is Expired.')
     return response.json()
 
-def _call_api(endpoint, account, params=None):
+def _call_api(endpoint, account, params=None, deadline=None):
     '''
     utility function for calling API. handles:
         Token refreshes
         Converting datetimes to iso format
         Pagination
-        Rate Limiting (soon)
+        Sharing calls fairly between accounts, see scheduler.py
+        Refusing to call at all for requests over the admission limits,
+        see admission.py
 
     :param endpoint: string of the endpoint being called.
                      passed on to _call()
     :param params: dict of query parameters used in the api call
+    :param deadline: Deadline after which no more pages are requested.
+                     the first page is always fetched, once there's a
+                     shared slot for it
     :return: a generator for each page of the decoded JSON from response
     '''
     if params:
@@ -94,29 +104,39 @@ def _call_api(endpoint, account, params=None):
     else:
         # we make an empty params dict to make pagination simpler
         params = dict()
-    while True:
-        try:
-            response = _call(endpoint, account, params)
-            yield response
-        except InvalidToken: # refreshing access token when necessary
-            account.access_token = _refresh_access_token(account)
-            account.save()
-
-            response = _call(endpoint, account, params)
+    # the account a call is queued under. the DuckAccount used before an
+    # account exists doesn't have an ID yet
+    tenant = getattr(account, 'account_id', None)
+    admission.check_outbound()
+    sched = scheduler.get_scheduler()
+    # one shared slot for every page, and a slot in this process for each
+    with sched.shared_slot(tenant, deadline):
+        while True:
+            with sched.slot(tenant):
+                try:
+                    response = _call(endpoint, account, params)
+                except InvalidToken: # refreshing access token when necessary
+                    account.access_token = _refresh_access_token(account)
+                    account.save()
+
+                    response = _call(endpoint, account, params)
             yield response
 
-        if 'offset' in response['@attributes']:
-            count = int(response['@attributes']['count'])
-            offset = int(response['@attributes']['offset'])
-            limit = int(response['@attributes']['limit'])
+            if 'offset' in response['@attributes']:
+                count = int(response['@attributes']['count'])
+                offset = int(response['@attributes']['offset'])
+                limit = int(response['@attributes']['limit'])
 
-            if count - offset > limit:
-                params['offset'] = str(offset + 100)
+                if count - offset > limit:
+                    params['offset'] = str(offset + 100)
 
+                else:
+                    break
             else:
                 break
-        else:
-            break
+
+            if deadline is not None and deadline.expired:
+                break
             
 def get_tokens(code):
     '''
@@ -235,15 +255,35 @@ def map_shop_ids_to_names(account):
 
     return shop_id_map
 
-def get_punch_log_by_employee(account, employee_id,
-                                start_date=None, end_date=None):
+def get_name_maps(account, refresh=False):
+    '''
+    the shop and employee ID to name maps, kept in the period cache for
+    NAME_CACHE_SECONDS so polling for shift changes doesn't page through
+    every employee each time
+    :param refresh: fetch them again now, e.g. for an ID they don't have
+    :return: tuple of the shop map and the employee map
+    '''
+    key = (account.account_id, 'names')
+    def fetch():
+        return (map_shop_ids_to_names(account), map_employee_ids_to_names(account))
 
+    if refresh:
+        return periodcache.fetch(key, fetch).value
+    return periodcache.get(key, fetch, max_age=settings.NAME_CACHE_SECONDS, max_stale=0)
+
+def _localize_range(account, start_date=None, end_date=None):
+    '''
+    turns a pair of dates into the first and last moments of those days in
+    the account's timezone. defaults to the last two weeks
+    :return: tuple of aware datetimes
+    '''
     if not start_date:
+        today = localtime.today(account.timezone)
         start_date = datetime.combine(
-            date.today() - timedelta(weeks=2),
+            today - timedelta(weeks=2),
             datetime.min.time()
         )
-        end_date = datetime.combine(date.today(), datetime.max.time())
+        end_date = datetime.combine(today, datetime.max.time())
     else:
         start_date = datetime.combine(start_date, datetime.min.time())
         end_date = datetime.combine(end_date, datetime.max.time())
@@ -251,136 +291,441 @@ def get_punch_log_by_employee(account, employee_id,
     start_date = pytz.timezone(str(account.timezone)).localize(start_date, is_dst=None)
     end_date = pytz.timezone(str(account.timezone)).localize(end_date, is_dst=None)
 
-    employee_shifts = []
-    shops = map_shop_ids_to_names(account)
-    employee_totals = defaultdict(int)
+    return (start_date, end_date)
+
+class ShiftPages():
+    '''
+    how far a paginated EmployeeHours fetch got
+    '''
+    def __init__(self):
+        self.count = 0
+        self.next_offset = 0
+
+    @property
+    def is_complete(self):
+        return self.next_offset >= self.count
+
+def _iter_shifts(account, params, shops, employees=None, deadline=None, pages=None,
+                 refresh_names=None):
+    '''
+    pages through EmployeeHours matching params
+    :param shops: shop id to name map
+    :param employees: employee id to name map, if shifts should carry names
+    :param refresh_names: returns fresh shop and employee maps, for shifts
+                          with an ID the ones given don't have
+    :param deadline: stop paginating once this Deadline has passed
+    :param pages: ShiftPages to record progress in, to tell whether the
+                  deadline cut the fetch short
+    :return: a generator of Shifts. open shifts are measured up to the
+             time the fetch started
+    '''
+    now = int(time.time())
 
     for page in _call_api(f'API/Account/{account.account_id}/EmployeeHours.json',
-        account,
-        params={
+        account, params=params, deadline=deadline):
+
+        # if 0 shifts
+        if int(page['@attributes']['count']) == 0:
+            break
+
+        # if only one shift 
+        if not isinstance(page['EmployeeHours'], list):
+            page['EmployeeHours'] = [page['EmployeeHours']]
+
+        if pages is not None:
+            pages.count = int(page['@attributes']['count'])
+            pages.next_offset = (int(page['@attributes'].get('offset', 0)) +
+                                 len(page['EmployeeHours']))
+
+        for shift in page['EmployeeHours']:
+            if refresh_names is not None and (
+                    shift['shopID'] not in shops or
+                    (employees is not None and shift['employeeID'] not in employees)):
+                # added since the maps were cached
+                shops, employees = refresh_names()
+            yield Shift.from_api(shift, shops, employees, now=now)
+
+def _get_shifts(account, start_date, end_date, shops, employees=None,
+                deadline=None, pages=None, offset=0):
+    '''
+    Shifts checked in between start_date and end_date, most recent first
+    :param offset: where to pick up a fetch that was cut short
+    '''
+    params = {
         'checkIn': ['><', start_date, end_date],
         'orderby': 'employeeHoursID',
         'orderby_desc': '1', # most recent shifts first
-        'employeeID': employee_id
-    }):
+    }
+    if offset:
+        params['offset'] = str(offset)
 
-        num_shifts = int(page['@attributes']['count'])
-        if num_shifts != 0:
-            if not isinstance(page['EmployeeHours'], list):
-                page['EmployeeHours'] = [page['EmployeeHours']]
+    return _iter_shifts(account, params, shops, employees, deadline=deadline, pages=pages)
 
-            for shift in page['EmployeeHours']:
+def _period_key(account, start_date, end_date):
+    return (account.account_id, start_date.date(), end_date.date())
 
-                check_in = datetime.fromisoformat(shift['checkIn'])
-                if 'checkOut' in shift:
-                    check_out = datetime.fromisoformat(shift['checkOut'])
-                    shift_delta = check_out - check_in
-                else:
-                    check_out = None
-                    shift_delta = datetime.now(timezone.utc) - check_in
-                shift_time = shift_delta.total_seconds() / 3600
+def get_period_shifts(account, start_date, end_date, deadline=None):
+    '''
+    every shift the account has between the localized start_date and
+    end_date, with names. fetched once per account and range and shared by
+    the punch log and every employee's timecard until SHIFT_CACHE_SECONDS
+    have passed. after that it may be served stale while it's refetched
+    :param deadline: Deadline for this fetch. if it passes, the shifts so
+                     far are returned (and cached) as a partial period.
+                     only callers that pass one ever get a partial period,
+                     and they have to say so. without one, a partial
+                     period in the cache is fetched the rest of the way
+    :return: PeriodShifts
+    '''
+    def fetch(deadline):
+        fetched_at = time.time()
+        # the three endpoints share one shared slot
+        with scheduler.get_scheduler().fetch(account.account_id, deadline):
+            shops = map_shop_ids_to_names(account)
+            employees = map_employee_ids_to_names(account)
+            pages = ShiftPages()
+            shifts = list(_get_shifts(account, start_date, end_date, shops, employees,
+                                      deadline=deadline, pages=pages))
+        return PeriodShifts(start_date.date(), end_date.date(), shops, employees, shifts,
+                            fetched_at=fetched_at, total_count=pages.count,
+                            next_offset=None if pages.is_complete else pages.next_offset)
+
+    key = _period_key(account, start_date, end_date)
+    if admission.cache_only():
+        # over the admission limits, so whatever is cached will do however
+        # old it is, and nothing gets refreshed
+        entry = periodcache.peek(key)
+        if entry is None:
+            raise admission.LightspeedBusy('Period not cached.')
+        if entry.value.is_partial and deadline is None:
+            raise admission.LightspeedBusy('Only part of the period is cached.')
+        return entry.value
+
+    entry = periodcache.peek(key)
+    if entry is not None and entry.value.is_partial:
+        # a deadline cut the fetch that cached it short. carry on from there
+        period = get_more_period_shifts(account, start_date, end_date, deadline=deadline)
+    else:
+        # background refreshes aren't holding up a request, so they get no deadline
+        period = periodcache.get(key, lambda: fetch(deadline), refresher=lambda: fetch(None))
+
+    # the fetch this waited on may have been another request's, with a deadline
+    while period.is_partial and deadline is None:
+        period = get_more_period_shifts(account, start_date, end_date)
+    return period
+
+def get_more_period_shifts(account, start_date, end_date, deadline=None):
+    '''
+    carries on a partial period fetch from where its deadline stopped it
+    :return: PeriodShifts, complete or with more of the period than before
+    '''
+    key = _period_key(account, start_date, end_date)
+    entry = periodcache.peek(key)
+    if entry is None or not entry.value.is_partial or admission.cache_only():
+        return get_period_shifts(account, start_date, end_date, deadline=deadline)
+
+    period = entry.value
+    def fetch():
+        pages = ShiftPages()
+        shifts = list(_get_shifts(account, start_date, end_date, period.shops, period.employees,
+                                  deadline=deadline, pages=pages, offset=period.next_offset))
+        return period.extend(shifts, total_count=pages.count,
+                             next_offset=None if pages.is_complete else pages.next_offset)
+
+    return periodcache.fetch(key, fetch).value
+
+def _partial(period):
+    if period.is_partial:
+        return {'fetched': len(period.shifts), 'total': period.total_count}
+    return None
+
+def _fetch_period(account, start_date, end_date, deadline=None, more=False):
+    if more:
+        return get_more_period_shifts(account, start_date, end_date, deadline=deadline)
+    return get_period_shifts(account, start_date, end_date, deadline=deadline)
+
+def get_punch_log_by_employee(account, employee_id,
+                                start_date=None, end_date=None, deadline=None, more=False):
+    '''
+    :param deadline: Deadline for fetching from Lightspeed. see get_period_shifts
+    :param more: carry on a partial fetch instead of starting over
+    '''
+    start_date, end_date = _localize_range(account, start_date, end_date)
+
+    period = _fetch_period(account, start_date, end_date, deadline=deadline, more=more)
+    employee_shifts = period.for_employee(employee_id)
+    employee_totals = defaultdict(int)
 
-                employee_totals['total'] += shift_time
-                employee_totals[shops[shift['shopID']]] += shift_time
+    for shift in employee_shifts:
+        # totals only count closed hours. the page adds open shifts' running
+        # time in the browser, so it doesn't change every second
+        shift_time = 0 if shift.is_open else shift.shift_time
+        employee_totals['total'] += shift_time
+        employee_totals[shift.shop] += shift_time
 
-                employee_shifts.append({
-                    'check_in': check_in,
-                    'check_out': check_out,
-                    'shift_time': shift_time,
-                    'shop': shops[shift['shopID']]
-                })
+    clock = localtime.for_account(account, start_date.date(), end_date.date())
 
     return {
         'shifts': employee_shifts,
-        'totals': dict(employee_totals)
+        'rows': [display.shift_row(shift, clock) for shift in employee_shifts],
+        'totals': dict(employee_totals),
+        'overtime': overtime.for_account(account, clock).employee(
+            [shift for shift in employee_shifts if not shift.is_open]),
+        'running_shifts': [shift for shift in employee_shifts if shift.is_open],
+        'as_of': period.as_of,
+        'is_stale': period.is_stale,
+        'partial': _partial(period)
     }
 
-def get_punch_log(account, start_date=None, end_date=None):
-    # date wrangling
-    if not start_date:
-        start_date = datetime.combine(
-            date.today() - timedelta(weeks=2),
-            datetime.min.time()
-        )
-        end_date = datetime.combine(date.today(), datetime.max.time())
-    else:
-        start_date = datetime.combine(start_date, datetime.min.time())
-        end_date = datetime.combine(end_date, datetime.max.time())
+# one employee's line in the punch log's totals. overtime is None for
+# employees with no closed shifts
+EmployeeTotal = namedtuple('EmployeeTotal', ['employee_id', 'name', 'hours', 'overtime'])
 
-    start_date = pytz.timezone(str(account.timezone)).localize(start_date, is_dst=None)
-    end_date = pytz.timezone(str(account.timezone)).localize(end_date, is_dst=None)
+def get_punch_log(account, start_date=None, end_date=None, deadline=None, more=False):
+    '''
+    :param deadline: Deadline for fetching from Lightspeed. see get_period_shifts
+    :param more: carry on a partial fetch instead of starting over
+    :return: dict of the shifts by day and shop, with totals. employee
+             totals and overtime are keyed by employee ID, and listed
+             with names under 'employees'
+    '''
+    start_date, end_date = _localize_range(account, start_date, end_date)
 
     # counters
-    punch_log_dd = defaultdict(lambda: defaultdict(list))
+    # punch_log is nested day -> shop -> list of ShiftRows. it's built from
+    # plain dicts so it can go straight to the template without a copy
+    punch_log = dict()
+    period = _fetch_period(account, start_date, end_date, deadline=deadline, more=more)
+    shifts = period.shifts
     total_hours = 0
     shop_totals = defaultdict(float)
+    # by employee ID, since two employees can share a name
     employee_totals = defaultdict(float)
+    employee_names = dict()
 
-    # shops and employees
-    shops = map_shop_ids_to_names(account)
-    employees = map_employee_ids_to_names(account) 
+    clock = localtime.for_account(account, start_date.date(), end_date.date())
 
-    for page in _call_api(f'API/Account/{account.account_id}/EmployeeHours.json',
-        account,
-        params={
-            'checkIn': ['><', start_date, end_date],
-            'orderby': 'employeeHoursID',
-            'orderby_desc': '1', # most recent shifts first
-        }):
+    # days in the account's timezone
+    for shift_date, day_shifts in period.by_day(clock).items():
+        for shift in day_shifts:
+            # add totals. closed hours only, like get_punch_log_by_employee
+            shift_time = 0 if shift.is_open else shift.shift_time
+            total_hours += shift_time
+            shop_totals[shift.shop] += shift_time
+            employee_totals[shift.employee_id] += shift_time
+            employee_names[shift.employee_id] = shift.name
 
-        # if 0 shifts
-        if int(page['@attributes']['count']) == 0:
-            break
+            # append the shift's display row to proper location in nested dict
+            punch_log.setdefault(shift_date, {}).setdefault(shift.shop, []).append(
+                display.shift_row(shift, clock))
 
-        # if only one shift 
-        if not isinstance(page['EmployeeHours'], list):
-            page['EmployeeHours'] = [page['EmployeeHours']]
-        
-        for shift in page['EmployeeHours']:
+    employee_overtime = overtime.for_account(account, clock).compute(
+        [shift for shift in shifts if not shift.is_open])
 
-            # pull the check in date from the shift
-            # convert it to timezone associated with account
-            # truncate it to just a date and hold on to this info
-            check_in = datetime.fromisoformat(shift['checkIn'])
-            localized_check_in = check_in.astimezone(pytz.timezone(str(account.timezone)))
-            shift_date = localized_check_in.date()
-
-            # get employee and shop names
-            shop_name = shops[shift['shopID']]
-            employee_name = employees[shift['employeeID']]
-
-            # pull check out time or use current time
-            # calculate shift time
-            if 'checkOut' in shift:
-                check_out = datetime.fromisoformat(shift['checkOut'])
-                shift_delta = check_out - check_in
-            else:
-                check_out = None
-                shift_delta = datetime.now(timezone.utc) - check_in
-            shift_time = shift_delta.total_seconds() / 3600
+    return {
+        'punch_log': punch_log,
+        'total_hours': total_hours,
+        'shop_totals': dict(shop_totals),
+        'employee_totals': dict(employee_totals),
+        'overtime': employee_overtime,
+        # every open shift, for the page to add to the totals as they run.
+        # most days' rows are only loaded as they're scrolled to
+        'running_shifts': [shift for shift in shifts if shift.is_open],
+        # the totals to show, by name
+        'employees': [EmployeeTotal(employee_id, employee_names[employee_id], hours,
+                                    employee_overtime.get(employee_id))
+                      for employee_id, hours in sorted(
+                          employee_totals.items(),
+                          key=lambda item: (str(employee_names[item[0]]), item[0]))],
+        'anomaly_count': len(anomalies.find_anomalies(shifts)),
+        'as_of': period.as_of,
+        'is_stale': period.is_stale,
+        'partial': _partial(period)
+    }
 
-            # add totals
-            total_hours += shift_time
-            shop_totals[shop_name] += shift_time
-            employee_totals[employee_name] += shift_time
-
-            # append shift to proper location in nested dict
-            punch_log_dd[shift_date][shop_name].append({
-                'name': employee_name,
-                'check_in': check_in,
-                'check_out': check_out,
-                'shift_time': shift_time,
-            })
-
-    # now we have to convert all of our defaultdicts to dicts
-    # for proper template rendering
-    punch_log = dict()
-    for day in punch_log_dd:
-        punch_log[day] = dict(punch_log_dd[day])
+def get_punch_log_day(account, start_date, end_date, day, deadline=None):
+    '''
+    one day's block of get_punch_log, out of the same cached period
+    :param day: local date within start_date and end_date
+    :return: dict with the day and its shifts by shop
+    '''
+    start_date, end_date = _localize_range(account, start_date, end_date)
+
+    period = get_period_shifts(account, start_date, end_date, deadline=deadline)
+    clock = localtime.for_account(account, start_date.date(), end_date.date())
+
+    shops = dict()
+    for shift in period.by_day(clock).get(day, []):
+        shops.setdefault(shift.shop, []).append(display.shift_row(shift, clock))
 
     return {
-        'punch_log': punch_log,
+        'day': day,
+        'shops': shops,
+        'partial': _partial(period)
+    }
+
+def get_shift_log(account, start_date, end_date, employee_id=None, totals=True, deadline=None):
+    '''
+    the data behind get_punch_log and get_punch_log_by_employee, keyed by
+    shop and employee ID rather than by name, for the JSON API
+    :param employee_id: only this employee's shifts
+    :param totals: whether to add closed hour totals and overtime
+    :param deadline: Deadline for fetching from Lightspeed. see get_period_shifts
+    :return: dict with the shop (and, for all employees, employee) ID to
+             name maps and Shifts grouped by local day, most recent first
+    '''
+    start_date, end_date = _localize_range(account, start_date, end_date)
+
+    period = get_period_shifts(account, start_date, end_date, deadline=deadline)
+    if employee_id is None:
+        shifts = period.shifts
+    else:
+        shifts = period.for_employee(employee_id)
+    clock = localtime.for_account(account, start_date.date(), end_date.date())
+
+    if employee_id is None:
+        days = period.by_day(clock)
+    else:
+        days = dict()
+        for shift in shifts:
+            days.setdefault(clock.local_date(shift.check_in_ts), []).append(shift)
+
+    log = {
+        'shops': period.shops,
+        'employees': period.employees if employee_id is None else None,
+        'days': days,
+        'partial': _partial(period)
+    }
+
+    if totals:
+        shop_totals = defaultdict(float)
+        employee_totals = defaultdict(float)
+        for shift in shifts:
+            shift_time = 0 if shift.is_open else shift.shift_time
+            shop_totals[shift.shop_id] += shift_time
+            employee_totals[shift.employee_id] += shift_time
+
+        log['total_hours'] = sum(shop_totals.values())
+        log['shop_totals'] = dict(shop_totals)
+        log['employee_totals'] = dict(employee_totals)
+        log['overtime'] = overtime.for_account(account, clock).compute(
+            [shift for shift in shifts if not shift.is_open])
+
+    return log
+
+def get_staffing_coverage(account, start_date=None, end_date=None, slot_minutes=60):
+    '''
+    out of the same cached period as the punch log
+    '''
+    start_date, end_date = _localize_range(account, start_date, end_date)
+
+    period = _fetch_period(account, start_date, end_date)
+    clock = localtime.for_account(account, start_date.date(), end_date.date())
+
+    return coverage.staffing_grid(
+        period.shifts, clock, start_date.date(), end_date.date(), slot_minutes=slot_minutes)
+
+def get_anomalies(account, start_date=None, end_date=None):
+    '''
+    out of the same cached period as the punch log, so its count there
+    always matches this page
+    '''
+    start_date, end_date = _localize_range(account, start_date, end_date)
+
+    period = _fetch_period(account, start_date, end_date)
+
+    return {
+        'anomalies': anomalies.find_anomalies(period.shifts)
+    }
+
+def get_trends(account, num_periods=6, today=None, deadline=None, more=False):
+    '''
+    hours per pay period over the last num_periods periods, up to and
+    including the current one. the whole window is one period fetch
+    :param deadline: Deadline for fetching from Lightspeed. see get_period_shifts
+    :param more: carry on a partial fetch instead of starting over
+    '''
+    calendar = account.pay_period
+    current = calendar.index(today or localtime.today(account.timezone))
+    start, end = calendar.bounds(current - num_periods + 1)[0], calendar.bounds(current)[1]
+    start_date, end_date = _localize_range(account, start, end)
+
+    period = _fetch_period(account, start_date, end_date, deadline=deadline, more=more)
+    clock = localtime.for_account(account, start, end)
+
+    context = trends.period_trends(period.shifts, calendar, clock,
+                                   calendar.periods(start, end))
+    context['as_of'] = period.as_of
+    context['is_stale'] = period.is_stale
+    context['partial'] = _partial(period)
+    return context
+
+def get_period_summary(account, today=None, deadline=None):
+    '''
+    headline numbers for the account's current pay period, out of the
+    same cached period fetch as its punch log
+    :param deadline: Deadline for fetching from Lightspeed. see get_period_shifts
+    :return: dict of the period, closed hours overall and per shop, how
+             many shifts there were and how many are still open
+    '''
+    start, end = account.pay_period.get(today or localtime.today(account.timezone))
+    start_date, end_date = _localize_range(account, start, end)
+
+    period = get_period_shifts(account, start_date, end_date, deadline=deadline)
+
+    total_hours = 0
+    shop_totals = defaultdict(float)
+    open_shifts = 0
+    for shift in period.shifts:
+        if shift.is_open:
+            open_shifts += 1
+        else:
+            total_hours += shift.shift_time
+            shop_totals[shift.shop] += shift.shift_time
+
+    return {
+        'start': start,
+        'end': end,
         'total_hours': total_hours,
         'shop_totals': dict(shop_totals),
-        'employee_totals': dict(employee_totals)
+        'shift_count': len(period.shifts),
+        'open_shifts': open_shifts,
+        'as_of': period.as_of,
+        'is_stale': period.is_stale,
+        'partial': _partial(period)
     }
+
+# how many IDs go into one IN query, to keep URLs a sane length
+IN_QUERY_SIZE = 100
+
+def get_shift_changes(account, open_shift_ids, since=None, after_id=None):
+    '''
+    the shifts the alert engine needs to look at: every shift newer than
+    account.last_employee_hours_id, then the current state of the shifts
+    that were still open last time
+    :param open_shift_ids: employeeHoursIDs of shifts last seen open
+    :param since: datetime to start from when the account has never been
+                  synced, so the first sync doesn't walk all of history
+    :param after_id: cursor to use instead of account.last_employee_hours_id
+    :return: a generator of Shifts, with employee names
+    '''
+    def refresh_names():
+        return get_name_maps(account, refresh=True)
+
+    if after_id is None:
+        after_id = account.last_employee_hours_id
+
+    if after_id or not since:
+        params = {'employeeHoursID': ['>', str(after_id)]}
+    else:
+        params = {'checkIn': ['>', since]}
+    params['orderby'] = 'employeeHoursID'
+
+    yield from _iter_shifts(account, params, *get_name_maps(account),
+                            refresh_names=refresh_names)
+
+    open_shift_ids = sorted(open_shift_ids)
+    for chunk in range(0, len(open_shift_ids), IN_QUERY_SIZE):
+        ids = ','.join(str(shift_id) for shift_id in open_shift_ids[chunk:chunk + IN_QUERY_SIZE])
+        yield from _iter_shifts(account, {'employeeHoursID': ['IN', f'[{ids}]']},
+                                *get_name_maps(account), refresh_names=refresh_names)
@@ -0,0 +1,184 @@
+'''
+Compact records for EmployeeHours shifts
+'''
+import sys
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+def epoch_seconds(iso_string):
+    '''
+    converts an iso formatted timestamp from the API to integer epoch seconds
+    '''
+    return int(datetime.fromisoformat(iso_string).timestamp())
+
+
+class Shift():
+    '''
+    an immutable, slotted stand-in for a single EmployeeHours record.
+
+    times are kept as integer epoch seconds and converted to datetimes
+    only when a template asks for them. shop and employee names are
+    interned so every shift for the same person or shop shares one string.
+    '''
+    __slots__ = ('shift_id', 'employee_id', 'shop_id',
+                 'check_in_ts', 'check_out_ts', 'seconds',
+                 'name', 'shop')
+
+    def __init__(self, shift_id, employee_id, shop_id,
+                 check_in_ts, check_out_ts, seconds, name, shop):
+        init = object.__setattr__
+        init(self, 'shift_id', shift_id)
+        init(self, 'employee_id', employee_id)
+        init(self, 'shop_id', shop_id)
+        init(self, 'check_in_ts', check_in_ts)
+        init(self, 'check_out_ts', check_out_ts)
+        init(self, 'seconds', seconds)
+        init(self, 'name', sys.intern(name) if name else name)
+        init(self, 'shop', sys.intern(shop) if shop else shop)
+
+    @classmethod
+    def from_api(cls, shift, shops, employees=None, now=None):
+        '''
+        builds a Shift from a decoded EmployeeHours dict
+        :param shops: shop id to name map
+        :param employees: employee id to name map, if names are wanted
+        :param now: epoch seconds used to measure shifts with no check out
+        :return: a Shift
+        '''
+        check_in_ts = epoch_seconds(shift['checkIn'])
+        if 'checkOut' in shift:
+            check_out_ts = epoch_seconds(shift['checkOut'])
+            seconds = check_out_ts - check_in_ts
+        else:
+            check_out_ts = None
+            if now is None:
+                now = int(datetime.now(timezone.utc).timestamp())
+            seconds = now - check_in_ts
+
+        return cls(
+            int(shift['employeeHoursID']),
+            int(shift['employeeID']),
+            int(shift['shopID']),
+            check_in_ts,
+            check_out_ts,
+            seconds,
+            employees[shift['employeeID']] if employees is not None else None,
+            shops[shift['shopID']]
+        )
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Shift is immutable')
+
+    def __delattr__(self, key):
+        raise AttributeError('Shift is immutable')
+
+    def __reduce__(self):
+        return (Shift, (self.shift_id, self.employee_id, self.shop_id,
+                        self.check_in_ts, self.check_out_ts, self.seconds,
+                        self.name, self.shop))
+
+    def __eq__(self, other):
+        if not isinstance(other, Shift):
+            return NotImplemented
+        return self.__reduce__()[1] == other.__reduce__()[1]
+
+    def __hash__(self):
+        return hash(self.__reduce__()[1])
+
+    def __repr__(self):
+        return f'<Shift {self.shift_id} employee={self.employee_id} shop={self.shop_id}>'
+
+    @property
+    def is_open(self):
+        return self.check_out_ts is None
+
+    @property
+    def check_in(self):
+        return datetime.fromtimestamp(self.check_in_ts, timezone.utc)
+
+    @property
+    def check_out(self):
+        if self.check_out_ts is None:
+            return None
+        return datetime.fromtimestamp(self.check_out_ts, timezone.utc)
+
+    @property
+    def shift_time(self):
+        # hours, as the templates and totals have always used them
+        return self.seconds / 3600
+
+
+class PeriodShifts():
+    '''
+    every shift an account has in a date range, with the shop and employee
+    name maps they were built from, indexed by employee
+    '''
+    def __init__(self, start_date, end_date, shops, employees, shifts, fetched_at=None,
+                 total_count=None, next_offset=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.shops = shops
+        self.employees = employees
+        self.shifts = shifts
+        # epoch seconds when the fetch started, so pages can say how old
+        # the data they show is
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        # when a deadline cut the fetch short, how many shifts Lightspeed
+        # has in all and the offset to carry on from
+        self.total_count = total_count if total_count is not None else len(shifts)
+        self.next_offset = next_offset
+
+        self.by_employee = dict()
+        for shift in shifts:
+            self.by_employee.setdefault(str(shift.employee_id), []).append(shift)
+        # timezone name to the shifts by local day, see by_day
+        self._days = dict()
+
+    def for_employee(self, employee_id):
+        return self.by_employee.get(str(employee_id), [])
+
+    def by_day(self, clock):
+        '''
+        the shifts grouped by local check in date. worked out once per
+        timezone and kept, so each lazily loaded day of the punch log
+        doesn't go through the whole period again
+        :param clock: LocalClock for the account
+        :return: dict of date to Shifts, in the same order as shifts
+        '''
+        key = str(clock.tz)
+        days = self._days.get(key)
+        if days is None:
+            days = dict()
+            for shift in self.shifts:
+                days.setdefault(clock.local_date(shift.check_in_ts), []).append(shift)
+            self._days[key] = days
+        return days
+
+    @property
+    def is_partial(self):
+        return self.next_offset is not None
+
+    def extend(self, shifts, total_count, next_offset):
+        '''
+        a copy with the shifts from a follow up fetch added on. shifts
+        that moved across the page boundary in between are only kept once
+        '''
+        seen = {shift.shift_id for shift in self.shifts}
+        return PeriodShifts(self.start_date, self.end_date, self.shops, self.employees,
+                            self.shifts + [shift for shift in shifts if shift.shift_id not in seen],
+                            fetched_at=self.fetched_at, total_count=total_count,
+                            next_offset=next_offset)
+
+    @property
+    def as_of(self):
+        return datetime.fromtimestamp(self.fetched_at, timezone.utc)
+
+    @property
+    def is_stale(self):
+        '''
+        whether this is being served while a fresh copy is fetched
+        '''
+        return time.time() - self.fetched_at > settings.SHIFT_CACHE_SECONDS
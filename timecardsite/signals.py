@@ -1,13 +1,20 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save
 from django.dispatch import receiver
 
 from invitations.utils import get_invitation_model
 from invitations.signals import invite_accepted
 
-from timecardsite.models import Profile, InvitationMeta
+from timecardsite import db, prefetch, scheduler
+from timecardsite.models import Account, Profile, InvitationMeta
 
 @receiver(invite_accepted)
 def receive_invite_signal(sender, email, **kwargs):
+    # not queued: it's a few quick queries, and the new user is sent
+    # straight on to pages that need their Profile to exist already
     invite = get_invitation_model().objects.get(email=email)
     invite_meta = InvitationMeta.objects.get(invite=invite)
 
@@ -26,3 +33,22 @@ def receive_invite_signal(sender, email, **kwargs):
     )
     profile.save()
 
+@receiver(user_logged_in)
+def receive_login_signal(sender, request, user, **kwargs):
+    if settings.PREFETCH:
+        prefetch.prefetch_for_user(user)
+
+@receiver(connection_created)
+def receive_connection_created(sender, connection, **kwargs):
+    db.tune_connection(connection)
+
+@receiver(post_migrate)
+def receive_post_migrate_signal(sender, **kwargs):
+    # shared Lightspeed slots for the limits as they're set now
+    if sender.name == 'timecardsite':
+        scheduler.create_slots(Account.objects.values_list('account_id', flat=True))
+
+@receiver(post_save, sender=Account)
+def receive_account_saved_signal(sender, instance, created, **kwargs):
+    if created:
+        scheduler.create_slots([instance.account_id])
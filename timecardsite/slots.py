@@ -0,0 +1,148 @@
+'''
+Limits shared by every process, kept in the database.
+
+Counters in one process only see that process. Where a limit has to hold
+across gunicorn workers, sync workers and task workers on any host, each
+place under it is a Slot row, numbered 0 up to the limit within a scope
+and key (an account ID, say, or empty for an overall limit). Taking one
+is a conditional UPDATE of a row nobody holds, the way sync workers claim
+accounts, so two processes can never both get the same place.
+
+A slot is held until its holder gives it back or until it expires, so a
+process that dies holding slots only keeps them for that long.
+
+The rows are created up front by Limits.create, when the database is
+migrated and when an account is added (see signals.py), so taking and
+giving back a slot never has to insert anything.
+'''
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from timecardsite.models import Slot
+
+
+def new_owner():
+    '''
+    a name for one holder, unique across processes and hosts
+    '''
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+
+
+def _free(scope, key, limit, now):
+    return Slot.objects.filter(Q(owner='') | Q(expires__lt=now),
+                               scope=scope, key=key, number__lt=limit)
+
+
+def _rows(scope, key, limit):
+    return [Slot(scope=scope, key=key, number=number) for number in range(limit)]
+
+
+def acquire(scope, key, limit, owner, seconds, now=None):
+    '''
+    takes one of the `limit` slots of scope and key, if one is free. the
+    rows have to exist already, see Limits.create
+    :param owner: who holds it, unique to the holder. see new_owner
+    :param seconds: how long it's held for unless released or extended
+    :return: whether owner got one. if another holder takes the slot it
+             picked first, it's no even though others may be free.
+             callers treat that the same as every slot being taken
+    '''
+    now = now or timezone.now()
+    free = _free(scope, key, limit, now)
+    # one statement, so the slot it picks can't be taken in between
+    return free.filter(pk=Subquery(free.values('pk')[:1])).update(
+        owner=owner, expires=now + timedelta(seconds=seconds)) > 0
+
+
+def release(owner):
+    '''
+    gives back every slot owner holds
+    '''
+    Slot.objects.filter(owner=owner).update(owner='', expires=None)
+
+
+def held(scope, now=None):
+    '''
+    :return: dict of key to how many of its slots are held right now
+    '''
+    now = now or timezone.now()
+    counts = dict()
+    rows = (Slot.objects.filter(scope=scope, expires__gte=now).exclude(owner='')
+            .values_list('key', flat=True))
+    for key in rows:
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+OVERALL = 'overall'
+PER_KEY = 'per_key'
+
+
+class Ticket():
+    '''
+    the slots one holder took under a Limits
+    '''
+    def __init__(self, owner, key):
+        self.owner = owner
+        self.key = key
+
+
+class Limits():
+    '''
+    an overall limit and a limit per key (an account ID) taken together,
+    the way the scheduler and admission control count. a limit of 0
+    turns that check off
+    '''
+    def __init__(self, scope, limit, key_limit, seconds):
+        '''
+        :param seconds: how long a holder that never releases keeps its slots
+        '''
+        self.scope = scope
+        self.key_scope = f'{scope}_key'
+        self.limit = limit
+        self.key_limit = key_limit
+        self.seconds = seconds
+
+    def create(self, keys=()):
+        '''
+        creates the rows for the overall limit and for each key's, in one
+        statement. rows past a lowered limit are left, and never handed out
+        '''
+        rows = _rows(self.scope, '', self.limit)
+        for key in keys:
+            rows += _rows(self.key_scope, str(key), self.key_limit)
+        Slot.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def acquire(self, key):
+        '''
+        takes a slot under both limits, or neither
+        :param key: None for calls that don't belong to a key yet, which
+                    only count towards the overall limit
+        :return: (Ticket, None), or (None, OVERALL or PER_KEY) for the
+                 limit that was full
+        '''
+        ticket = Ticket(new_owner(), None if key is None else str(key))
+        if self.limit and not acquire(self.scope, '', self.limit, ticket.owner, self.seconds):
+            return None, OVERALL
+        if self.key_limit and key is not None and not acquire(
+                self.key_scope, ticket.key, self.key_limit, ticket.owner, self.seconds):
+            self.release(ticket)
+            return None, PER_KEY
+        return ticket, None
+
+    def release(self, ticket):
+        if self.limit or self.key_limit:
+            release(ticket.owner)
+
+    def held(self):
+        '''
+        :return: (slots held overall, dict of key to slots it holds)
+        '''
+        per_key = held(self.key_scope)
+        overall = held(self.scope).get('', 0) if self.limit else sum(per_key.values())
+        return overall, per_key
@@ -0,0 +1,69 @@
+// Open shifts are rendered with their check in time instead of their
+// hours, and totals only include closed hours, so the page stays the
+// same until the data really changes. This adds the running time back.
+//
+// .running-hours cells carry data-check-in (epoch seconds). .open-shift
+// markers carry it too, plus the data-shop and data-employee the shift
+// counts toward. The page sends a marker for every open shift, so the
+// totals are right before the days they're on are loaded. .closed-hours
+// totals carry data-closed and either data-total, data-shop or
+// data-employee.
+
+function runningHours(el, now) {
+    return Math.max(0, now - parseInt(el.attr('data-check-in'))) / 3600;
+}
+
+function tickOpenShifts() {
+    var now = Date.now() / 1000;
+    var total = 0;
+    var shops = {};
+    var employees = {};
+
+    $('.running-hours').each(function() {
+        var cell = $(this);
+        cell.text(runningHours(cell, now).toFixed(2));
+    });
+
+    $('.open-shift').each(function() {
+        var marker = $(this);
+        var hours = runningHours(marker, now);
+        var shop = marker.attr('data-shop');
+        var employee = marker.attr('data-employee');
+
+        total += hours;
+        shops[shop] = (shops[shop] || 0) + hours;
+        employees[employee] = (employees[employee] || 0) + hours;
+    });
+
+    $('.closed-hours').each(function() {
+        var el = $(this);
+        var hours = parseFloat(el.attr('data-closed'));
+
+        if(el.attr('data-total') !== undefined) {
+            hours += total;
+        }
+        else if(el.attr('data-shop') !== undefined) {
+            hours += shops[el.attr('data-shop')] || 0;
+        }
+        else if(el.attr('data-employee') !== undefined) {
+            hours += employees[el.attr('data-employee')] || 0;
+        }
+        el.text(hours.toFixed(2));
+    });
+}
+
+// ticks now, and every 30 seconds from the first time there's anything
+// open on the page. rows loaded later call it again
+var ticker = null;
+
+function startTicking() {
+    if(!$('.running-hours, .open-shift').length) {
+        return;
+    }
+    tickOpenShifts();
+    if(ticker === null) {
+        ticker = setInterval(tickOpenShifts, 30000);
+    }
+}
+
+$(document).ready(startTicking);
@@ -0,0 +1,264 @@
+'''
+Alert syncing spread over worker processes, on one host or several.
+
+Workers take accounts one at a time by claiming the account's SyncLease
+row. A claim is one conditional UPDATE, so no two workers ever hold the
+same account, and while an account syncs a heartbeat thread keeps pushing
+its lease's expiry back. If a worker dies its leases stop being extended,
+and once they run out (SYNC_LEASE_SECONDS) the accounts go to whichever
+worker asks next. A worker that loses a lease anyway (it stalled past
+the expiry, say) doesn't save that sync: the save first re-checks the
+lease in the same transaction, and gives up if someone else has it.
+
+A round syncs every onboarded account that hasn't been synced since the
+round started, so however many workers and hosts join in, each account
+is synced once per round. When the round started is kept in the
+SyncRound row, not taken from each host's clock as it joins, so a host
+joining late doesn't count accounts synced earlier in the round as due.
+A new round starts once every account has been synced in the last one.
+
+Workers pull accounts rather than being handed a fixed share, so a worker
+stuck on a slow account doesn't hold up the rest, and all of them stay
+busy until the round is done.
+'''
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from timecardsite import alerts
+from timecardsite.models import Account, SyncLease, SyncRound
+
+logger = logging.getLogger(__name__)
+
+# how many due accounts a worker looks at per claim. they're tried in a
+# random order so workers starting together don't all race for the first
+CLAIM_BATCH = 20
+
+
+def worker_name(number=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def ensure_leases():
+    '''
+    adds a lease row for every onboarded account that doesn't have one
+    '''
+    missing = Account.objects.filter(is_onboarded=True, synclease__isnull=True)
+    SyncLease.objects.bulk_create([SyncLease(account=account) for account in missing],
+                                  ignore_conflicts=True)
+
+
+def round_start(now=None):
+    '''
+    when the round in progress started, for every host. if the last round
+    is finished this starts the next one, unless another host just did
+    '''
+    now = now or timezone.now()
+    while True:
+        current, created = SyncRound.objects.get_or_create(pk=1, defaults={'started': now})
+        if created:
+            return current.started
+
+        unfinished = SyncLease.objects.filter(
+            Q(last_synced__isnull=True) | Q(last_synced__lt=current.started),
+            account__is_onboarded=True)
+        if unfinished.exists():
+            return current.started
+
+        if SyncRound.objects.filter(pk=1, started=current.started).update(started=now):
+            return now
+        # another host started it first. join that one
+
+
+def _claimable(before, now):
+    return SyncLease.objects.filter(
+        Q(owner='') | Q(expires__lt=now),
+        Q(last_synced__isnull=True) | Q(last_synced__lt=before),
+        account__is_onboarded=True
+    )
+
+
+def claim_next(owner, before, now=None):
+    '''
+    claims an account that is due and that nobody holds
+    :param before: accounts synced since then aren't due
+    :return: the claimed Account, or None when there's nothing left to claim
+    '''
+    now = now or timezone.now()
+    while True:
+        candidates = list(_claimable(before, now)
+                          .order_by(F('last_synced').asc(nulls_first=True))
+                          .values_list('account_id', flat=True)[:CLAIM_BATCH])
+        if not candidates:
+            return None
+
+        random.shuffle(candidates)
+        for account_id in candidates:
+            claimed = _claimable(before, now).filter(account_id=account_id).update(
+                owner=owner, expires=now + timedelta(seconds=settings.SYNC_LEASE_SECONDS))
+            if claimed:
+                return Account.objects.get(account_id=account_id)
+        # other workers took the whole batch. look again
+
+
+def extend(owner, account_id):
+    '''
+    pushes the lease's expiry back, if owner still holds it
+    :return: whether it did
+    '''
+    return SyncLease.objects.filter(account_id=account_id, owner=owner).update(
+        expires=timezone.now() + timedelta(seconds=settings.SYNC_LEASE_SECONDS)) == 1
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def check(owner, account_id):
+    '''
+    raises LeaseLost unless owner still holds the account's lease. run in
+    the transaction a sync is saved in, the UPDATE also keeps anyone from
+    claiming the lease until the save commits
+    '''
+    if not extend(owner, account_id):
+        raise LeaseLost(f'{owner} no longer holds {account_id}.')
+
+
+def release(owner, account_id):
+    '''
+    gives the lease up and records the account as synced this round,
+    whether or not the sync worked, so a failing account isn't retried
+    until the next one
+    '''
+    SyncLease.objects.filter(account_id=account_id, owner=owner).update(
+        owner='', expires=None, last_synced=timezone.now())
+
+
+class Heartbeat(threading.Thread):
+    '''
+    keeps a lease from running out while its account syncs
+    '''
+    daemon = True
+
+    def __init__(self, owner, account_id):
+        super().__init__(name='sync-heartbeat')
+        self.owner = owner
+        self.account_id = account_id
+        self.stopped = threading.Event()
+        # set once extending fails, so the sync isn't saved
+        self.lost = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.SYNC_LEASE_SECONDS / 3):
+                if not extend(self.owner, self.account_id):
+                    logger.warning('%s lost its lease on %s', self.owner, self.account_id)
+                    self.lost.set()
+                    return
+        finally:
+            # this thread's own connection, if the heartbeat ever fired
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class ShardStats():
+    '''
+    what one worker got through in a round
+    '''
+    def __init__(self, owner):
+        self.owner = owner
+        self.synced = 0
+        self.failed = 0
+        self.alerts = 0
+        self.seconds = 0.0
+        # (account ID, repr of the exception) for each failure
+        self.errors = []
+
+    @property
+    def rate(self):
+        '''
+        accounts per second
+        '''
+        return (self.synced + self.failed) / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f'{self.owner}: {self.synced} synced, {self.failed} failed, '
+                f'{self.alerts} new alerts in {self.seconds:.1f}s ({self.rate:.2f} accounts/s)')
+
+
+def run_worker(owner, before, sync=None):
+    '''
+    claims and syncs due accounts until there are none left
+    :param sync: what to do with each account, alerts.sync_account by
+                 default. it's passed a guard to call before saving,
+                 which raises LeaseLost if the lease has gone
+    :return: ShardStats
+    '''
+    sync = sync or alerts.sync_account
+    stats = ShardStats(owner)
+    started = time.monotonic()
+    try:
+        while True:
+            account = claim_next(owner, before)
+            if account is None:
+                break
+
+            heartbeat = Heartbeat(owner, account.account_id)
+
+            def guard():
+                if heartbeat.lost.is_set():
+                    raise LeaseLost(f'{owner} lost its lease on {account.account_id}.')
+                check(owner, account.account_id)
+
+            heartbeat.start()
+            try:
+                stats.alerts += len(sync(account, guard=guard))
+                stats.synced += 1
+            except Exception as e:
+                # one account's bad tokens shouldn't stop the rest
+                stats.failed += 1
+                stats.errors.append((account.account_id, repr(e)))
+            finally:
+                heartbeat.stop()
+                release(owner, account.account_id)
+    finally:
+        stats.seconds = time.monotonic() - started
+        close_old_connections()
+    return stats
+
+
+def _run_shard(number, before):
+    return run_worker(worker_name(number), before)
+
+
+def run_round(workers=1, before=None):
+    '''
+    syncs every due account, over `workers` processes
+    :param before: accounts synced since then are skipped. defaults to
+                   the start of the round in progress, see round_start
+    :return: list of ShardStats, one per worker
+    '''
+    ensure_leases()
+    before = before or round_start()
+
+    if workers == 1:
+        return [run_worker(worker_name(), before)]
+
+    # children mustn't share the parent's database connections
+    connections.close_all()
+    with multiprocessing.Pool(workers, initializer=django.setup) as pool:
+        return pool.starmap(_run_shard, [(number, before) for number in range(workers)])
@@ -0,0 +1,278 @@
+'''
+A small task queue kept in the database, for work that shouldn't hold up
+a request, without running a separate broker.
+
+Functions decorated with @task are queued with func.enqueue(...) and run
+by `manage.py run_workers`. Each queued call is a Task row, and a worker
+claims one the way sync workers claim accounts: it takes the row for
+TASK_TIMEOUT_SECONDS, and if it hasn't finished by then the task is due
+again for any worker. Where the database has SELECT ... FOR UPDATE SKIP
+LOCKED (PostgreSQL) workers pass over rows others are claiming. SQLite
+has no row locks, but it only lets one writer in at a time, so there a
+claim is a conditional UPDATE that only one worker can win.
+
+A task that raises is retried after TASK_RETRY_BACKOFF_SECONDS, doubling
+with each attempt, until it has had max_attempts. One that runs out of
+time on its last attempt is marked failed by the next worker to look for
+work, which frees its dedupe_key. Arguments go through
+JSON, so pass IDs rather than model instances.
+'''
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from timecardsite.models import Task
+from timecardsite.sync import worker_name
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+PENDING = (QUEUED, RUNNING)
+# tries at queueing a deduplicated task when the one it clashed with keeps
+# finishing before it can be returned
+ENQUEUE_ATTEMPTS = 3
+
+# how many due tasks a worker looks at per claim without SKIP LOCKED
+CLAIM_BATCH = 20
+
+# task name to (function, max attempts)
+_registry = dict()
+
+
+def task(name=None, max_attempts=3):
+    '''
+    registers a function as a task and gives it an enqueue method taking
+    the same arguments, plus dedupe_key and delay (seconds)
+    :param name: what it's queued as. defaults to module.function
+    '''
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        _registry[task_name] = (func, max_attempts)
+
+        def enqueue_call(*args, dedupe_key=None, delay=0, **kwargs):
+            return enqueue(task_name, args, kwargs, dedupe_key=dedupe_key, delay=delay)
+
+        func.task_name = task_name
+        func.enqueue = enqueue_call
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, dedupe_key=None, delay=0):
+    '''
+    queues a call to a registered task
+    :param dedupe_key: if a task with this key is already queued or
+                       running, nothing new is queued and that one is
+                       returned instead
+    :param delay: seconds to wait before it's due
+    :return: the Task
+    '''
+    max_attempts = _registry[name][1]
+    for attempt in range(ENQUEUE_ATTEMPTS):
+        try:
+            # a savepoint, so a duplicate doesn't spoil the caller's transaction
+            with transaction.atomic():
+                return Task.objects.create(
+                    name=name, args=list(args), kwargs=kwargs or dict(),
+                    dedupe_key=dedupe_key, max_attempts=max_attempts,
+                    run_at=timezone.now() + timedelta(seconds=delay)
+                )
+        except IntegrityError:
+            # only the dedupe key can clash
+            if dedupe_key is None or attempt == ENQUEUE_ATTEMPTS - 1:
+                raise
+            existing = Task.objects.filter(dedupe_key=dedupe_key, status__in=PENDING).first()
+            if existing is not None:
+                return existing
+            # it finished in between. queue ours after all
+
+
+def _due(now):
+    return Task.objects.filter(
+        Q(status=QUEUED, run_at__lte=now) |
+        # a worker took it and then died, or it ran out of time
+        Q(status=RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts'))
+    )
+
+
+def fail_expired(now=None):
+    '''
+    fails running tasks that ran out of time on their last attempt, which
+    would otherwise stay running and hold their dedupe_key forever
+    :return: how many there were
+    '''
+    now = now or timezone.now()
+    return Task.objects.filter(
+        status=RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts')
+    ).update(status=FAILED, owner='', locked_until=None, finished=now,
+             last_error='Ran out of time on its last attempt.')
+
+
+def _claim(task_id, owner, now):
+    '''
+    :return: whether owner got the task
+    '''
+    return _due(now).filter(pk=task_id).update(
+        status=RUNNING, owner=owner, attempts=F('attempts') + 1, started=now,
+        locked_until=now + timedelta(seconds=settings.TASK_TIMEOUT_SECONDS)) == 1
+
+
+def claim_next(owner, now=None):
+    '''
+    claims the task that has been due longest
+    :return: the claimed Task, or None when nothing is due
+    '''
+    now = now or timezone.now()
+    fail_expired(now)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            task_id = (_due(now).select_for_update(skip_locked=True)
+                       .order_by('run_at').values_list('pk', flat=True).first())
+            if task_id is None:
+                return None
+            _claim(task_id, owner, now)
+        return Task.objects.get(pk=task_id)
+
+    while True:
+        candidates = list(_due(now).order_by('run_at')
+                          .values_list('pk', flat=True)[:CLAIM_BATCH])
+        if not candidates:
+            return None
+        for task_id in candidates:
+            if _claim(task_id, owner, now):
+                return Task.objects.get(pk=task_id)
+        # other workers took the whole batch. look again
+
+
+def backoff(attempts):
+    '''
+    seconds before a task that has failed `attempts` times is tried again
+    '''
+    return settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+
+
+def run(task):
+    '''
+    runs a claimed task and records how it went. if the worker has lost
+    the task to another in the meantime, nothing is recorded
+    :return: DONE, QUEUED (to be retried) or FAILED
+    '''
+    started = time.monotonic()
+    try:
+        if task.name not in _registry:
+            raise LookupError(f'No task called {task.name}.')
+        func = _registry[task.name][0]
+        func(*task.args, **task.kwargs)
+    except Exception as e:
+        logger.warning('Task %s (%s) failed', task.pk, task.name, exc_info=True)
+        outcome = QUEUED if task.attempts < task.max_attempts else FAILED
+        fields = {'status': outcome, 'last_error': repr(e)[:255]}
+        if outcome == QUEUED:
+            fields['run_at'] = timezone.now() + timedelta(seconds=backoff(task.attempts))
+    else:
+        outcome = DONE
+        fields = {'status': DONE}
+
+    now = timezone.now()
+    Task.objects.filter(pk=task.pk, owner=task.owner, status=RUNNING).update(
+        owner='', locked_until=None, finished=now,
+        waited=max((task.started - task.run_at).total_seconds(), 0.0),
+        seconds=time.monotonic() - started, **fields)
+    return outcome
+
+
+class WorkerStats():
+    '''
+    what one worker got through
+    '''
+    def __init__(self, owner):
+        self.owner = owner
+        self.done = 0
+        self.retried = 0
+        self.failed = 0
+
+    def __str__(self):
+        return f'{self.owner}: {self.done} done, {self.retried} to retry, {self.failed} failed'
+
+
+def run_worker(owner, stop=None, drain=False):
+    '''
+    claims and runs tasks until stopped
+    :param stop: threading.Event that stops the worker once it's set
+    :param drain: stop as soon as nothing is due instead of polling
+    :return: WorkerStats
+    '''
+    stats = WorkerStats(owner)
+    stop = stop or threading.Event()
+    try:
+        while not stop.is_set():
+            task = claim_next(owner)
+            if task is None:
+                if drain:
+                    break
+                stop.wait(settings.TASK_POLL_SECONDS)
+                continue
+
+            outcome = run(task)
+            if outcome == DONE:
+                stats.done += 1
+            elif outcome == QUEUED:
+                stats.retried += 1
+            else:
+                stats.failed += 1
+    finally:
+        close_old_connections()
+    return stats
+
+
+def run_workers(concurrency=1, stop=None, drain=False):
+    '''
+    runs `concurrency` workers on threads of this process
+    :return: list of WorkerStats, one per worker
+    '''
+    results = [None] * concurrency
+
+    def work(number):
+        try:
+            results[number] = run_worker(worker_name(number), stop=stop, drain=drain)
+        finally:
+            # this thread's own connection
+            connection.close()
+
+    threads = [threading.Thread(target=work, args=(number,), name=f'task-worker-{number}')
+               for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def stats():
+    '''
+    :return: dict of task name to how many of them are in each status,
+             and the mean and longest time finished ones waited to start
+             and took to run, in seconds
+    '''
+    by_name = dict()
+    rows = (Task.objects.values('name', 'status')
+            .annotate(count=Count('pk'),
+                      mean_waited=Avg('waited'), max_waited=Max('waited'),
+                      mean_seconds=Avg('seconds'), max_seconds=Max('seconds'))
+            .order_by('name'))
+    for row in rows:
+        name = by_name.setdefault(row['name'], {status: 0 for status, _ in Task.statuses})
+        name[row['status']] = row['count']
+        if row['status'] == DONE:
+            for key in ('mean_waited', 'max_waited', 'mean_seconds', 'max_seconds'):
+                name[key] = row[key]
+    return by_name
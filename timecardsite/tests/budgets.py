@@ -0,0 +1,117 @@
+'''
+Query and outbound call budgets for views.
+
+Every budgeted view has an entry in budgets.json recording how many
+database queries it makes and how many times it calls `services._call`
+(one call per page of Lightspeed data). Tests render the view against
+a fake Lightspeed API and fail if either count moves, in either direction,
+so that budget changes always show up in a diff.
+'''
+import json
+import os
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'budgets.json')
+
+
+def load_budgets():
+    with open(BUDGETS_FILE) as bf:
+        return json.load(bf)
+
+
+class FakeLightspeed():
+    '''
+    stands in for `services._call`. answers Shop, Employee and EmployeeHours
+    endpoints from in-memory data and paginates EmployeeHours the same way
+    the real API does, so extra pages show up as extra calls
+    '''
+    def __init__(self, shops, employees, shifts, page_size=100):
+        self.shops = shops
+        self.employees = employees
+        self.shifts = shifts
+        self.page_size = page_size
+        self.endpoints = []
+
+    def _page(self, key, items, params):
+        offset = int((params or {}).get('offset', 0))
+        page = items[offset:offset + self.page_size]
+        return {
+            '@attributes': {
+                'count': str(len(items)),
+                'offset': str(offset),
+                'limit': str(self.page_size)
+            },
+            key: page
+        }
+
+    def _filter_shifts(self, params):
+        shifts = self.shifts
+        if 'employeeID' in params:
+            shifts = [shift for shift in shifts
+                      if shift['employeeID'] == params['employeeID']]
+
+        if 'employeeHoursID' in params:
+            op, value = params['employeeHoursID'].split(',', 1)
+            if op == '>':
+                shifts = [shift for shift in shifts
+                          if int(shift['employeeHoursID']) > int(value)]
+            elif op == 'IN':
+                ids = set(value.strip('[]').split(','))
+                shifts = [shift for shift in shifts
+                          if shift['employeeHoursID'] in ids]
+        return shifts
+
+    def __call__(self, endpoint, account, params):
+        self.endpoints.append(endpoint)
+
+        if endpoint.endswith('/Shop.json'):
+            return self._page('Shop', self.shops, params)
+        elif endpoint.endswith('/Employee.json'):
+            return self._page('Employee', self.employees, params)
+        elif endpoint.endswith('/EmployeeHours.json'):
+            return self._page('EmployeeHours', self._filter_shifts(params or {}), params)
+
+        raise AssertionError(f'FakeLightspeed has no data for {endpoint}')
+
+
+class BudgetAssertionsMixin():
+    '''
+    mixin for TestCase. `assertWithinBudget('aggregate', lightspeed)` wraps
+    a block and compares its query and call counts to budgets.json
+    '''
+    budgets = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.budgets = load_budgets()
+
+    @contextmanager
+    def assertWithinBudget(self, name, lightspeed):
+        budget = self.budgets[name]
+
+        with CaptureQueriesContext(connection) as queries, \
+             patch('timecardsite.services._call', side_effect=lightspeed) as mocked_call:
+            yield
+
+        query_count = len(queries.captured_queries)
+        call_count = mocked_call.call_count
+
+        problems = []
+        if query_count != budget['queries']:
+            problems.append(
+                f"{query_count} queries (budget {budget['queries']}):\n" +
+                '\n'.join('    ' + q['sql'] for q in queries.captured_queries))
+        if call_count != budget['calls']:
+            problems.append(
+                f"{call_count} Lightspeed calls (budget {budget['calls']}):\n" +
+                '\n'.join('    ' + endpoint for endpoint in lightspeed.endpoints))
+
+        if problems:
+            self.fail(
+                f"'{name}' is off budget. If this is intended, update "
+                f"timecardsite/tests/budgets.json.\n" + '\n'.join(problems))
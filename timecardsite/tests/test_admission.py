@@ -0,0 +1,127 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import ignore_warnings
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+
+from timecardsite import admission, periodcache
+from timecardsite.admission import AdmissionController
+from timecardsite.models import Account, Profile
+from timecardsite.tests import generate_random_token
+from timecardsite.tests.test_budgets import build_lightspeed
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def test_worker_limit(self):
+        controller = AdmissionController(2, 0)
+
+        self.assertTrue(controller.admit('a'))
+        self.assertTrue(controller.admit('b'))
+        self.assertFalse(controller.admit('c'))
+
+        controller.release('a')
+        self.assertTrue(controller.admit('c'))
+        self.assertEqual(controller.stats()['over_worker_limit'], 1)
+
+    def test_account_limit_leaves_room_for_others(self):
+        controller = AdmissionController(0, 1)
+
+        self.assertTrue(controller.admit('a'))
+        self.assertFalse(controller.admit('a'))
+        self.assertTrue(controller.admit('b'))
+
+        stats = controller.stats()
+        self.assertEqual(stats['over_account_limit'], 1)
+        self.assertEqual(stats['inflight'], 2)
+        self.assertEqual(stats['accounts_inflight'], {'a': 1, 'b': 1})
+
+    def test_released_accounts_are_forgotten(self):
+        controller = AdmissionController(0, 0)
+        controller.admit('a')
+        controller.release('a')
+
+        self.assertEqual(controller.stats()['accounts_inflight'], {})
+
+
+class AdmissionMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ignore_warnings(message="No directory at", module="whitenoise.base").enable()
+
+        user = get_user_model().objects.create_user(email='manager@user.com',
+                                                    password='managerpassword')
+        cls.account = Account.objects.create(
+            account_id=generate_random_token(5),
+            access_token=generate_random_token(),
+            refresh_token=generate_random_token(),
+            name='Manager Store for Managers',
+            timezone='America/Boise',
+            pay_period_type='biweekly',
+            pay_period_reference_date=date(2021, 5, 29),
+            is_onboarded=True
+        )
+        Profile.objects.create(user=user, account=cls.account, role='mgr',
+                               employee_id='1', name='Ex1 Employee')
+
+    def setUp(self):
+        periodcache.clear()
+        self.lightspeed = build_lightspeed()
+        self.controller = AdmissionController(1, 0)
+        patcher = patch('timecardsite.admission._controller', self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+    def get(self, name):
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            return self.client.get(reverse(name))
+
+    def test_admitted_requests_are_released(self):
+        response = self.get('aggregate')
+
+        self.assertEqual(response.status_code, 200)
+        stats = self.controller.stats()
+        self.assertEqual(stats['admitted'], 1)
+        self.assertEqual(stats['inflight'], 0)
+
+    def test_over_the_limit_is_served_from_cache(self):
+        self.get('aggregate')
+        calls = len(self.lightspeed.endpoints)
+
+        # something else holds the only slot
+        self.controller.admit('other')
+        response = self.get('aggregate')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.lightspeed.endpoints), calls)
+        self.assertEqual(self.controller.stats()['served_from_cache'], 1)
+
+    def test_over_the_limit_without_cache_is_shed(self):
+        self.controller.admit('other')
+
+        response = self.get('aggregate')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(self.lightspeed.endpoints, [])
+        self.assertEqual(self.controller.stats()['shed'], 1)
+        # the request running cache only doesn't leak into the next one
+        self.assertFalse(admission.cache_only())
+
+    def test_api_is_shed_with_json(self):
+        self.controller.admit('other')
+
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            response = self.client.get(reverse('api_punch_log'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('error', response.json())
+
+    def test_other_views_are_not_counted(self):
+        self.controller.admit('other')
+
+        self.client.get(reverse('lightspeed_status'))
+
+        self.assertEqual(self.controller.stats()['admitted'], 1)
@@ -0,0 +1,203 @@
+from datetime import datetime, time, timedelta, timezone
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from timecardsite import alerts, sync
+from timecardsite.tests import generate_random_account
+from timecardsite.tests.budgets import FakeLightspeed
+from timecardsite.shifts import Shift
+from timecardsite.models import Alert, EmployeeAlertState, Membership, OpenShift, Profile
+
+def api_shift(shift_id, employee_id, shop_id, check_in, hours=None):
+    shift = {
+        'employeeHoursID': str(shift_id),
+        'checkIn': check_in.isoformat(timespec='seconds'),
+        'employeeID': str(employee_id),
+        'shopID': str(shop_id)
+    }
+    if hours is not None:
+        shift['checkOut'] = (check_in + timedelta(hours=hours)).isoformat(timespec='seconds')
+    return shift
+
+class AlertEngineTests(TestCase):
+    def setUp(self):
+        self.account = generate_random_account()
+        self.account.save()
+
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Shop 1'}, {'shopID': '2', 'name': 'Shop 2'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[])
+
+    def sync(self):
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            return alerts.sync_account(self.account)
+
+    def test_long_open_shift_raises_one_alert(self):
+        self.lightspeed.shifts.append(api_shift(1, 1, 1, self.now - timedelta(hours=11)))
+
+        [alert] = self.sync()
+        self.assertEqual(alert.kind, 'long')
+        self.assertIn('Ex1 Employee', alert.message)
+
+        # seen again next sync, but already alerted
+        self.assertEqual(self.sync(), [])
+        self.assertEqual(Alert.objects.count(), 1)
+
+    def test_nothing_is_saved_when_the_guard_refuses(self):
+        self.lightspeed.shifts.append(api_shift(1, 1, 1, self.now - timedelta(hours=11)))
+        def guard():
+            raise sync.LeaseLost('gone')
+
+        with patch('timecardsite.services._call', side_effect=self.lightspeed), \
+                self.assertRaises(sync.LeaseLost):
+            alerts.sync_account(self.account, guard=guard)
+
+        self.assertFalse(Alert.objects.exists())
+        self.assertFalse(OpenShift.objects.exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.last_employee_hours_id, 0)
+
+    def test_open_shifts_are_tracked_until_closed(self):
+        self.lightspeed.shifts.append(api_shift(1, 1, 1, self.now - timedelta(hours=2)))
+        self.sync()
+        self.assertTrue(OpenShift.objects.filter(employee_hours_id=1).exists())
+        self.assertEqual(self.account.last_employee_hours_id, 1)
+
+        self.lightspeed.shifts[0] = api_shift(1, 1, 1, self.now - timedelta(hours=2), hours=1)
+        self.sync()
+
+        self.assertFalse(OpenShift.objects.exists())
+        self.assertEqual(EmployeeAlertState.objects.get(employee_id='1').week_seconds, 3600)
+
+    def test_only_new_and_open_shifts_are_fetched(self):
+        self.lightspeed.shifts.append(api_shift(1, 1, 1, self.now - timedelta(hours=3), hours=1))
+        self.sync()
+        self.lightspeed.shifts.append(api_shift(2, 1, 1, self.now - timedelta(hours=1)))
+
+        with patch('timecardsite.alerts.AlertEngine.ingest') as mocked_ingest:
+            self.sync()
+
+        [(shift,), _] = mocked_ingest.call_args
+        self.assertEqual(mocked_ingest.call_count, 1)
+        self.assertEqual(shift.shift_id, 2)
+
+    def test_approaching_overtime_raises_alert_once_per_week(self):
+        state = EmployeeAlertState.objects.create(account=self.account, employee_id='1')
+        engine = alerts.AlertEngine(self.account)
+        week = engine.calculator.week_of(engine.clock.local_day(int(self.now.timestamp())))
+        state.week = week
+        state.week_seconds = 35 * 3600
+        state.save()
+
+        self.lightspeed.shifts.append(api_shift(1, 1, 1, self.now - timedelta(hours=2), hours=1.5))
+        self.lightspeed.shifts.append(api_shift(2, 1, 1, self.now - timedelta(minutes=20), hours=0.25))
+
+        self.assertEqual([alert.kind for alert in self.sync()], ['overtime'])
+
+    def test_late_shift_from_an_earlier_week_is_not_counted_against_this_one(self):
+        state = EmployeeAlertState.objects.create(account=self.account, employee_id='1')
+        engine = alerts.AlertEngine(self.account)
+        state.week = engine.calculator.week_of(engine.today)
+        state.week_seconds = 35 * 3600
+        state.save()
+
+        # only just synced, from two weeks back
+        self.lightspeed.shifts.append(api_shift(1, 1, 1, self.now - timedelta(weeks=2), hours=2))
+        self.account.last_employee_hours_id = 0
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            engine = alerts.AlertEngine(self.account)
+            for shift in alerts.services.get_shift_changes(self.account, set()):
+                engine.ingest(shift)
+
+        self.assertEqual(engine.alerts, [])
+        self.assertEqual(engine.states['1'].week_seconds, 35 * 3600)
+
+    def test_today_is_the_accounts_local_day(self):
+        # 3 AM UTC on June 2nd is still June 1st in Boise
+        now = int(datetime(2021, 6, 2, 3, tzinfo=timezone.utc).timestamp())
+        engine = alerts.AlertEngine(self.account, now=now)
+
+        self.assertEqual(engine.today, engine.clock.local_day(now))
+        self.assertEqual(engine.clock.local_date(now).isoformat(), '2021-06-01')
+
+    def test_unusual_shop_needs_history(self):
+        EmployeeAlertState.objects.create(account=self.account, employee_id='1',
+                                          shops='1', shift_count=10)
+        self.lightspeed.shifts.append(api_shift(1, 1, 2, self.now - timedelta(hours=2), hours=1))
+
+        [alert] = self.sync()
+        self.assertEqual(alert.kind, 'shop')
+        self.assertEqual(EmployeeAlertState.objects.get(employee_id='1').shop_ids, {1, 2})
+
+    def test_no_clock_out_by_close(self):
+        check_in = self.now - timedelta(hours=3)
+        self.account.closing_time = time(0, 0)
+        engine = alerts.AlertEngine(self.account,
+                                    now=int((check_in + timedelta(days=1)).timestamp()))
+        shift = Shift(1, 1, 1, int(check_in.timestamp()), None, 3 * 3600, 'Ex1 Employee', 'Shop 1')
+
+        self.assertTrue(alerts.NoClockOutRule()(engine, shift, engine._state(1)))
+
+class AlertDigestTests(TestCase):
+    def test_digest_is_sent_to_managers_once(self):
+        account = generate_random_account()
+        account.save()
+        manager = get_user_model().objects.create_user(email='manager@user.com', password='x')
+        Profile.objects.create(user=manager, account=account, role='mgr')
+        Alert.objects.create(account=account, employee_id='1', kind='long',
+                             key='long:1', message='Ex1 Employee has been clocked in for 11 hours')
+        Alert.objects.create(account=account, employee_id='1', kind='shop',
+                             key='shop:1', message='Ex1 Employee clocked in at Shop 2')
+
+        self.assertEqual(alerts.send_digests(), 2)
+        self.assertEqual(alerts.send_digests(), 0)
+
+        [email] = mail.outbox
+        self.assertEqual(email.to, ['manager@user.com'])
+        self.assertIn('clocked in for 11 hours', email.body)
+        self.assertIn('Shop 2', email.body)
+
+    def test_digest_goes_to_owners_managing_through_a_membership(self):
+        account = generate_random_account()
+        account.save()
+        manager = get_user_model().objects.create_user(email='manager@user.com', password='x')
+        Profile.objects.create(user=manager, account=account, role='mgr')
+        owner = get_user_model().objects.create_user(email='owner@user.com', password='x')
+        owner_account = generate_random_account()
+        owner_account.save()
+        Profile.objects.create(user=owner, account=owner_account, role='mgr')
+        Membership.objects.create(user=owner, account=account)
+        Alert.objects.create(account=account, employee_id='1', kind='long',
+                             key='long:1', message='Ex1 Employee has been clocked in for 11 hours')
+
+        alerts.send_digests()
+
+        [email] = mail.outbox
+        self.assertEqual(email.to, ['manager@user.com', 'owner@user.com'])
+
+    def test_alerts_claimed_by_another_sender_are_left_to_it(self):
+        account = generate_random_account()
+        account.save()
+        manager = get_user_model().objects.create_user(email='manager@user.com', password='x')
+        Profile.objects.create(user=manager, account=account, role='mgr')
+        claimed = Alert.objects.create(
+            account=account, employee_id='1', kind='long', key='long:1',
+            message='Ex1 Employee has been clocked in for 11 hours', claimed_by='other sync',
+            claim_expires=datetime.now(timezone.utc) + timedelta(minutes=5))
+        Alert.objects.create(account=account, employee_id='1', kind='shop',
+                             key='shop:1', message='Ex1 Employee clocked in at Shop 2')
+
+        self.assertEqual(alerts.send_digests(), 1)
+        self.assertNotIn('11 hours', mail.outbox[0].body)
+
+        # the other sender died before sending it
+        Alert.objects.filter(pk=claimed.pk).update(
+            claim_expires=datetime.now(timezone.utc) - timedelta(minutes=1))
+        self.assertEqual(alerts.send_digests(), 1)
+        self.assertIn('11 hours', mail.outbox[1].body)
+        self.assertFalse(Alert.objects.exclude(claimed_by='').exists())
@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+
+from timecardsite.anomalies import (find_anomalies, DUPLICATE, OVERLAP,
+                                    OPEN, LONG)
+from timecardsite.shifts import Shift
+
+HOUR = 3600
+
+def shift(shift_id, employee_id, start, end, open=False):
+    return Shift(shift_id, employee_id, 1, start, None if open else end,
+                 end - start, f'Employee {employee_id}', 'Shop')
+
+class AnomalyTests(SimpleTestCase):
+    def test_clean_shifts_have_no_anomalies(self):
+        shifts = [shift(1, 1, 0, 8 * HOUR), shift(2, 1, 8 * HOUR, 16 * HOUR),
+                  shift(3, 2, 0, 8 * HOUR)]
+
+        self.assertEqual(find_anomalies(shifts), [])
+
+    def test_overlapping_shifts_are_flagged(self):
+        first = shift(1, 1, 0, 8 * HOUR)
+        second = shift(2, 1, 7 * HOUR, 10 * HOUR)
+
+        [anomaly] = find_anomalies([second, first])
+
+        self.assertEqual(anomaly.kind, OVERLAP)
+        self.assertEqual(anomaly.shift, second)
+        self.assertEqual(anomaly.other, first)
+
+    def test_long_shift_swallowing_others_is_reported_against_each(self):
+        long = shift(1, 1, 0, 11 * HOUR)
+        shifts = [long, shift(2, 1, HOUR, 2 * HOUR), shift(3, 1, 3 * HOUR, 4 * HOUR)]
+
+        anomalies = find_anomalies(shifts)
+
+        self.assertEqual([anomaly.kind for anomaly in anomalies], [OVERLAP, OVERLAP])
+        self.assertTrue(all(anomaly.other == long for anomaly in anomalies))
+
+    def test_different_employees_do_not_overlap(self):
+        shifts = [shift(1, 1, 0, 8 * HOUR), shift(2, 2, HOUR, 9 * HOUR)]
+
+        self.assertEqual(find_anomalies(shifts), [])
+
+    def test_duplicate_punches_are_flagged(self):
+        shifts = [shift(1, 1, 0, 8 * HOUR), shift(2, 1, 30, 8 * HOUR + 10)]
+
+        [anomaly] = find_anomalies(shifts)
+
+        self.assertEqual(anomaly.kind, DUPLICATE)
+
+    def test_open_and_long_shifts_are_flagged(self):
+        shifts = [shift(1, 1, 0, 20 * HOUR, open=True),
+                  shift(2, 2, 0, 13 * HOUR),
+                  shift(3, 3, 0, 2 * HOUR, open=True)]
+
+        self.assertEqual(
+            sorted((anomaly.kind, anomaly.shift.shift_id) for anomaly in find_anomalies(shifts)),
+            [(LONG, 2), (OPEN, 1)])
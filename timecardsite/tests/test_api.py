@@ -0,0 +1,152 @@
+import gzip
+import json
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test.utils import ignore_warnings
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+
+from timecardsite import periodcache
+from timecardsite.tests import generate_random_token
+from timecardsite.tests.budgets import FakeLightspeed
+from timecardsite.models import Account, Profile
+
+
+def boise(year, month, day, hour):
+    # Boise is UTC-6 in June
+    return datetime(year, month, day, hour + 6, tzinfo=timezone.utc).isoformat()
+
+
+class ShiftLogApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ignore_warnings(message="No directory at", module="whitenoise.base").enable()
+
+        cls.account = Account.objects.create(
+            account_id=generate_random_token(5),
+            access_token=generate_random_token(),
+            refresh_token=generate_random_token(),
+            name='Manager Store for Managers',
+            timezone='America/Boise',
+            pay_period_type='biweekly',
+            pay_period_reference_date=date(2021, 5, 29),
+            is_onboarded=True
+        )
+        for email, role, employee_id in (('manager@user.com', 'mgr', '1'),
+                                         ('employee@user.com', 'emp', '2')):
+            user = get_user_model().objects.create_user(email=email, password='password')
+            Profile.objects.create(user=user, account=cls.account, role=role,
+                                   employee_id=employee_id, name=f'Ex{employee_id} Employee')
+
+    def setUp(self):
+        periodcache.clear()
+        shifts = []
+        for day in range(1, 11):
+            shifts.append({
+                'employeeHoursID': str(day), 'employeeID': str(day % 2 + 1), 'shopID': '1',
+                'checkIn': boise(2021, 6, day, 9), 'checkOut': boise(2021, 6, day, 11)
+            })
+        self.lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Shop 1'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'},
+                       {'employeeID': '2', 'firstName': 'Ex2', 'lastName': 'Employee'}],
+            shifts=shifts)
+
+    def get(self, name, params, **headers):
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            return self.client.get(reverse(name), params, **headers)
+
+    def test_punch_log_pages_by_day(self):
+        self.client.login(email='manager@user.com', password='password')
+        params = {'range': 'custom', 'start_date': '2021-06-01',
+                  'end_date': '2021-06-10', 'days': '4'}
+
+        first = self.get('api_punch_log', params).json()
+        self.assertEqual([day['date'] for day in first['days']],
+                         ['2021-06-10', '2021-06-09', '2021-06-08', '2021-06-07'])
+        self.assertEqual(first['days'][0]['shifts'],
+                         [[10, 1, 1, 1623337200, 1623344400]])
+        self.assertEqual(first['shops'], {'1': 'Shop 1'})
+        self.assertEqual(first['employees'], {'1': 'Ex1 Employee', '2': 'Ex2 Employee'})
+        self.assertEqual(first['totals']['hours'], 20)
+        self.assertEqual(first['totals']['employees'], {'1': 10, '2': 10})
+        self.assertIsNone(first['partial'])
+
+        dates = [day['date'] for day in first['days']]
+        calls = len(self.lightspeed.endpoints)
+        cursor = first['next']
+        while cursor:
+            page = self.get('api_punch_log', {'cursor': cursor}).json()
+            # cut from the period the first page fetched
+            self.assertEqual(len(self.lightspeed.endpoints), calls)
+            self.assertNotIn('totals', page)
+            dates.extend(day['date'] for day in page['days'])
+            cursor = page['next']
+
+        self.assertEqual(dates, [f'2021-06-{day:02}' for day in range(10, 0, -1)])
+
+    def test_timecard_only_has_own_shifts(self):
+        self.client.login(email='employee@user.com', password='password')
+
+        page = self.get('api_timecard', {'range': 'custom', 'start_date': '2021-06-01',
+                                         'end_date': '2021-06-10', 'days': '31'}).json()
+
+        self.assertEqual(page['employees'], {'2': 'Ex2 Employee'})
+        self.assertEqual({shift[1] for day in page['days'] for shift in day['shifts']}, {2})
+        self.assertIsNone(page['next'])
+
+    def test_punch_log_is_for_managers(self):
+        self.client.login(email='employee@user.com', password='password')
+        self.assertEqual(self.get('api_punch_log', {}).status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.get('api_punch_log', {}).status_code, 401)
+
+    def test_cursors_are_checked(self):
+        self.client.login(email='manager@user.com', password='password')
+        self.assertEqual(self.get('api_punch_log', {'cursor': 'forged'}).status_code, 400)
+
+    def test_bad_ranges_get_the_form_errors(self):
+        self.client.login(email='manager@user.com', password='password')
+
+        response = self.get('api_punch_log', {'range': 'custom', 'start_date': '2021-06-10',
+                                              'end_date': '2021-06-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('__all__', response.json()['errors'])
+
+        response = self.get('api_punch_log', {'range': 'custom', 'start_date': 'June'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('start_date', response.json()['errors'])
+
+    def test_slow_fetches_are_marked_partial(self):
+        self.lightspeed.shifts = [
+            {'employeeHoursID': str(shift_id), 'employeeID': '1', 'shopID': '1',
+             'checkIn': boise(2021, 6, 1 + shift_id % 10, 9),
+             'checkOut': boise(2021, 6, 1 + shift_id % 10, 10)}
+            for shift_id in range(150, 0, -1)]
+        self.client.login(email='manager@user.com', password='password')
+        params = {'range': 'custom', 'start_date': '2021-06-01', 'end_date': '2021-06-10'}
+
+        with self.settings(REQUEST_DEADLINE_SECONDS=0):
+            first = self.get('api_punch_log', params).json()
+            again = self.get('api_punch_log', params).json()
+
+        self.assertEqual(first['partial'], {'fetched': 100, 'total': 150})
+        # asking again carries on the fetch
+        self.assertIsNone(again['partial'])
+        self.assertEqual(again['totals']['hours'], 150)
+
+    def test_responses_are_gzipped_and_etagged(self):
+        self.client.login(email='manager@user.com', password='password')
+        params = {'range': 'custom', 'start_date': '2021-06-01', 'end_date': '2021-06-10'}
+
+        response = self.get('api_punch_log', params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('totals', json.loads(gzip.decompress(response.content)))
+
+        again = self.get('api_punch_log', params, HTTP_ACCEPT_ENCODING='gzip',
+                         HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
@@ -0,0 +1,224 @@
+from django.test import TestCase
+from django.test.utils import ignore_warnings
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+from timecardsite import live, periodcache, prefetch
+from timecardsite.tests import generate_random_token
+from timecardsite.tests.budgets import BudgetAssertionsMixin, FakeLightspeed
+from timecardsite.models import Account, Profile
+
+
+def build_lightspeed(num_shifts=150):
+    shops = [
+        {'shopID': '1', 'name': 'Fictional_Shop_1'},
+        {'shopID': '2', 'name': 'Fictional_Shop_2'},
+    ]
+
+    employees = []
+    for employee_id in range(1, 11):
+        employees.append({
+            'employeeID': str(employee_id),
+            'firstName': f'Ex{employee_id}',
+            'lastName': 'Employee',
+            'Contact': {
+                'Emails': {
+                    'ContactEmail': {'address': f'ex{employee_id}@employee.com'}
+                }
+            }
+        })
+
+    shifts = []
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    for shift_id in range(num_shifts):
+        check_in = start - timedelta(hours=shift_id)
+        shifts.append({
+            'employeeHoursID': str(10000 - shift_id),
+            'checkIn': check_in.isoformat(timespec='seconds'),
+            'checkOut': (check_in + timedelta(minutes=45)).isoformat(timespec='seconds'),
+            'employeeID': str(shift_id % 10 + 1),
+            'shopID': str(shift_id % 2 + 1)
+        })
+
+    return FakeLightspeed(shops, employees, shifts)
+
+
+class ViewBudgetTests(BudgetAssertionsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ignore_warnings(message="No directory at", module="whitenoise.base").enable()
+
+        cls.manager_user = get_user_model().objects.create_user(
+            email='manager@user.com',
+            password='managerpassword'
+        )
+        cls.account = Account.objects.create(
+            account_id=generate_random_token(5),
+            access_token=generate_random_token(),
+            refresh_token=generate_random_token(),
+            name='Manager Store for Managers',
+            timezone='America/Boise',
+            pay_period_type='biweekly',
+            pay_period_reference_date=date(2021, 5, 29),
+            is_onboarded=True
+        )
+        Profile.objects.create(
+            user=cls.manager_user,
+            account=cls.account,
+            role='mgr',
+            employee_id='1',
+            name='Ex1 Employee'
+        )
+
+        cls.employee_user = get_user_model().objects.create_user(
+            email='employee@user.com',
+            password='employeepassword'
+        )
+        Profile.objects.create(
+            user=cls.employee_user,
+            account=cls.account,
+            role='emp',
+            employee_id='2',
+            name='Ex2 Employee'
+        )
+
+    def setUp(self):
+        periodcache.clear()
+        self.lightspeed = build_lightspeed()
+
+    def test_aggregate_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('aggregate', self.lightspeed):
+            response = self.client.get(reverse('aggregate'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_aggregate_custom_range_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('aggregate_custom_range', self.lightspeed):
+            response = self.client.get(reverse('aggregate'), {
+                'range': 'custom',
+                'start_date': '2021-06-01',
+                'end_date': '2021-08-31'
+            })
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_timecard_is_within_budget(self):
+        self.client.login(email='employee@user.com', password='employeepassword')
+
+        with self.assertWithinBudget('timecard', self.lightspeed):
+            response = self.client.get(reverse('timecard'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_timecard_after_aggregate_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+        with self.assertWithinBudget('aggregate', self.lightspeed):
+            self.client.get(reverse('aggregate'))
+
+        # the employee's timecard comes out of the period the manager fetched
+        self.client.login(email='employee@user.com', password='employeepassword')
+        with self.assertWithinBudget('timecard_cached', self.lightspeed):
+            response = self.client.get(reverse('timecard'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_aggregate_after_prefetch_is_within_budget(self):
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            prefetch.warm(self.account, prefetch.periods_for(self.account))
+
+        self.client.login(email='manager@user.com', password='managerpassword')
+        with self.assertWithinBudget('aggregate_prefetched', self.lightspeed):
+            response = self.client.get(reverse('aggregate'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_invite_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('invite', self.lightspeed):
+            response = self.client.get(reverse('invite'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_onboard_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('onboard', self.lightspeed):
+            response = self.client.get(reverse('onboard'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_login_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('post_login', self.lightspeed):
+            response = self.client.get(reverse('post_login'))
+
+        self.assertRedirects(response, reverse('aggregate'), fetch_redirect_response=False)
+
+    def test_coverage_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('coverage', self.lightspeed):
+            response = self.client.get(reverse('coverage'), {
+                'range': 'current',
+                'slot_minutes': '15'
+            })
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_coverage_after_aggregate_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+        with self.assertWithinBudget('aggregate', self.lightspeed):
+            self.client.get(reverse('aggregate'))
+
+        # the same period the punch log fetched
+        with self.assertWithinBudget('coverage_cached', self.lightspeed):
+            response = self.client.get(reverse('coverage'), {'range': 'current'})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_anomalies_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('anomalies', self.lightspeed):
+            response = self.client.get(reverse('anomalies'))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_anomalies_after_aggregate_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+        with self.assertWithinBudget('aggregate', self.lightspeed):
+            aggregate = self.client.get(reverse('aggregate'))
+
+        with self.assertWithinBudget('anomalies_cached', self.lightspeed):
+            response = self.client.get(reverse('anomalies'))
+
+        # the punch log's badge counts the same shifts as the page
+        self.assertEqual(len(response.context['anomalies']), aggregate.context['anomaly_count'])
+
+    def test_trends_is_within_budget(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        # one fetch for all twelve periods, not one per period
+        with self.assertWithinBudget('trends', self.lightspeed):
+            response = self.client.get(reverse('trends'), {'periods': '12'})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_live_is_within_budget(self):
+        live._boards.clear()
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        with self.assertWithinBudget('live', self.lightspeed):
+            response = self.client.get(reverse('live'))
+
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,80 @@
+from datetime import date, datetime, timezone
+
+from django.test import SimpleTestCase
+
+from timecardsite import localtime
+from timecardsite.coverage import REPEATED, SKIPPED, Cell, peak_headcount, staffing_grid
+from timecardsite.shifts import Shift
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+def shift(shop, start, end):
+    return Shift(start, 1, 1, start, end, end - start, 'Employee', shop)
+
+class CoverageTests(SimpleTestCase):
+    def test_peak_headcount_counts_overlaps_within_slots(self):
+        boundaries = [0, 3600, 7200, 10800]
+        intervals = [(0, 7200), (1800, 2400), (3600, 3700)]
+
+        self.assertEqual(peak_headcount(intervals, boundaries), [2, 2, 0])
+
+    def test_handoff_is_not_an_overlap(self):
+        boundaries = [0, 3600, 7200]
+        intervals = [(0, 3000), (3000, 7200)]
+
+        self.assertEqual(peak_headcount(intervals, boundaries), [1, 1])
+
+    def test_shifts_are_clipped_to_range(self):
+        boundaries = [3600, 7200]
+        intervals = [(0, 100000)]
+
+        self.assertEqual(peak_headcount(intervals, boundaries), [1])
+
+    def test_staffing_grid_lays_out_local_days(self):
+        clock = localtime.clock_for('America/Boise', date(2021, 6, 1), date(2021, 6, 2))
+        shifts = [
+            # 9 AM - 5 PM and 8 AM - 10 AM local on the 1st
+            shift('Shop 1', ts(2021, 6, 1, 15), ts(2021, 6, 1, 23)),
+            shift('Shop 1', ts(2021, 6, 1, 14), ts(2021, 6, 1, 16)),
+            # 11 PM on the 1st until 1 AM on the 2nd
+            shift('Shop 2', ts(2021, 6, 2, 5), ts(2021, 6, 2, 7)),
+        ]
+
+        grid = staffing_grid(shifts, clock, date(2021, 6, 1), date(2021, 6, 2))
+
+        self.assertEqual(len(grid['slots']), 24)
+        (first_day, first_cells), (second_day, second_cells) = grid['shops']['Shop 1']
+        self.assertEqual(first_day, date(2021, 6, 1))
+        self.assertEqual([cell.count for cell in first_cells[7:18]],
+                         [0, 1, 2, 1, 1, 1, 1, 1, 1, 1, 0])
+        self.assertEqual(first_cells[9], Cell(2, 4, ''))
+
+        (_, shop_2_first), (_, shop_2_second) = grid['shops']['Shop 2']
+        self.assertEqual(shop_2_first[23][0], 1)
+        self.assertEqual(shop_2_second[0][0], 1)
+        self.assertEqual(shop_2_second[1][0], 0)
+
+    def test_dst_days_line_up_with_the_header(self):
+        clock = localtime.clock_for('America/Boise', date(2021, 3, 14), date(2021, 11, 7))
+        shifts = [
+            # 1 AM - 4 AM MST on March 14th, when 2 AM doesn't happen
+            shift('Shop 1', ts(2021, 3, 14, 8), ts(2021, 3, 14, 10)),
+            # the first 1 AM on November 7th, in MDT
+            shift('Shop 1', ts(2021, 11, 7, 7), ts(2021, 11, 7, 8)),
+        ]
+
+        spring = staffing_grid(shifts, clock, date(2021, 3, 14), date(2021, 3, 14))
+        fall = staffing_grid(shifts, clock, date(2021, 11, 7), date(2021, 11, 7))
+
+        [(_, cells)] = spring['shops']['Shop 1']
+        self.assertEqual(len(cells), len(spring['slots']))
+        self.assertEqual(cells[1].count, 1)
+        self.assertEqual(cells[2], Cell(None, None, SKIPPED))
+        self.assertEqual(cells[3].count, 1)
+        self.assertEqual(cells[4].count, 0)
+
+        [(_, cells)] = fall['shops']['Shop 1']
+        self.assertEqual(len(cells), len(fall['slots']))
+        self.assertEqual(cells[1], Cell(1, 4, REPEATED))
+        self.assertEqual(cells[2].count, 0)
@@ -0,0 +1,121 @@
+import threading
+from datetime import date
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test.utils import ignore_warnings
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+
+from timecardsite import dashboard, periodcache
+from timecardsite.tests import generate_random_account
+from timecardsite.tests.test_budgets import build_lightspeed
+from timecardsite.models import Membership, Profile
+from timecardsite.admission import AdmissionController
+from timecardsite.scheduler import FairScheduler
+
+
+def summary(hours, shifts, open_shifts):
+    return {'start': date(2021, 6, 12), 'end': date(2021, 6, 25), 'total_hours': hours,
+            'shop_totals': {'Shop': hours}, 'shift_count': shifts,
+            'open_shifts': open_shifts, 'as_of': None, 'is_stale': False, 'partial': None}
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        ignore_warnings(message="No directory at", module="whitenoise.base").enable()
+        periodcache.clear()
+        # the fetches run on other threads, which can't write the shared
+        # Lightspeed slots while the test's transaction holds the database
+        self.controller = AdmissionController(0, 1)
+        for target, value in [('timecardsite.scheduler._scheduler', FairScheduler(8, 2)),
+                              ('timecardsite.admission._controller', self.controller)]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(email='owner@user.com',
+                                                         password='ownerpassword')
+        self.accounts = []
+        for name in ['Store A', 'Store B', 'Store C']:
+            account = generate_random_account()
+            account.name = name
+            account.save()
+            self.accounts.append(account)
+
+        Profile.objects.create(user=self.user, account=self.accounts[0], role='mgr')
+        Membership.objects.create(user=self.user, account=self.accounts[1])
+        Membership.objects.create(user=self.user, account=self.accounts[2])
+
+    def test_accounts_for_includes_profile_and_memberships(self):
+        self.accounts[2].is_onboarded = False
+        self.accounts[2].save()
+        other = generate_random_account()
+        other.save()
+        Membership.objects.create(user=self.user, account=other, role='emp')
+
+        self.assertEqual(dashboard.accounts_for(self.user), self.accounts[:2])
+
+    def test_slow_account_does_not_hold_up_the_others(self):
+        release = threading.Event()
+        def get_period_summary(account, deadline=None):
+            if account.name == 'Store B':
+                release.wait(5)
+            if account.name == 'Store C':
+                raise ConnectionError('Lightspeed is down')
+            return summary(10, 4, 1)
+
+        with patch('timecardsite.services.get_period_summary', side_effect=get_period_summary), \
+                self.assertLogs('timecardsite.dashboard', 'ERROR'):
+            rows = dashboard.collect(self.accounts, timeout=0.2)
+            release.set()
+
+        self.assertEqual([row.status for row in rows],
+                         [dashboard.READY, dashboard.PENDING, dashboard.FAILED])
+        self.assertEqual(rows[0].summary['total_hours'], 10)
+
+    def test_each_account_is_admitted_under_its_own_limit(self):
+        lightspeed = build_lightspeed()
+        # another request is already fetching Store B
+        self.controller.admit(self.accounts[1].account_id)
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            rows = dashboard.collect(self.accounts)
+
+        self.assertEqual([row.status for row in rows],
+                         [dashboard.READY, dashboard.PENDING, dashboard.READY])
+        stats = self.controller.stats()
+        self.assertEqual(stats['over_account_limit'], 1)
+        self.assertEqual(stats['shed'], 1)
+        self.assertEqual(stats['accounts_inflight'], {self.accounts[1].account_id: 1})
+
+    def test_merge_adds_up_accounts_that_answered(self):
+        rows = [
+            dashboard.AccountRow(self.accounts[0], dashboard.READY, summary(10, 4, 1)),
+            dashboard.AccountRow(self.accounts[1], dashboard.READY, summary(2.5, 1, 0)),
+            dashboard.AccountRow(self.accounts[2], dashboard.PENDING, None),
+        ]
+
+        totals = dashboard.merge(rows)
+
+        self.assertEqual(totals, {'total_hours': 12.5, 'shift_count': 5, 'open_shifts': 1,
+                                  'accounts': 2, 'missing': 1})
+
+    def test_dashboard_view_shows_every_account(self):
+        self.client.login(email='owner@user.com', password='ownerpassword')
+
+        with patch('timecardsite.services._call', side_effect=build_lightspeed()):
+            response = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row.account for row in response.context['rows']], self.accounts)
+        self.assertEqual(response.context['totals']['accounts'], 3)
+
+    def test_dashboard_account_view_only_serves_members(self):
+        other = generate_random_account()
+        other.save()
+        self.client.login(email='owner@user.com', password='ownerpassword')
+
+        response = self.client.get(reverse('dashboard_account'), {'account': other.account_id})
+
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,29 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from timecardsite import db
+
+
+class SQLiteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connections_are_tuned(self):
+        # the test database's connection was made after the app loaded
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1) # normal
+        self.assertEqual(self.pragma('cache_size'), -20000)
+
+
+class PragmaTests(SimpleTestCase):
+    @override_settings(SQLITE_JOURNAL_MODE='delete', SQLITE_BUSY_TIMEOUT_MS=100,
+                       SQLITE_SYNCHRONOUS='full', SQLITE_CACHE_SIZE_KB=2000)
+    def test_pragmas_come_from_settings(self):
+        self.assertEqual(db.pragmas(), [
+            'PRAGMA journal_mode=delete',
+            'PRAGMA busy_timeout=100',
+            'PRAGMA synchronous=full',
+            'PRAGMA cache_size=-2000'
+        ])
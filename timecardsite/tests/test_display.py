@@ -0,0 +1,72 @@
+from datetime import date, datetime, timezone
+from unittest import skipUnless
+
+from django.template import engines
+from django.template.defaultfilters import date as date_filter, floatformat
+from django.test import SimpleTestCase
+from django.utils import timezone as django_timezone
+
+from timecardsite import display, localtime
+from timecardsite.shifts import Shift
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+class DisplayTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = localtime.clock_for('America/Boise', date(2021, 3, 1), date(2021, 3, 31))
+        self.shift = Shift(1, 2, 3, ts(2021, 3, 14, 6), ts(2021, 3, 14, 18, 30), 45000,
+                           'Ex Employee', 'Shop')
+        self.open_shift = Shift(2, 2, 3, ts(2021, 3, 15, 15), None, 3600,
+                                'Ex Employee', 'Shop')
+
+    def test_format_time_matches_date_filter(self):
+        with django_timezone.override('America/Boise'):
+            # midnight, noon, and either side of the DST change
+            for stamp in [ts(2021, 3, 2, 7), ts(2021, 3, 2, 19), ts(2021, 3, 14, 8, 59),
+                          ts(2021, 3, 14, 9, 1), ts(2021, 3, 20, 23, 5)]:
+                self.assertEqual(
+                    display.format_time(self.clock, stamp),
+                    date_filter(django_timezone.localtime(
+                        datetime.fromtimestamp(stamp, timezone.utc)), 'g:i A'))
+
+    def test_format_hours_matches_floatformat(self):
+        for seconds in [0, 18, 450, 1800, 15817, 45000, 36 * 3600 + 54]:
+            self.assertEqual(display.format_hours(seconds), floatformat(seconds / 3600, 2))
+
+    def test_shift_row(self):
+        row = display.shift_row(self.shift, self.clock)
+
+        # 11 PM MST on the 13th
+        self.assertEqual(row.date, 'Sat Mar 13')
+        self.assertEqual(row.check_in, '11:00 PM')
+        self.assertEqual(row.check_out, '12:30 PM')
+        self.assertEqual(row.hours, '12.50')
+        self.assertFalse(row.is_open)
+
+    def test_open_shift_row_has_no_check_out_or_hours(self):
+        row = display.shift_row(self.open_shift, self.clock)
+
+        self.assertEqual(row.check_in, '9:00 AM')
+        self.assertEqual(row.check_out, '')
+        self.assertEqual(row.hours, '')
+        self.assertTrue(row.is_open)
+
+    @skipUnless(jinja2, 'Jinja2 is not installed')
+    def test_jinja2_rows_match_django_rows(self):
+        from django.template.backends.jinja2 import Jinja2
+        engine = Jinja2({'NAME': 'jinja2', 'DIRS': [], 'APP_DIRS': True, 'OPTIONS': {}})
+
+        rows = [display.shift_row(shift, self.clock) for shift in [self.shift, self.open_shift]]
+        contexts = {
+            'includes/timecard_rows.html': {'rows': rows},
+            'includes/punch_log_day.html': {'day': 'March 14, 2021', 'shops': {'Shop': rows}}
+        }
+        for name, context in contexts.items():
+            self.assertHTMLEqual(engine.get_template(name).render(context),
+                                 engines['django'].get_template(name).render(context))
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from timecardsite import live, periodcache
+from timecardsite.shifts import Shift
+from timecardsite.tests import generate_random_account
+from timecardsite.tests.budgets import FakeLightspeed
+
+
+def shift(shift_id, shop='Shop 1', open=True):
+    return Shift(shift_id, 1, 1, 1000 * shift_id, None if open else 1000 * shift_id + 60,
+                 60, f'Ex{shift_id} Employee', shop)
+
+
+class LiveBoardTests(SimpleTestCase):
+    def setUp(self):
+        self.board = live.LiveBoard(1)
+
+    def test_snapshot_groups_open_shifts_by_shop(self):
+        self.board.apply([shift(1), shift(2, shop='Shop 2'), shift(3, open=False)])
+
+        self.assertEqual(self.board.snapshot(), {
+            'Shop 1': [{'id': 1, 'employee': 'Ex1 Employee', 'shop': 'Shop 1', 'check_in': 1000}],
+            'Shop 2': [{'id': 2, 'employee': 'Ex2 Employee', 'shop': 'Shop 2', 'check_in': 2000}],
+        })
+        self.assertEqual(self.board.last_seen_id, 3)
+
+    def test_changes_since_cursor(self):
+        self.board.apply([shift(1), shift(2)])
+        cursor = self.board.cursor
+
+        self.board.apply([shift(1, open=False), shift(2), shift(3)])
+
+        self.assertEqual(self.board.changes_since(cursor), [
+            {'op': 'close', 'id': 1},
+            {'op': 'open', 'id': 3, 'employee': 'Ex3 Employee', 'shop': 'Shop 1', 'check_in': 3000},
+        ])
+        self.assertEqual(self.board.changes_since(self.board.cursor), [])
+
+    def test_unknown_cursors_get_the_full_board(self):
+        self.board.apply([shift(1)])
+
+        self.assertIsNone(self.board.changes_since('elsewhere:1'))
+        self.assertIsNone(self.board.changes_since(f'{self.board.generation}:99'))
+        self.assertIsNone(self.board.changes_since('garbage'))
+        self.assertIn('shops', self.board.poll('garbage'))
+
+    def test_cursors_older_than_the_change_log_get_the_full_board(self):
+        with patch('timecardsite.live.CHANGE_LOG_SIZE', 2):
+            self.board = live.LiveBoard(1)
+            cursor = self.board.cursor
+            self.board.apply([shift(1), shift(2), shift(3)])
+
+        self.assertIsNone(self.board.changes_since(cursor))
+
+
+@override_settings(LIVE_REFRESH_SECONDS=5)
+class OnTheClockTests(TestCase):
+    def setUp(self):
+        live._boards.clear()
+        periodcache.clear()
+        self.account = generate_random_account()
+        self.account.save()
+
+        check_in = datetime.now(timezone.utc) - timedelta(hours=1)
+        self.lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Shop 1'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[{
+                'employeeHoursID': '1',
+                'checkIn': check_in.isoformat(timespec='seconds'),
+                'employeeID': '1',
+                'shopID': '1'
+            }])
+
+    def test_polls_within_refresh_interval_share_one_fetch(self):
+        with patch('timecardsite.services._call', side_effect=self.lightspeed) as mocked_call:
+            first = live.on_the_clock(self.account)
+            second = live.on_the_clock(self.account, cursor=first['cursor'])
+
+        self.assertEqual(mocked_call.call_count, 3)
+        self.assertEqual([s['id'] for s in first['shops']['Shop 1']], [1])
+        self.assertEqual(second['changes'], [])
+
+    def test_refresh_only_asks_for_new_and_open_shifts(self):
+        board = live.board_for(self.account)
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            board.refresh(self.account, now=0)
+            self.lightspeed.shifts[0]['checkOut'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+            cursor = board.cursor
+            board.refresh(self.account, now=10)
+
+        self.assertEqual(board.changes_since(cursor), [{'op': 'close', 'id': 1}])
+        self.assertEqual(board.open, {})
+
+    def test_refreshes_reuse_the_names(self):
+        board = live.board_for(self.account)
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            board.refresh(self.account, now=0)
+            del self.lightspeed.endpoints[:]
+            board.refresh(self.account, now=10)
+
+        self.assertTrue(self.lightspeed.endpoints)
+        self.assertTrue(all(endpoint.endswith('/EmployeeHours.json')
+                            for endpoint in self.lightspeed.endpoints))
+
+    def test_new_employees_get_the_names_fetched_again(self):
+        board = live.board_for(self.account)
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            board.refresh(self.account, now=0)
+            self.lightspeed.employees.append(
+                {'employeeID': '2', 'firstName': 'Ex2', 'lastName': 'Employee'})
+            self.lightspeed.shifts.append(dict(self.lightspeed.shifts[0],
+                                               employeeHoursID='2', employeeID='2'))
+            board.refresh(self.account, now=10)
+
+        self.assertEqual(board.open[2].name, 'Ex2 Employee')
+
+    def test_failed_refresh_leaves_the_board_alone(self):
+        board = live.board_for(self.account)
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            board.refresh(self.account, now=0)
+
+        self.lightspeed.shifts.append(dict(self.lightspeed.shifts[0], employeeHoursID='2'))
+        def fail_rechecks(endpoint, account, params):
+            # the new shift comes back, then rechecking the open one fails
+            if 'IN' in (params or {}).get('employeeHoursID', ''):
+                raise ConnectionError('Lightspeed went away.')
+            return self.lightspeed(endpoint, account, params)
+
+        cursor = board.cursor
+        with patch('timecardsite.services._call', side_effect=fail_rechecks):
+            with self.assertRaises(ConnectionError):
+                board.refresh(self.account, now=10)
+
+        self.assertEqual(board.cursor, cursor)
+        self.assertEqual(board.last_seen_id, 1)
+
+        # so the next refresh still finds the new shift
+        with patch('timecardsite.services._call', side_effect=self.lightspeed):
+            board.refresh(self.account, now=20)
+
+        self.assertEqual(sorted(board.open), [1, 2])
@@ -0,0 +1,54 @@
+from datetime import date, datetime, timezone
+
+from django.test import SimpleTestCase
+
+from timecardsite import localtime
+from timecardsite.localtime import day_number
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+class LocalClockTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = localtime.clock_for('America/Boise', date(2021, 3, 1), date(2021, 3, 31))
+
+    def test_transition_table_holds_range_transitions(self):
+        # DST began 2021-03-14 at 09:00 UTC in Boise
+        self.assertEqual(self.clock.transitions[1:], [ts(2021, 3, 14, 9)])
+        self.assertEqual(self.clock.offsets, [-7 * 3600, -6 * 3600])
+
+    def test_local_date_matches_astimezone(self):
+        tz = self.clock.tz
+        for stamp in range(ts(2021, 3, 1), ts(2021, 3, 31), 3541):
+            self.assertEqual(
+                self.clock.local_date(stamp),
+                datetime.fromtimestamp(stamp, timezone.utc).astimezone(tz).date())
+
+    def test_local_date_outside_range_is_still_correct(self):
+        self.assertEqual(self.clock.local_date(ts(2021, 7, 1, 5)), date(2021, 6, 30))
+
+    def test_split_by_day_across_midnight_and_dst(self):
+        # 22:00 MST on the 13th until 06:00 MDT on the 14th is 7 real hours
+        pieces = list(self.clock.split_by_day(ts(2021, 3, 14, 5), ts(2021, 3, 14, 12)))
+
+        self.assertEqual(pieces, [
+            (day_number(date(2021, 3, 13)), 2 * 3600),
+            (day_number(date(2021, 3, 14)), 5 * 3600),
+        ])
+
+    def test_period_index(self):
+        reference = date(2021, 2, 27)
+
+        self.assertEqual(self.clock.period_index(ts(2021, 3, 13, 6), reference, 14), 0)
+        self.assertEqual(self.clock.period_index(ts(2021, 3, 13, 7), reference, 14), 1)
+        self.assertEqual(self.clock.period_index(ts(2021, 2, 27, 6), reference, 14), -1)
+
+    def test_clocks_are_cached(self):
+        self.assertIs(
+            self.clock,
+            localtime.clock_for('America/Boise', date(2021, 3, 1), date(2021, 3, 31)))
+
+    def test_today_is_the_zone_date_not_the_server_date(self):
+        # 03:00 UTC on the 26th is still the evening of the 25th in Boise
+        self.assertEqual(localtime.today('America/Boise', ts(2021, 6, 26, 3)), date(2021, 6, 25))
+        self.assertEqual(localtime.today('America/Boise', ts(2021, 6, 26, 6)), date(2021, 6, 26))
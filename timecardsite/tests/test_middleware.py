@@ -0,0 +1,65 @@
+from django.test import TestCase, override_settings
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+
+from datetime import date
+
+from timecardsite.tests import generate_random_account
+from timecardsite.models import Profile
+from timecardsite.middleware import SESSION_KEY
+
+
+class ShiftAccountMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='manager@user.com',
+            password='managerpassword'
+        )
+        cls.account = generate_random_account()
+        cls.account.save()
+        Profile.objects.create(
+            user=cls.user,
+            account=cls.account,
+            role='mgr',
+            employee_id='11',
+            name='Jane Doe'
+        )
+
+    def test_shift_account_exposes_profile_and_account_fields(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+        response = self.client.get(reverse('post_login'))
+
+        shift_account = response.wsgi_request.shift_account
+        self.assertEqual(shift_account.account_id, self.account.account_id)
+        self.assertEqual(shift_account.timezone, 'America/Boise')
+        self.assertEqual(shift_account.reference_date, date(2021, 5, 29))
+        self.assertEqual(shift_account.employee_id, '11')
+        self.assertTrue(shift_account.is_manager)
+
+    def test_shift_account_is_falsy_without_profile(self):
+        get_user_model().objects.create_user(email='new@user.com', password='newpassword')
+        self.client.login(email='new@user.com', password='newpassword')
+
+        response = self.client.get(reverse('post_login'))
+
+        self.assertFalse(response.wsgi_request.shift_account)
+
+    def test_session_cache_is_off_by_default(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+        self.client.get(reverse('post_login'))
+
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+    @override_settings(SHIFT_ACCOUNT_SESSION_CACHE_SECONDS=60)
+    def test_session_cache_skips_profile_query(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+        self.client.get(reverse('post_login'))
+        self.assertIn(SESSION_KEY, self.client.session)
+
+        # session and user only
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('post_login'))
+
+        self.assertRedirects(response, reverse('aggregate'), fetch_redirect_response=False)
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timezone
+
+from django.test import SimpleTestCase
+
+from timecardsite import localtime
+from timecardsite.overtime import OvertimeCalculator
+from timecardsite.shifts import Shift
+
+def shift(employee_id, start, hours):
+    check_in = int(datetime(*start, tzinfo=timezone.utc).timestamp())
+    seconds = int(hours * 3600)
+    return Shift(check_in, employee_id, 1, check_in, check_in + seconds, seconds,
+                 f'Employee {employee_id}', 'Shop')
+
+class OvertimeCalculatorTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = localtime.clock_for('America/Boise', date(2021, 5, 1), date(2021, 6, 30))
+        # workweeks start Saturday, like a 2021-05-29 reference date
+        self.calculator = OvertimeCalculator(self.clock, dow=5)
+
+    def test_no_overtime_under_forty_hours(self):
+        shifts = [shift(1, (2021, 5, 31 + day, 15), 8) if day == 0 else
+                  shift(1, (2021, 6, day, 15), 8) for day in range(4)]
+
+        self.assertEqual(self.calculator.employee(shifts), {'regular': 32, 'overtime': 0})
+
+    def test_hours_past_forty_in_a_workweek_are_overtime(self):
+        # five 9 hour days, Monday through Friday
+        shifts = [shift(1, (2021, 6, day, 15), 9) for day in range(1, 5)]
+        shifts.append(shift(1, (2021, 5, 31, 15), 9))
+
+        self.assertEqual(self.calculator.employee(shifts), {'regular': 40, 'overtime': 5})
+
+    def test_shifts_are_split_at_workweek_boundary(self):
+        # 40 hours Tuesday through Friday, then 10 hours starting at 10 PM
+        # Friday, 2 hours before the week rolls over at midnight local time
+        shifts = [shift(1, (2021, 6, day, 15), 10) for day in range(1, 5)]
+        shifts.append(shift(1, (2021, 6, 5, 4), 10))
+
+        self.assertEqual(self.calculator.employee(shifts), {'regular': 48, 'overtime': 2})
+
+    def test_daily_limit_overtime_is_not_counted_twice(self):
+        calculator = OvertimeCalculator(self.clock, dow=5, daily_hours=8)
+        shifts = [shift(1, (2021, 6, day, 15), 10) for day in range(1, 6)]
+
+        self.assertEqual(calculator.employee(shifts), {'regular': 40, 'overtime': 10})
+
+    def test_compute_groups_by_employee(self):
+        shifts = [shift(employee, (2021, 6, day, 15), 11)
+                  for day in range(1, 5) for employee in (1, 2)]
+
+        self.assertEqual(self.calculator.compute(shifts), {
+            1: {'regular': 40, 'overtime': 4},
+            2: {'regular': 40, 'overtime': 4},
+        })
@@ -0,0 +1,87 @@
+from datetime import date, datetime, timedelta, timezone
+
+from django.test import SimpleTestCase
+
+from timecardsite import localtime
+from timecardsite.payperiod import (BiWeeklyPayPeriod, MonthlyPayPeriod,
+                                    SemiMonthlyPayPeriod, WeeklyPayPeriod, calendar_for)
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+class PayPeriodCalendarTests(SimpleTestCase):
+    def setUp(self):
+        self.calendars = [
+            WeeklyPayPeriod(5),
+            BiWeeklyPayPeriod(date(2021, 2, 27)),
+            SemiMonthlyPayPeriod(),
+            MonthlyPayPeriod()
+        ]
+
+    def test_every_day_is_in_its_period(self):
+        for calendar in self.calendars:
+            given_date = date(2019, 12, 1)
+            while given_date < date(2021, 4, 1):
+                index = calendar.index(given_date)
+                start, end = calendar.bounds(index)
+                self.assertTrue(start <= given_date <= end)
+                self.assertEqual(calendar.bounds(index + 1)[0], end + timedelta(days=1))
+                given_date += timedelta(days=1)
+
+    def test_biweekly_matches_reference_date(self):
+        bwp = BiWeeklyPayPeriod(date(2021, 2, 27))
+
+        self.assertEqual(bwp.index(date(2021, 2, 27)), 0)
+        self.assertEqual(bwp.get(date(2021, 3, 15)), (date(2021, 3, 13), date(2021, 3, 26)))
+        self.assertEqual(bwp.get(date(2021, 2, 26)), (date(2021, 2, 13), date(2021, 2, 26)))
+
+    def test_weekly_starts_on_dow(self):
+        # 5 is Saturday
+        self.assertEqual(WeeklyPayPeriod(5).get(date(2021, 3, 17)),
+                         (date(2021, 3, 13), date(2021, 3, 19)))
+
+    def test_semimonthly_halves(self):
+        calendar = SemiMonthlyPayPeriod()
+
+        self.assertEqual(calendar.get(date(2021, 2, 15)), (date(2021, 2, 1), date(2021, 2, 15)))
+        self.assertEqual(calendar.get(date(2021, 2, 16)), (date(2021, 2, 16), date(2021, 2, 28)))
+        self.assertEqual(calendar.index(date(2021, 3, 1)), calendar.index(date(2021, 2, 16)) + 1)
+
+    def test_monthly_across_year_end(self):
+        calendar = MonthlyPayPeriod()
+
+        self.assertEqual(calendar.get(date(2020, 12, 31)), (date(2020, 12, 1), date(2020, 12, 31)))
+        self.assertEqual(calendar.index(date(2021, 1, 1)), calendar.index(date(2020, 12, 1)) + 1)
+
+    def test_periods_over_range(self):
+        periods = SemiMonthlyPayPeriod().periods(date(2021, 1, 10), date(2021, 2, 20))
+
+        self.assertEqual([(start, end) for index, start, end in periods], [
+            (date(2021, 1, 1), date(2021, 1, 15)),
+            (date(2021, 1, 16), date(2021, 1, 31)),
+            (date(2021, 2, 1), date(2021, 2, 15)),
+            (date(2021, 2, 16), date(2021, 2, 28)),
+        ])
+
+    def test_bucket_uses_local_days(self):
+        clock = localtime.clock_for('America/Boise', date(2021, 1, 1), date(2021, 3, 31))
+        calendar = MonthlyPayPeriod()
+        february = calendar.index(date(2021, 2, 1))
+
+        # 11 PM on the last of January in Boise, then the next morning
+        timestamps = [ts(2021, 2, 1, 6), ts(2021, 2, 1, 15), ts(2021, 3, 1, 6, 59)]
+
+        self.assertEqual(calendar.bucket(clock, timestamps), [february - 1, february, february])
+        self.assertEqual(calendar.index_at(clock, timestamps[0]), february - 1)
+        self.assertEqual(calendar.group(clock, timestamps, lambda stamp: stamp),
+                         {february - 1: timestamps[:1], february: timestamps[1:]})
+
+    def test_calendar_for(self):
+        reference_date = date(2021, 2, 27)
+
+        self.assertIsInstance(calendar_for('weekly', reference_date), WeeklyPayPeriod)
+        self.assertIsInstance(calendar_for('semimonthly', reference_date), SemiMonthlyPayPeriod)
+        self.assertIsInstance(calendar_for('monthly', reference_date), MonthlyPayPeriod)
+        self.assertIsInstance(calendar_for('biweekly', reference_date), BiWeeklyPayPeriod)
+        # free form values from before there was a choice
+        self.assertIsInstance(calendar_for('Bi-weekly', reference_date), BiWeeklyPayPeriod)
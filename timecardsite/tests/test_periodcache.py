@@ -0,0 +1,111 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from timecardsite import periodcache
+
+
+@override_settings(SHIFT_CACHE_SECONDS=60, SHIFT_CACHE_STALE_SECONDS=600)
+class PeriodCacheTests(SimpleTestCase):
+    def setUp(self):
+        periodcache.clear()
+
+    def test_values_are_reused_until_stale(self):
+        fetcher_calls = []
+        def fetcher():
+            fetcher_calls.append(1)
+            return len(fetcher_calls)
+
+        self.assertEqual(periodcache.get('key', fetcher), 1)
+        self.assertEqual(periodcache.get('key', fetcher), 1)
+        self.assertEqual(periodcache.get('key', fetcher, max_age=-1, max_stale=-1), 2)
+
+    def test_stale_values_are_served_while_refreshing(self):
+        periodcache.get('key', lambda: 'old')
+        refreshed = threading.Event()
+        def fetcher():
+            refreshed.set()
+            return 'new'
+
+        with patch('time.time', return_value=periodcache.peek('key').fetched_at + 120):
+            self.assertEqual(periodcache.get('key', fetcher), 'old')
+
+        self.assertTrue(refreshed.wait(5))
+        # the refresh thread stores its entry right after fetching
+        for attempt in range(100):
+            if periodcache.peek('key').value == 'new':
+                break
+            time.sleep(0.01)
+        self.assertEqual(periodcache.peek('key').value, 'new')
+
+    def test_refreshes_are_not_doubled_up(self):
+        periodcache.get('key', lambda: 'old')
+        release = threading.Event()
+        fetcher_calls = []
+        def fetcher():
+            fetcher_calls.append(1)
+            release.wait(5)
+            return 'new'
+
+        thread = periodcache.refresh_in_background('key', fetcher)
+        while not fetcher_calls:
+            time.sleep(0.01)
+        self.assertIsNone(periodcache.refresh_in_background('key', fetcher))
+        release.set()
+        thread.join(5)
+
+        self.assertEqual(len(fetcher_calls), 1)
+
+    def test_values_past_the_stale_bound_are_waited_for(self):
+        periodcache.get('key', lambda: 'old')
+
+        with patch('time.time', return_value=periodcache.peek('key').fetched_at + 601):
+            self.assertEqual(periodcache.get('key', lambda: 'new'), 'new')
+
+    def test_concurrent_misses_share_one_fetch(self):
+        started = threading.Event()
+        release = threading.Event()
+        fetcher_calls = []
+
+        def fetcher():
+            fetcher_calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'shifts'
+
+        results = []
+        def request():
+            results.append(periodcache.get('key', fetcher))
+
+        leader = threading.Thread(target=request)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=request) for i in range(5)]
+        for follower in followers:
+            follower.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(fetcher_calls), 1)
+        self.assertEqual(results, ['shifts'] * 6)
+
+    def test_failed_fetches_are_not_cached(self):
+        def broken():
+            raise ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            periodcache.get('key', broken)
+        self.assertEqual(periodcache.get('key', lambda: 'shifts'), 'shifts')
+
+    def test_least_recently_used_entries_are_dropped(self):
+        with patch('timecardsite.periodcache.MAX_ENTRIES', 2):
+            periodcache.get('a', lambda: 'a')
+            periodcache.get('b', lambda: 'b')
+            periodcache.get('a', lambda: 'a')
+            periodcache.get('c', lambda: 'c')
+
+        self.assertIsNone(periodcache.peek('b'))
+        self.assertEqual(periodcache.peek('a').value, 'a')
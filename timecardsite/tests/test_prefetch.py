@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from timecardsite import prefetch
+from timecardsite.tests import generate_random_account
+from timecardsite.models import Profile
+
+
+class PrefetchTests(TestCase):
+    def setUp(self):
+        self.account = generate_random_account()
+        self.account.save()
+        self.user = get_user_model().objects.create_user(email='manager@user.com',
+                                                         password='managerpassword')
+        Profile.objects.create(user=self.user, account=self.account, role='mgr')
+
+    @override_settings(PREFETCH=True)
+    @patch('timecardsite.prefetch.warm_in_background')
+    def test_logging_in_warms_the_account(self, mocked_warm):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        mocked_warm.assert_called_once_with(self.account)
+
+    @override_settings(PREFETCH=True)
+    @patch('timecardsite.prefetch.warm_in_background')
+    def test_accounts_that_are_not_onboarded_are_skipped(self, mocked_warm):
+        self.account.is_onboarded = False
+        self.account.save()
+
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        mocked_warm.assert_not_called()
+
+    def test_periods_for_current_and_previous(self):
+        # reference date 2021-05-29 starts a biweekly period
+        self.assertEqual(prefetch.periods_for(self.account, date(2021, 6, 15)), [
+            (date(2021, 6, 12), date(2021, 6, 25)),
+            (date(2021, 5, 29), date(2021, 6, 11)),
+        ])
+
+    def test_periods_for_semimonthly(self):
+        self.account.pay_period_type = 'semimonthly'
+
+        self.assertEqual(prefetch.periods_for(self.account, date(2021, 6, 15)), [
+            (date(2021, 6, 1), date(2021, 6, 15)),
+            (date(2021, 5, 16), date(2021, 5, 31)),
+        ])
+
+    def test_periods_for_uses_the_account_local_date(self):
+        # the evening of the 25th in Boise, though it's the 26th in UTC
+        now = datetime(2021, 6, 26, 3, tzinfo=timezone.utc).timestamp()
+
+        with patch('timecardsite.localtime.time.time', return_value=now):
+            periods = prefetch.periods_for(self.account)
+
+        self.assertEqual(periods[0], (date(2021, 6, 12), date(2021, 6, 25)))
+
+    def test_next_period_start_is_local_midnight(self):
+        now = datetime(2021, 6, 15, 12, tzinfo=timezone.utc).timestamp()
+
+        # midnight on the 26th in Boise is 06:00 UTC
+        self.assertEqual(prefetch.next_period_start(self.account, now),
+                         datetime(2021, 6, 26, 6, tzinfo=timezone.utc).timestamp())
+
+    @patch('timecardsite.prefetch.ROLLOVER_CHECK_SECONDS', 86400)
+    @patch('timecardsite.prefetch.warm_in_background')
+    def test_rollover_warms_the_new_period(self, mocked_warm):
+        thread = prefetch.PrefetchThread()
+        before = datetime(2021, 6, 25, 12, tzinfo=timezone.utc).timestamp()
+        after = datetime(2021, 6, 26, 6, 1, tzinfo=timezone.utc).timestamp()
+
+        self.assertEqual(thread.check(before), 18 * 3600)
+        mocked_warm.assert_not_called()
+
+        thread.check(after)
+        mocked_warm.assert_called_once_with(self.account, [(date(2021, 6, 26), date(2021, 7, 9))])
+
+    @patch('timecardsite.prefetch.warm_in_background')
+    def test_logins_in_other_processes_are_warmed_once(self, mocked_warm):
+        thread = prefetch.PrefetchThread()
+        thread.logins_since -= timedelta(seconds=1)
+
+        # another worker took the login
+        self.user.last_login = thread.logins_since + timedelta(microseconds=1)
+        self.user.save()
+
+        self.assertEqual(thread.check_logins(), [self.account])
+        mocked_warm.assert_called_once_with(self.account)
+        self.assertEqual(thread.check_logins(), [])
+        mocked_warm.assert_called_once()
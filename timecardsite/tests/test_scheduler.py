@@ -0,0 +1,171 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from django.shortcuts import reverse
+from django.contrib.auth import get_user_model
+
+from timecardsite import periodcache, scheduler, services, slots
+from timecardsite.admission import LightspeedBusy
+from timecardsite.deadline import Deadline
+from timecardsite.scheduler import FairScheduler
+from timecardsite.tests import generate_random_account
+from timecardsite.tests.test_budgets import build_lightspeed
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError('timed out')
+
+
+class FairSchedulerTests(SimpleTestCase):
+    def serve_in_order(self, sched, keys):
+        '''
+        queues a call for each key in turn while the only slot is held,
+        then lets them run one at a time
+        :return: keys in the order they got the slot
+        '''
+        order = []
+        def call(key):
+            with sched.slot(key):
+                order.append(key)
+
+        sched.acquire('holder')
+        threads = []
+        for key in keys:
+            queued = sched.stats().get(key, {}).get('queued', 0)
+            thread = threading.Thread(target=call, args=(key,))
+            thread.start()
+            wait_for(lambda: sched.stats()[key]['queued'] == queued + 1)
+            threads.append(thread)
+        sched.release('holder')
+
+        for thread in threads:
+            thread.join()
+        return order
+
+    def test_busy_account_does_not_starve_others(self):
+        sched = FairScheduler(1, 1)
+
+        order = self.serve_in_order(sched, ['big'] * 5 + ['small'])
+
+        self.assertEqual(order.index('small'), 1)
+
+    def test_weights_share_calls_in_proportion(self):
+        sched = FairScheduler(1, 1, weights={'a': 2})
+
+        order = self.serve_in_order(sched, ['a'] * 6 + ['b'] * 3)
+
+        self.assertEqual(order[:6].count('a'), 4)
+
+    def test_account_concurrency_is_capped(self):
+        sched = FairScheduler(4, 2)
+        sched.acquire('a')
+        sched.acquire('a')
+
+        thread = threading.Thread(target=sched.acquire, args=('a',))
+        thread.start()
+        wait_for(lambda: sched.stats()['a']['queued'] == 1)
+        # other accounts still get the free slots
+        sched.acquire('b')
+
+        self.assertEqual(sched.stats()['a']['running'], 2)
+        sched.release('a')
+        thread.join(5)
+        stats = sched.stats()['a']
+        self.assertEqual((stats['running'], stats['queued'], stats['max_queued'], stats['calls']),
+                         (2, 0, 1, 3))
+        self.assertGreater(stats['max_wait'], 0)
+
+
+class SchedulerUseTests(TestCase):
+    def setUp(self):
+        periodcache.clear()
+
+    def test_api_calls_take_a_slot(self):
+        account = generate_random_account()
+        sched = FairScheduler(8, 2)
+        running = []
+        def fake_call(endpoint, account, params):
+            running.append(sched.stats()[account.account_id]['running'])
+            return {'@attributes': {}}
+
+        with patch('timecardsite.scheduler._scheduler', sched), \
+                patch('timecardsite.services._call', side_effect=fake_call):
+            list(services._call_api('API/Account.json', account))
+
+        self.assertEqual(running, [1])
+        self.assertEqual(sched.stats()[account.account_id]['calls'], 1)
+        self.assertEqual(sched.stats()[account.account_id]['running'], 0)
+
+    def test_shared_limits_hold_across_processes(self):
+        # each scheduler stands in for a different process
+        first = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 1, 0, 60))
+        second = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 1, 0, 60))
+        first.shared.create()
+
+        with first.shared_slot('a'):
+            self.assertEqual(second.shared.acquire('b'), (None, slots.OVERALL))
+            self.assertEqual(second.shared_stats()['running'], 1)
+
+        with second.shared_slot('b'):
+            self.assertEqual(first.shared_stats()['running'], 1)
+        self.assertEqual(first.shared_stats()['running'], 0)
+
+    def test_shared_account_limit(self):
+        first = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 0, 1, 60))
+        second = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 0, 1, 60))
+        first.shared.create(['a', 'b'])
+
+        with first.shared_slot('a'):
+            self.assertEqual(second.shared.acquire('a'), (None, slots.PER_KEY))
+            ticket, full = second.shared.acquire('b')
+            self.assertIsNotNone(ticket)
+            second.shared.release(ticket)
+
+    def test_waiting_for_a_shared_slot_stops_at_the_deadline(self):
+        first = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 1, 0, 60))
+        second = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 1, 0, 60))
+        first.shared.create()
+
+        with first.shared_slot('a'):
+            with self.assertRaises(LightspeedBusy):
+                with second.shared_slot('b', Deadline(0.05)):
+                    pass
+            # nothing was left holding a local slot while it waited
+            self.assertEqual(second.stats(), {})
+
+    def test_a_period_fetch_takes_one_shared_slot(self):
+        account = generate_random_account()
+        account.save()
+        sched = FairScheduler(8, 2, shared=slots.Limits(scheduler.LIGHTSPEED, 8, 2, 60))
+        lightspeed = build_lightspeed()
+        start, end = services._localize_range(account)
+
+        with patch('timecardsite.scheduler._scheduler', sched), \
+                patch.object(sched.shared, 'acquire', wraps=sched.shared.acquire) as acquire, \
+                patch('timecardsite.services._call', side_effect=lightspeed):
+            services.get_period_shifts(account, start, end)
+
+        # shops, employees and two pages of shifts
+        self.assertEqual(len(lightspeed.endpoints), 4)
+        acquire.assert_called_once_with(account.account_id)
+        self.assertEqual(sched.shared_stats()['running'], 0)
+
+    def test_status_is_staff_only(self):
+        user = get_user_model().objects.create_user(email='staff@user.com', password='staffpassword')
+        self.client.login(email='staff@user.com', password='staffpassword')
+
+        self.assertEqual(self.client.get(reverse('lightspeed_status')).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('lightspeed_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('scheduler', response.json())
+        self.assertIn('shared', response.json())
+        self.assertIn('admission', response.json())
@@ -1,18 +1,22 @@
 import json
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 import pytz
 from types import GeneratorType
 
 from django.test import TestCase
 from unittest.mock import Mock, patch
 
-from timecardsite import services
+from timecardsite import admission, periodcache, services
+from timecardsite.deadline import Deadline
 from timecardsite.tests import generate_random_token, generate_random_account
+from timecardsite.tests.budgets import FakeLightspeed
 from timecardsite.secrets import CLIENT_ID, CLIENT_SECRET
 
 class ServicesTests(TestCase):
     def setUp(self):
         self.acct = generate_random_account()
+        # saved, so it has shared Lightspeed slots
+        self.acct.save()
 
     def test_refresh_access_token_POSTs_to_correct_URL_with_proper_payload(self):
         with patch('timecardsite.services.request') as mocked_request:
@@ -314,4 +318,129 @@ class ServicesTests(TestCase):
             }
             self.assertEqual(account_info, expected_account_info)
 
-
+    def test_get_punch_log_groups_shifts_by_day_and_shop(self):
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'},
+                   {'shopID': '2', 'name': 'Fictional_Shop_2'}],
+            employees=[{'employeeID': '63', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[
+                {'employeeHoursID': '3', 'checkIn': '2021-06-02T15:00:00+00:00',
+                 'checkOut': '2021-06-02T17:00:00+00:00', 'employeeID': '63', 'shopID': '2'},
+                {'employeeHoursID': '2', 'checkIn': '2021-06-02T05:00:00+00:00',
+                 'checkOut': '2021-06-02T06:00:00+00:00', 'employeeID': '63', 'shopID': '1'},
+                {'employeeHoursID': '1', 'checkIn': '2021-06-01T15:00:00+00:00',
+                 'checkOut': '2021-06-01T19:30:00+00:00', 'employeeID': '63', 'shopID': '1'},
+            ])
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            punch_log = services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 2))
+
+        # 05:00 UTC on the 2nd is still the 1st in Boise
+        self.assertEqual(list(punch_log['punch_log']), [date(2021, 6, 2), date(2021, 6, 1)])
+        self.assertEqual(list(punch_log['punch_log'][date(2021, 6, 1)]), ['Fictional_Shop_1'])
+        self.assertEqual(len(punch_log['punch_log'][date(2021, 6, 1)]['Fictional_Shop_1']), 2)
+        self.assertEqual(punch_log['total_hours'], 7.5)
+        self.assertEqual(punch_log['shop_totals'], {'Fictional_Shop_1': 5.5, 'Fictional_Shop_2': 2.0})
+        self.assertEqual(punch_log['employee_totals'], {63: 7.5})
+
+    def test_get_punch_log_totals_leave_out_open_shifts(self):
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '63', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[
+                {'employeeHoursID': '2', 'checkIn': '2021-06-02T15:00:00+00:00',
+                 'employeeID': '63', 'shopID': '1'},
+                {'employeeHoursID': '1', 'checkIn': '2021-06-01T15:00:00+00:00',
+                 'checkOut': '2021-06-01T19:30:00+00:00', 'employeeID': '63', 'shopID': '1'},
+            ])
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            punch_log = services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 2))
+
+        self.assertEqual(len(punch_log['punch_log'][date(2021, 6, 2)]['Fictional_Shop_1']), 1)
+        self.assertEqual(punch_log['total_hours'], 4.5)
+        self.assertEqual(punch_log['shop_totals'], {'Fictional_Shop_1': 4.5})
+        self.assertEqual(punch_log['employee_totals'], {63: 4.5})
+        # sent with the page, so its totals can run before that day loads
+        self.assertEqual([shift.shift_id for shift in punch_log['running_shifts']], [2])
+
+    def test_get_punch_log_keeps_employees_with_the_same_name_apart(self):
+        periodcache.clear()
+        shifts = []
+        # a 30 hour week each, which would be 20 hours overtime if merged
+        for employee_id in ('63', '64'):
+            for day in range(1, 4):
+                shifts.append({'employeeHoursID': f'{employee_id}{day}', 'employeeID': employee_id,
+                               'shopID': '1', 'checkIn': f'2021-06-0{day}T15:00:00+00:00',
+                               'checkOut': f'2021-06-0{day + 1}T01:00:00+00:00'})
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '63', 'firstName': 'Sam', 'lastName': 'Smith'},
+                       {'employeeID': '64', 'firstName': 'Sam', 'lastName': 'Smith'}],
+            shifts=shifts)
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            punch_log = services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 4))
+
+        self.assertEqual(punch_log['employee_totals'], {63: 30.0, 64: 30.0})
+        self.assertEqual(punch_log['overtime'][63]['overtime'], 0)
+        self.assertEqual([(employee.employee_id, employee.name, employee.hours)
+                          for employee in punch_log['employees']],
+                         [(63, 'Sam Smith', 30.0), (64, 'Sam Smith', 30.0)])
+
+    def test_get_punch_log_stops_at_deadline_and_loads_more(self):
+        periodcache.clear()
+        shifts = []
+        for shift_id in range(250, 0, -1):
+            check_in = datetime(2021, 6, 1, 15, tzinfo=timezone.utc) + timedelta(minutes=shift_id)
+            shifts.append({'employeeHoursID': str(shift_id), 'employeeID': '63', 'shopID': '1',
+                           'checkIn': check_in.isoformat(),
+                           'checkOut': (check_in + timedelta(minutes=30)).isoformat()})
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '63', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=shifts)
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            # an expired deadline still gets the first page
+            punch_log = services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 2),
+                                               deadline=Deadline(0))
+            self.assertEqual(punch_log['partial'], {'fetched': 100, 'total': 250})
+            self.assertEqual(punch_log['total_hours'], 50)
+
+            punch_log = services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 2),
+                                               deadline=Deadline(0), more=True)
+            self.assertEqual(punch_log['partial'], {'fetched': 200, 'total': 250})
+
+            punch_log = services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 2),
+                                               more=True)
+            self.assertIsNone(punch_log['partial'])
+            self.assertEqual(punch_log['total_hours'], 125)
+
+    def test_partial_period_is_finished_for_callers_without_a_deadline(self):
+        periodcache.clear()
+        shifts = []
+        for shift_id in range(250, 0, -1):
+            check_in = datetime(2021, 6, 1, 15, tzinfo=timezone.utc) + timedelta(minutes=shift_id)
+            shifts.append({'employeeHoursID': str(shift_id), 'employeeID': '63', 'shopID': '1',
+                           'checkIn': check_in.isoformat(),
+                           'checkOut': (check_in + timedelta(minutes=30)).isoformat()})
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '63', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=shifts)
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            services.get_punch_log(self.acct, date(2021, 6, 1), date(2021, 6, 2),
+                                   deadline=Deadline(0))
+
+            # over the admission limits, a partial period won't do for them
+            with self.assertRaises(admission.LightspeedBusy):
+                admission.run_cache_only(services.get_shift_log, self.acct,
+                                         date(2021, 6, 1), date(2021, 6, 2))
+
+            log = services.get_shift_log(self.acct, date(2021, 6, 1), date(2021, 6, 2))
+
+        self.assertEqual(log['total_hours'], 125)
+        start, end = services._localize_range(self.acct, date(2021, 6, 1), date(2021, 6, 2))
+        self.assertFalse(periodcache.peek(services._period_key(self.acct, start, end)).value.is_partial)
@@ -0,0 +1,75 @@
+import pickle
+from datetime import date, datetime, timezone
+
+from django.test import SimpleTestCase
+
+from timecardsite import localtime
+from timecardsite.shifts import PeriodShifts, Shift, epoch_seconds
+
+class ShiftTests(SimpleTestCase):
+    def setUp(self):
+        self.shops = {'1': 'Fictional_Shop_1'}
+        self.employees = {'63': 'Ex1 Employee'}
+
+    def test_from_api_stores_integer_ids_and_epoch_seconds(self):
+        shift = Shift.from_api({
+            'employeeHoursID': '4663',
+            'checkIn': '2021-02-26T18:10:19+00:00',
+            'checkOut': '2021-02-26T19:06:21+00:00',
+            'employeeID': '63',
+            'shopID': '1'
+        }, self.shops, self.employees)
+
+        self.assertEqual(shift.shift_id, 4663)
+        self.assertEqual(shift.employee_id, 63)
+        self.assertEqual(shift.shop_id, 1)
+        self.assertEqual(shift.check_in_ts, epoch_seconds('2021-02-26T18:10:19+00:00'))
+        self.assertEqual(shift.seconds, 56 * 60 + 2)
+        self.assertEqual(shift.check_in, datetime(2021, 2, 26, 18, 10, 19, tzinfo=timezone.utc))
+        self.assertEqual(shift.check_out, datetime(2021, 2, 26, 19, 6, 21, tzinfo=timezone.utc))
+        self.assertEqual(shift.name, 'Ex1 Employee')
+        self.assertEqual(shift.shop, 'Fictional_Shop_1')
+
+    def test_open_shift_is_measured_to_now(self):
+        check_in = epoch_seconds('2021-02-26T18:00:00+00:00')
+        shift = Shift.from_api({
+            'employeeHoursID': '4664',
+            'checkIn': '2021-02-26T18:00:00+00:00',
+            'employeeID': '63',
+            'shopID': '1'
+        }, self.shops, now=check_in + 5400)
+
+        self.assertTrue(shift.is_open)
+        self.assertIsNone(shift.check_out)
+        self.assertEqual(shift.shift_time, 1.5)
+
+    def test_shift_is_immutable(self):
+        shift = Shift(1, 63, 1, 0, 3600, 3600, 'Ex1 Employee', 'Fictional_Shop_1')
+
+        with self.assertRaises(AttributeError):
+            shift.seconds = 7200
+        with self.assertRaises(AttributeError):
+            shift.extra = True
+
+    def test_names_are_interned(self):
+        first = Shift(1, 63, 1, 0, 3600, 3600, ''.join(['Ex1 ', 'Employee']), 'Shop')
+        second = Shift(2, 63, 1, 0, 3600, 3600, ''.join(['Ex1 ', 'Employee']), 'Shop')
+
+        self.assertIs(first.name, second.name)
+
+    def test_shift_survives_pickling(self):
+        shift = Shift(1, 63, 1, 0, None, 3600, 'Ex1 Employee', 'Fictional_Shop_1')
+
+        self.assertEqual(pickle.loads(pickle.dumps(shift)), shift)
+
+    def test_by_day_buckets_local_days_once(self):
+        late = Shift(1, 63, 1, epoch_seconds('2021-06-02T05:00:00+00:00'), None, 0, 'Ex1 Employee', 'Shop')
+        early = Shift(2, 63, 1, epoch_seconds('2021-06-02T15:00:00+00:00'), None, 0, 'Ex1 Employee', 'Shop')
+        period = PeriodShifts(None, None, {}, {}, [late, early])
+        clock = localtime.clock_for('America/Boise', date(2021, 6, 1), date(2021, 6, 2))
+
+        days = period.by_day(clock)
+
+        # 05:00 UTC on the 2nd is still the 1st in Boise
+        self.assertEqual(days, {date(2021, 6, 1): [late], date(2021, 6, 2): [early]})
+        self.assertIs(period.by_day(clock), days)
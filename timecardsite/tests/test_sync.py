@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from timecardsite import sync
+from timecardsite.tests import generate_random_account
+from timecardsite.models import SyncLease
+
+
+@override_settings(SYNC_LEASE_SECONDS=60)
+class SyncLeaseTests(TestCase):
+    def setUp(self):
+        self.accounts = []
+        for _ in range(3):
+            account = generate_random_account()
+            account.save()
+            self.accounts.append(account)
+        sync.ensure_leases()
+        self.before = timezone.now()
+
+    def test_ensure_leases_skips_accounts_not_onboarded(self):
+        account = generate_random_account()
+        account.is_onboarded = False
+        account.save()
+
+        sync.ensure_leases()
+
+        self.assertEqual(SyncLease.objects.count(), 3)
+
+    def test_an_account_is_only_claimed_once(self):
+        claimed = [sync.claim_next('worker-a', self.before) for _ in range(3)]
+        claimed.append(sync.claim_next('worker-b', self.before))
+
+        self.assertEqual(sorted(account.account_id for account in claimed[:3]),
+                         sorted(account.account_id for account in self.accounts))
+        self.assertIsNone(claimed[3])
+
+    def test_expired_lease_is_claimed_by_another_worker(self):
+        crashed = sync.claim_next('worker-a', self.before)
+        sync.release('worker-a', sync.claim_next('worker-a', self.before).account_id)
+        sync.release('worker-a', sync.claim_next('worker-a', self.before).account_id)
+
+        self.assertIsNone(sync.claim_next('worker-b', self.before))
+
+        later = timezone.now() + timedelta(seconds=61)
+        self.assertEqual(sync.claim_next('worker-b', self.before, now=later), crashed)
+
+    def test_heartbeat_only_extends_the_owners_lease(self):
+        account = sync.claim_next('worker-a', self.before)
+
+        self.assertTrue(sync.extend('worker-a', account.account_id))
+        self.assertFalse(sync.extend('worker-b', account.account_id))
+
+    def test_worker_syncs_every_due_account_once(self):
+        synced = []
+        def fake_sync(account, guard):
+            synced.append(account.account_id)
+            if account == self.accounts[1]:
+                raise ConnectionError('bad tokens')
+            return ['alert']
+
+        stats = sync.run_worker('worker-a', self.before, sync=fake_sync)
+
+        self.assertEqual(sorted(synced), sorted(account.account_id for account in self.accounts))
+        self.assertEqual((stats.synced, stats.failed, stats.alerts), (2, 1, 2))
+        self.assertEqual(stats.errors, [(self.accounts[1].account_id, "ConnectionError('bad tokens')")])
+        self.assertFalse(SyncLease.objects.exclude(owner='').exists())
+        self.assertFalse(SyncLease.objects.filter(last_synced__isnull=True).exists())
+
+        # nothing is due again until the next round
+        self.assertEqual(sync.run_worker('worker-b', self.before, sync=fake_sync).synced, 0)
+
+    def test_sync_is_not_saved_once_the_lease_is_lost(self):
+        saved = []
+        def fake_sync(account, guard):
+            # stalled past the expiry, and another worker took over
+            SyncLease.objects.filter(account=account).update(owner='worker-b')
+            guard()
+            saved.append(account)
+            return []
+
+        stats = sync.run_worker('worker-a', self.before, sync=fake_sync)
+
+        self.assertEqual(saved, [])
+        self.assertEqual(stats.failed, 3)
+        self.assertIn('LeaseLost', stats.errors[0][1])
+        # worker-b's leases are left alone
+        self.assertEqual(SyncLease.objects.filter(owner='worker-b').count(), 3)
+
+    def test_hosts_share_the_round_in_progress(self):
+        started = sync.round_start()
+        sync.release('worker-a', sync.claim_next('worker-a', started).account_id)
+
+        # a host joining later still works to the same boundary
+        self.assertEqual(sync.round_start(timezone.now() + timedelta(minutes=1)), started)
+        self.assertEqual(sync.run_worker('worker-b', sync.round_start(),
+                                         sync=lambda account, guard: []).synced, 2)
+
+        # the round is done, so the next host to ask starts another
+        later = timezone.now() + timedelta(minutes=2)
+        self.assertEqual(sync.round_start(later), later)
+        self.assertEqual(sync.round_start(later + timedelta(minutes=1)), later)
+
+    @patch('timecardsite.sync.alerts.send_digests', return_value=0)
+    @patch('timecardsite.sync.alerts.sync_account', return_value=[])
+    def test_command_reports_each_shard(self, mocked_sync, mocked_digests):
+        out = StringIO()
+
+        call_command('sync_alerts', workers=1, stdout=out)
+
+        self.assertEqual(mocked_sync.call_count, 3)
+        self.assertIn('3 synced, 0 failed', out.getvalue())
+        self.assertIn('3 accounts in', out.getvalue())
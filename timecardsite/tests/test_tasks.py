@@ -0,0 +1,151 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from invitations.utils import get_invitation_model
+
+from timecardsite import invites, tasks
+from timecardsite.models import InvitationMeta, Task
+
+calls = []
+
+
+@tasks.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(name='tests.flaky', max_attempts=2)
+def flaky():
+    raise ValueError('Lightspeed said no.')
+
+
+@override_settings(TASK_RETRY_BACKOFF_SECONDS=10)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_tasks_run_in_order(self):
+        record.enqueue('first')
+        record.enqueue('second')
+
+        stats = tasks.run_worker('worker', drain=True)
+
+        self.assertEqual(calls, ['first', 'second'])
+        self.assertEqual(stats.done, 2)
+        task = Task.objects.first()
+        self.assertEqual(task.status, tasks.DONE)
+        self.assertIsNotNone(task.seconds)
+        self.assertIsNotNone(task.waited)
+
+    def test_dedupe_key_queues_once(self):
+        first = record.enqueue('a', dedupe_key='k')
+        second = record.enqueue('b', dedupe_key='k')
+
+        self.assertEqual(first.pk, second.pk)
+
+        tasks.run_worker('worker', drain=True)
+        # once it's done the key can be queued again
+        third = record.enqueue('c', dedupe_key='k')
+
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(calls, ['a'])
+
+    def test_enqueue_gives_up_on_other_integrity_errors(self):
+        with patch.object(Task.objects, 'create', side_effect=IntegrityError) as create:
+            with self.assertRaises(IntegrityError):
+                record.enqueue('a')
+            self.assertEqual(create.call_count, 1)
+
+            # a clash with no queued task to return, over and over
+            create.reset_mock()
+            with self.assertRaises(IntegrityError):
+                record.enqueue('a', dedupe_key='k')
+            self.assertEqual(create.call_count, tasks.ENQUEUE_ATTEMPTS)
+
+    def test_delayed_tasks_are_not_due(self):
+        record.enqueue('later', delay=60)
+
+        self.assertIsNone(tasks.claim_next('worker'))
+        self.assertIsNotNone(tasks.claim_next('worker', now=timezone.now() + timedelta(seconds=61)))
+
+    def test_failures_are_retried_with_backoff(self):
+        flaky.enqueue()
+
+        task = tasks.claim_next('worker')
+        self.assertEqual(tasks.run(task), tasks.QUEUED)
+        task.refresh_from_db()
+        self.assertIn('Lightspeed said no.', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=9))
+
+        task = tasks.claim_next('worker', now=task.run_at)
+        self.assertEqual(tasks.run(task), tasks.FAILED)
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_backoff_doubles(self):
+        self.assertEqual([tasks.backoff(attempts) for attempts in (1, 2, 3)], [10, 20, 40])
+
+    def test_claimed_tasks_are_not_claimed_twice(self):
+        record.enqueue('once')
+
+        self.assertIsNotNone(tasks.claim_next('a'))
+        self.assertIsNone(tasks.claim_next('b'))
+
+    @override_settings(TASK_TIMEOUT_SECONDS=30)
+    def test_tasks_of_dead_workers_are_taken_over(self):
+        record.enqueue('orphan')
+        tasks.claim_next('dead')
+
+        task = tasks.claim_next('alive', now=timezone.now() + timedelta(seconds=31))
+
+        self.assertEqual(task.owner, 'alive')
+        self.assertEqual(task.attempts, 2)
+
+    @override_settings(TASK_TIMEOUT_SECONDS=30)
+    def test_tasks_out_of_time_on_the_last_attempt_fail(self):
+        flaky.enqueue(dedupe_key='k')
+        tasks.claim_next('dead')
+        later = timezone.now() + timedelta(seconds=31)
+        tasks.claim_next('dead', now=later)
+
+        self.assertIsNone(tasks.claim_next('alive', now=later + timedelta(seconds=31)))
+
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (tasks.FAILED, 2))
+        self.assertIn('out of time', task.last_error)
+        # the key is free again
+        self.assertNotEqual(flaky.enqueue(dedupe_key='k').pk, task.pk)
+
+    def test_stats(self):
+        record.enqueue('a')
+        flaky.enqueue(delay=60)
+        tasks.run_worker('worker', drain=True)
+
+        stats = tasks.stats()
+
+        self.assertEqual(stats['tests.record']['done'], 1)
+        self.assertIn('mean_seconds', stats['tests.record'])
+        self.assertEqual(stats['tests.flaky']['queued'], 1)
+
+
+class InviteTaskTests(TestCase):
+    def setUp(self):
+        self.manager = get_user_model().objects.create_user(email='manager@user.com',
+                                                            password='managerpassword')
+        self.invite = get_invitation_model().create('test@user.com', inviter=self.manager)
+        InvitationMeta.objects.create(invite=self.invite, employee_id='67', name='Test User')
+
+    def test_send_invite(self):
+        invites.send_invite.enqueue(self.invite.pk, 'http://testserver/')
+        tasks.run_worker('worker', drain=True)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(f'http://testserver/invitations/accept-invite/{self.invite.key}',
+                      mail.outbox[0].body)
+        self.invite.refresh_from_db()
+        self.assertIsNotNone(self.invite.sent)
@@ -0,0 +1,65 @@
+from datetime import date, datetime, timezone
+
+from django.test import SimpleTestCase
+
+from timecardsite import localtime
+from timecardsite.payperiod import BiWeeklyPayPeriod
+from timecardsite.shifts import Shift
+from timecardsite.trends import period_trends, sparkline
+
+HOUR = 3600
+
+def ts(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+def shift(shift_id, employee_id, shop, start, hours, open=False):
+    return Shift(shift_id, employee_id, 1, start, None if open else start + hours * HOUR,
+                 hours * HOUR, f'Employee {employee_id}', shop)
+
+class TrendTests(SimpleTestCase):
+    def setUp(self):
+        self.calendar = BiWeeklyPayPeriod(date(2021, 5, 29))
+        self.clock = localtime.clock_for('America/Boise', date(2021, 5, 1), date(2021, 6, 25))
+        self.periods = self.calendar.periods(date(2021, 5, 1), date(2021, 6, 25))
+
+    def test_shifts_are_bucketed_by_local_period(self):
+        shifts = [
+            # 11 PM on May 28th in Boise, the last day of the period before
+            shift(1, 1, 'Shop A', ts(2021, 5, 29, 5), 2),
+            shift(2, 1, 'Shop A', ts(2021, 5, 29, 15), 8),
+            shift(3, 2, 'Shop B', ts(2021, 6, 14, 15), 4),
+            shift(4, 2, 'Shop B', ts(2021, 6, 15, 15), 4, open=True),
+        ]
+
+        trends = period_trends(shifts, self.calendar, self.clock, self.periods)
+
+        self.assertEqual(trends['periods'][0], (date(2021, 5, 1), date(2021, 5, 14)))
+        self.assertEqual(trends['hours'], [0, 2, 8, 4])
+        [shop_a, shop_b] = trends['shops']
+        self.assertEqual((shop_a.name, shop_a.hours, shop_a.total), ('Shop A', [0, 2, 8, 0], 10))
+        self.assertEqual(shop_b.hours, [0, 0, 0, 4])
+        self.assertEqual([row.name for row in trends['employees']], ['Employee 1', 'Employee 2'])
+
+    def test_employees_sharing_a_name_get_their_own_rows(self):
+        shifts = [
+            Shift(1, 1, 1, ts(2021, 6, 14, 15), ts(2021, 6, 14, 17), 2 * HOUR, 'Sam', 'Shop A'),
+            Shift(2, 2, 1, ts(2021, 6, 14, 15), ts(2021, 6, 14, 20), 5 * HOUR, 'Sam', 'Shop A'),
+        ]
+
+        trends = period_trends(shifts, self.calendar, self.clock, self.periods)
+
+        self.assertEqual([(row.name, row.total) for row in trends['employees']],
+                         [('Sam', 2), ('Sam', 5)])
+
+    def test_shifts_outside_the_periods_are_ignored(self):
+        shifts = [shift(1, 1, 'Shop A', ts(2021, 7, 1, 15), 8)]
+
+        trends = period_trends(shifts, self.calendar, self.clock, self.periods)
+
+        self.assertEqual(trends['hours'], [0, 0, 0, 0])
+        self.assertEqual(trends['shops'], [])
+
+    def test_sparkline_scales_to_fit(self):
+        self.assertEqual(sparkline([0, 5, 10], width=100, height=20), '0.0,20.0 50.0,10.0 100.0,0.0')
+        self.assertEqual(sparkline([0, 0], width=100, height=20), '0.0,20.0 100.0,20.0')
+        self.assertEqual(sparkline([]), '')
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core import mail
 from django.test import TestCase
 from django.test.utils import ignore_warnings
 from unittest.mock import patch
@@ -6,10 +8,13 @@ from django.contrib.auth import get_user_model
 
 from invitations.utils import get_invitation_model
 
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
+import time
 
+from timecardsite import periodcache
 from timecardsite.tests import generate_random_token
-from timecardsite.models import Account, Profile, InvitationMeta
+from timecardsite.tests.budgets import FakeLightspeed
+from timecardsite.models import Account, Profile, InvitationMeta, Membership, Task
 
 
 class ViewsTests(TestCase):
@@ -134,6 +139,44 @@ class ViewsTests(TestCase):
         self.assertEqual(new_profile.role, 'mgr')
 
 
+    @patch('timecardsite.views.services.get_account_info')
+    def test_auth_view_adds_another_account_as_a_membership(self, mocked_account_info):
+        test_initial = {
+            'access_token': generate_random_token(),
+            'refresh_token': generate_random_token(),
+            'account_id': generate_random_token(5),
+            'name': 'Second Store for Owners'
+        }
+        mocked_account_info.return_value = test_initial
+
+        self.client.login(email='manager@user.com', password='managerpassword')
+        response = self.client.get(
+            f'/auth/?code={generate_random_token()}&state={self.manager_user.id}')
+
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        # the profile still points at the first account
+        self.assertEqual(Profile.objects.get(user=self.manager_user).account, self.manager_account)
+        membership = Membership.objects.get(user=self.manager_user)
+        self.assertEqual(membership.account.name, 'Second Store for Owners')
+        self.assertEqual(membership.account.pay_period_reference_date, date(2021, 5, 29))
+        self.assertTrue(membership.account.is_onboarded)
+
+    @patch('timecardsite.views.services.get_account_info')
+    def test_auth_view_only_adds_memberships_for_the_logged_in_user(self, mocked_account_info):
+        mocked_account_info.return_value = {
+            'access_token': generate_random_token(),
+            'refresh_token': generate_random_token(),
+            'account_id': generate_random_token(5),
+            'name': 'Somebody Else\'s Store'
+        }
+
+        self.client.login(email='employee@user.com', password='employeepassword')
+        response = self.client.get(
+            f'/auth/?code={generate_random_token()}&state={self.manager_user.id}')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Membership.objects.filter(user=self.manager_user).exists())
+
     @patch('timecardsite.views.services.get_account_info')
     def test_auth_view_redirects_to_post_login(self, mocked_account_info):
         user_id = get_user_model().objects.get(email='unauthed@user.com').id
@@ -302,10 +345,111 @@ class ViewsTests(TestCase):
         self.assertEqual(get_invitation_model().objects.count(), 2)
         self.assertEqual(InvitationMeta.objects.count(), 2)
 
+    def test_invite_view_queues_the_email(self):
+        self.client.login(email='manager@user.com', password='managerpassword')
+
+        self.client.post('/invite/', data={'invites': '67,Test User,test@user.com'})
 
+        invite = get_invitation_model().objects.get()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(Task.objects.filter(dedupe_key=f'send_invite:{invite.pk}').exists())
 
 
 
 
 
 
+
+
+
+    def test_aggregate_with_open_shift_is_unchanged_between_requests(self):
+        check_in = datetime.now(timezone.utc) - timedelta(hours=2)
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[{'employeeHoursID': '1', 'checkIn': check_in.isoformat(timespec='seconds'),
+                     'employeeID': '1', 'shopID': '1'}])
+        self.client.login(email='manager@user.com', password='managerpassword')
+        periodcache.clear()
+
+        with patch('timecardsite.services._call', side_effect=lightspeed), \
+             patch('timecardsite.services.time.time', return_value=check_in.timestamp() + 7200):
+            first = self.client.get(reverse('aggregate'))
+        periodcache.clear()
+        with patch('timecardsite.services._call', side_effect=lightspeed), \
+             patch('timecardsite.services.time.time', return_value=check_in.timestamp() + 9000):
+            second = self.client.get(reverse('aggregate'), HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertContains(first, f'data-check-in="{int(check_in.timestamp())}"')
+        self.assertEqual(second.status_code, 304)
+
+    def test_aggregate_serves_stale_shifts_while_refreshing(self):
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[])
+        self.client.login(email='manager@user.com', password='managerpassword')
+        periodcache.clear()
+
+        with patch('timecardsite.services._call', side_effect=lightspeed):
+            self.client.get(reverse('aggregate'))
+
+        fetched_at = time.time() - settings.SHIFT_CACHE_SECONDS - 60
+        for key in list(periodcache._entries):
+            periodcache._entries[key].fetched_at = fetched_at
+            periodcache._entries[key].value.fetched_at = fetched_at
+
+        with patch('timecardsite.services._call', side_effect=lightspeed) as mocked_call, \
+             patch('timecardsite.periodcache.refresh_in_background') as mocked_refresh:
+            response = self.client.get(reverse('aggregate'))
+
+        self.assertContains(response, 'as of')
+        mocked_call.assert_not_called()
+        mocked_refresh.assert_called_once()
+
+    def test_aggregate_shows_partial_notice_past_deadline(self):
+        check_in = datetime.now(timezone.utc) - timedelta(days=1)
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[{'employeeHoursID': str(shift_id), 'employeeID': '1', 'shopID': '1',
+                     'checkIn': (check_in - timedelta(minutes=shift_id)).isoformat(timespec='seconds'),
+                     'checkOut': check_in.isoformat(timespec='seconds')}
+                    for shift_id in range(150, 0, -1)])
+        self.client.login(email='manager@user.com', password='managerpassword')
+        periodcache.clear()
+
+        with self.settings(REQUEST_DEADLINE_SECONDS=0), \
+             patch('timecardsite.services._call', side_effect=lightspeed):
+            response = self.client.get(reverse('aggregate'))
+            self.assertContains(response, 'Showing 100 of 150 shifts')
+            self.assertContains(response, '?more=1')
+
+            response = self.client.get(reverse('aggregate'), {'more': '1'})
+            self.assertNotContains(response, 'Load more')
+
+    def test_aggregate_renders_first_days_and_loads_the_rest(self):
+        lightspeed = FakeLightspeed(
+            shops=[{'shopID': '1', 'name': 'Fictional_Shop_1'}],
+            employees=[{'employeeID': '1', 'firstName': 'Ex1', 'lastName': 'Employee'}],
+            shifts=[{'employeeHoursID': str(day), 'employeeID': '1', 'shopID': '1',
+                     'checkIn': f'2021-06-{day:02}T15:00:00+00:00',
+                     'checkOut': f'2021-06-{day:02}T17:00:00+00:00'}
+                    for day in range(10, 0, -1)])
+        self.client.login(email='manager@user.com', password='managerpassword')
+        periodcache.clear()
+        params = {'range': 'custom', 'start_date': '2021-06-01', 'end_date': '2021-06-10'}
+
+        with patch('timecardsite.services._call', side_effect=lightspeed) as mocked_call:
+            response = self.client.get(reverse('aggregate'), params)
+            calls = mocked_call.call_count
+            day = self.client.get(reverse('aggregate_day'), dict(params, day='2021-06-02'))
+
+        self.assertEqual(response.context['later_days'], [date(2021, 6, 3), date(2021, 6, 2), date(2021, 6, 1)])
+        self.assertContains(response, 'class="lazy-day"', count=3)
+        self.assertContains(response, '20.00')
+
+        # the day comes out of the period the page already fetched
+        self.assertEqual(mocked_call.call_count, calls)
+        self.assertContains(day, 'June 2, 2021')
+        self.assertContains(day, 'Ex1 Employee', count=1)
@@ -0,0 +1,83 @@
+'''
+Hours over several pay periods, per shop and per employee.
+
+The whole window is fetched as one range and each shift is dropped into
+its period with the account's PayPeriodCalendar as it goes by, so the
+cost is one pass over the shifts however many periods are compared.
+'''
+from collections import defaultdict, namedtuple
+
+# size of the inline sparkline drawn next to each row
+SPARKLINE_WIDTH = 100
+SPARKLINE_HEIGHT = 20
+
+TrendRow = namedtuple('TrendRow', ['name', 'hours', 'total', 'sparkline'])
+
+
+def sparkline(series, width=SPARKLINE_WIDTH, height=SPARKLINE_HEIGHT):
+    '''
+    the points attribute of an SVG polyline drawing series, scaled to fit
+    width by height with zero along the bottom edge
+    '''
+    if not series:
+        return ''
+    top = max(series) or 1
+    step = width / max(len(series) - 1, 1)
+    return ' '.join(f'{round(i * step, 1)},{round(height - value / top * height, 1)}'
+                    for i, value in enumerate(series))
+
+
+def _rows(seconds, num_periods, names=None):
+    '''
+    :param names: key to the name shown for it, when the keys are IDs
+    '''
+    names = names or dict()
+    rows = []
+    for key, by_period in sorted(seconds.items(),
+                                 key=lambda item: (str(names.get(item[0], item[0])), item[0])):
+        hours = [round(by_period[i] / 3600, 2) for i in range(num_periods)]
+        rows.append(TrendRow(names.get(key, key), hours, round(sum(hours), 2), sparkline(hours)))
+    return rows
+
+
+def period_trends(shifts, calendar, clock, periods):
+    '''
+    closed hours per period for every shop and every employee
+    :param shifts: Shifts over the window, in any order
+    :param calendar: PayPeriodCalendar the periods come from
+    :param clock: LocalClock covering the window
+    :param periods: (index, first date, last date) for each period, oldest
+                    first, as returned by calendar.periods()
+    :return: dict with the periods, the hours of each one, and a TrendRow
+             per shop and per employee
+    '''
+    first_index = periods[0][0]
+    num_periods = len(periods)
+
+    # open shifts are still running, like everywhere else they're left out
+    closed = [shift for shift in shifts if not shift.is_open]
+    indexes = calendar.bucket(clock, [shift.check_in_ts for shift in closed])
+
+    totals = [0] * num_periods
+    shop_seconds = defaultdict(lambda: [0] * num_periods)
+    # by ID, as two employees can share a name
+    employee_seconds = defaultdict(lambda: [0] * num_periods)
+    employee_names = dict()
+    for shift, index in zip(closed, indexes):
+        position = index - first_index
+        if not 0 <= position < num_periods:
+            continue
+        totals[position] += shift.seconds
+        shop_seconds[shift.shop][position] += shift.seconds
+        employee_seconds[shift.employee_id][position] += shift.seconds
+        employee_names[shift.employee_id] = shift.name
+
+    hours = [round(seconds / 3600, 2) for seconds in totals]
+
+    return {
+        'periods': [(start, end) for index, start, end in periods],
+        'hours': hours,
+        'sparkline': sparkline(hours),
+        'shops': _rows(shop_seconds, num_periods),
+        'employees': _rows(employee_seconds, num_periods, employee_names)
+    }
@@ -1,22 +1,44 @@
-from django.http import Http404, HttpResponse
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.contrib.auth import get_user_model
-from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import cache_control
 
 from invitations.utils import get_invitation_model
 
 from datetime import date
+from functools import wraps
+from urllib.parse import urlencode
 import time
 
-from timecardsite import services
-from timecardsite.models import Account, Profile, InvitationMeta
-from timecardsite.forms import OnboardingForm, NameForm, RangeForm
-from timecardsite.payperiod import BiWeeklyPayPeriod
+from timecardsite import (admission, dashboard as owner_dashboard, display, invites,
+                          live as live_board, localtime, scheduler, services,
+                          trends as trend_report)
+from timecardsite.admission import lightspeed_bound
+from timecardsite.models import Account, Profile, InvitationMeta, Membership
+from timecardsite.forms import OnboardingForm, NameForm, CoverageForm, TrendForm, read_range
+from timecardsite.deadline import Deadline
+from timecardsite.middleware import forget_shift_account
+
+# days of the punch log rendered with the page, before lazy loading
+AGGREGATE_FIRST_DAYS = 7
 
 ### User passes test
-def manager_check(user):
-    return user.profile.is_manager
+def manager_required(view):
+    '''
+    lets managers through and sends everyone else to log in. reads the
+    role from request.shift_account so no extra profile query is made
+    '''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.shift_account and request.shift_account.is_manager:
+            return view(request, *args, **kwargs)
+        return redirect(settings.LOGIN_URL)
+    return wrapper
 ###
 
 @login_required()
@@ -34,11 +56,37 @@ def auth(request):
     if code:
 
         account_info = services.get_account_info(code)
+        user = get_user_model().objects.get(id=request.GET.get('state'))
+        profile = Profile.objects.select_related('account').filter(user=user).first()
+
+        if profile is not None and profile.account_id != account_info['account_id']:
+            # an owner connecting another of their accounts. state comes
+            # back from Lightspeed unsigned, so only take it from the owner
+            if request.user.pk != user.pk:
+                raise PermissionDenied
+            # it starts out with the same settings as the one they already have
+            account, created = Account.objects.get_or_create(
+                account_id=account_info['account_id'],
+                defaults={
+                    'timezone': profile.account.timezone,
+                    'pay_period_type': profile.account.pay_period_type,
+                    'pay_period_reference_date': profile.account.pay_period_reference_date,
+                    'is_onboarded': profile.account.is_onboarded
+                }
+            )
+            account.access_token = account_info['access_token']
+            account.refresh_token = account_info['refresh_token']
+            account.name = account_info['name']
+            account.save()
+
+            Membership.objects.get_or_create(user=user, account=account)
+            return redirect('dashboard')
+
         account = Account(**account_info)
         account.save()
 
         profile_info = {
-            'user': get_user_model().objects.get(id=request.GET.get('state')),
+            'user': user,
             'account': account,
             'role': 'mgr'
         }
@@ -57,13 +105,11 @@ def post_login(request):
         and has not been onboarded it should redirect to onboard view
         and has been onboarded it should redirect to aggregate view
     '''
-    try:
-        request.user.profile
-    except Profile.DoesNotExist:
+    if not request.shift_account:
         return redirect('connect') # for now
 
-    if request.user.profile.role == 'mgr':
-        if request.user.profile.account.is_onboarded:
+    if request.shift_account.is_manager:
+        if request.shift_account.is_onboarded:
             return redirect('aggregate')
         else:
             return redirect('onboard')
@@ -78,34 +124,38 @@ def connect(request):
 
 @login_required()
 def onboard(request):
+    profile = request.shift_account.profile
+    account = profile.account
+
     if request.method == 'POST':
         form = OnboardingForm(request.POST,
-                              account=request.user.profile.account)
+                              account=account)
         if form.is_valid():
-            request.user.profile.account.timezone = form.cleaned_data['timezone']
+            account.timezone = form.cleaned_data['timezone']
 
             if ',' in form.cleaned_data['employees']:
                 id, name = form.cleaned_data['employees'].split(',')
-                request.user.profile.employee_id = id
-                request.user.profile.name = name
+                profile.employee_id = id
+                profile.name = name
             else:
                 id = form.cleaned_data['employees']
-                request.user.profile.employee_id = id
+                profile.employee_id = id
 
-            request.user.profile.account.pay_period_type = form.cleaned_data['pay_periods']
-            request.user.profile.account.pay_period_reference_date = form.cleaned_data['reference_date']
+            account.pay_period_type = form.cleaned_data['pay_periods']
+            account.pay_period_reference_date = form.cleaned_data['reference_date']
 
-            request.user.profile.account.is_onboarded = True
+            account.is_onboarded = True
 
-            request.user.profile.account.save()
-            request.user.profile.save()
+            account.save()
+            profile.save()
+            forget_shift_account(request)
 
             if id == '00':
                 return redirect('name')
             else:
                 return redirect('aggregate')
     else:
-        form = OnboardingForm(account=request.user.profile.account)
+        form = OnboardingForm(account=account)
 
     return render(request, 'onboard.html', {'form': form})
 
@@ -113,8 +163,10 @@ def name(request):
     if request.method == 'POST':
         form = NameForm(request.POST)
         if form.is_valid():
-            request.user.profile.name = form.cleaned_data['name']
-            request.user.profile.save()
+            profile = request.shift_account.profile
+            profile.name = form.cleaned_data['name']
+            profile.save()
+            forget_shift_account(request)
             return redirect('aggregate')
     else:
         form = NameForm()
@@ -127,9 +179,10 @@ def invite(request):
             # separate out id name and email
             id, name, email = employee.split(',')
 
-            # create an invitation and send it
+            # create an invitation and queue it to be sent
             invite = get_invitation_model().create(email, inviter=request.user)
-            invite.send_invitation(request)
+            invites.send_invite.enqueue(invite.pk, request.build_absolute_uri('/'),
+                                        dedupe_key=f'send_invite:{invite.pk}')
 
             # store and save meta information regarding the invite
             InvitationMeta.objects.create(
@@ -141,10 +194,10 @@ def invite(request):
         # todo invite successful message
         return redirect('invite')
     else:
-        timezone.activate(request.user.profile.account.timezone)
+        timezone.activate(request.shift_account.timezone)
 
         employees = services.get_employee_ids_names_and_emails(
-            request.user.profile.account)
+            request.shift_account.account)
 
         invitable = []
         missing_email = []
@@ -154,7 +207,7 @@ def invite(request):
         for employee in employees:
             # skip the logged in employee
             if not Profile.objects.filter(employee_id=employee['id'], is_custom=True).exists():
-                if employee['id'] == request.user.profile.employee_id:
+                if employee['id'] == request.shift_account.employee_id:
                     pass
 
                 elif Profile.objects.filter(employee_id=employee['id']).exists() and \
@@ -188,41 +241,35 @@ def invite(request):
             'accepted_invite': accepted_invite
         })
 
+def _more_url(request):
+    '''
+    the same page, carrying on a fetch its deadline cut short
+    '''
+    params = request.GET.copy()
+    params['more'] = '1'
+    return request.path + '?' + params.urlencode()
+
+@lightspeed_bound()
+@cache_control(private=True, no_cache=True)
 @login_required()
 def timecard(request):
-    timezone.activate(request.user.profile.account.timezone)
+    timezone.activate(request.shift_account.timezone)
 
-    bwp = BiWeeklyPayPeriod(request.user.profile.account.pay_period_reference_date)
-
-    if request.GET:
-        form = RangeForm(request.GET)
-        if form.is_valid():
-            range = form.cleaned_data['range']
-
-            if range == 'current':
-                (start, end) = bwp.current()
-            elif range == 'previous':
-                (start, end) = bwp.previous()
-            else:
-                # might come back as iso formatted strings instead of date object
-                # use date.fromisoformat() if they do
-                start = form.cleaned_data['start_date']
-                end = form.cleaned_data['end_date']
-
-    else:
-        # do current by default
-        form = RangeForm()
-        range = 'current'
-        (start, end) = bwp.current()
+    bwp = request.shift_account.pay_period
+    form, range, start, end = read_range(request, bwp)
 
     context = services.get_punch_log_by_employee(
-        request.user.profile.account,
-        employee_id=request.user.profile.employee_id,
+        request.shift_account.account,
+        employee_id=request.shift_account.employee_id,
         start_date=start,
-        end_date=end
+        end_date=end,
+        deadline=Deadline(settings.REQUEST_DEADLINE_SECONDS),
+        more='more' in request.GET
     )
 
+    context['rows_html'] = display.render_timecard(context['rows'])
     context['form'] = form
+    context['more_url'] = _more_url(request)
     context['range'] = range
     context['start'] = date.isoformat(start)
     context['end'] = date.isoformat(end)
@@ -230,35 +277,113 @@ def timecard(request):
     return render(request, 'timecard.html', context)
 
 
-@user_passes_test(manager_check, redirect_field_name=None)
+@lightspeed_bound()
+@cache_control(private=True, no_cache=True)
+@manager_required
 @login_required()
 def aggregate(request):
-    timezone.activate(request.user.profile.account.timezone)
+    timezone.activate(request.shift_account.timezone)
 
-    bwp = BiWeeklyPayPeriod(request.user.profile.account.pay_period_reference_date)
+    bwp = request.shift_account.pay_period
+    form, range, start, end = read_range(request, bwp)
 
-    if request.GET:
-        form = RangeForm(request.GET)
-        if form.is_valid():
-            range = form.cleaned_data['range']
+    context = services.get_punch_log(
+        request.shift_account.account,
+        start_date=start,
+        end_date=end,
+        deadline=Deadline(settings.REQUEST_DEADLINE_SECONDS),
+        more='more' in request.GET
+    )
 
-            if range == 'current':
-                (start, end) = bwp.current()
-            elif range == 'previous':
-                (start, end) = bwp.previous()
-            else:
-                # might come back as iso formatted strings instead of date object
-                # use date.fromisoformat() if they do
-                start = form.cleaned_data['start_date']
-                end = form.cleaned_data['end_date']
-    else:
-        # do current by default
-        form = RangeForm()
-        range = 'current'
-        (start, end) = bwp.current()
+    # only the first days are rendered now. the rest are placeholders
+    # the page fills in from aggregate_day as they're scrolled to
+    days = list(context['punch_log'].items())
+    context['first_days'] = mark_safe(''.join(
+        display.render_day(day, shops) for day, shops in days[:AGGREGATE_FIRST_DAYS]))
+    context['later_days'] = [day for day, shops in days[AGGREGATE_FIRST_DAYS:]]
+    context['range_query'] = urlencode({
+        'range': 'custom',
+        'start_date': date.isoformat(start),
+        'end_date': date.isoformat(end)
+    })
 
-    context = services.get_punch_log(
-        request.user.profile.account,
+    context['form'] = form
+    context['more_url'] = _more_url(request)
+    context['range'] = range
+    context['start'] = date.isoformat(start)
+    context['end'] = date.isoformat(end)
+
+    return render(request, 'aggregate.html', context)
+
+
+@lightspeed_bound()
+@cache_control(private=True, no_cache=True)
+@manager_required
+@login_required()
+def aggregate_day(request):
+    '''
+    one day of the punch log table, for the aggregate page to load lazily
+    '''
+    timezone.activate(request.shift_account.timezone)
+
+    bwp = request.shift_account.pay_period
+    form, range, start, end = read_range(request, bwp)
+
+    try:
+        day = date.fromisoformat(request.GET.get('day', ''))
+    except ValueError:
+        raise Http404('No day given.')
+
+    context = services.get_punch_log_day(
+        request.shift_account.account,
+        start_date=start,
+        end_date=end,
+        day=day,
+        deadline=Deadline(settings.REQUEST_DEADLINE_SECONDS)
+    )
+
+    return HttpResponse(display.render_day(context['day'], context['shops']))
+
+
+@lightspeed_bound()
+@manager_required
+@login_required()
+def coverage(request):
+    timezone.activate(request.shift_account.timezone)
+
+    bwp = request.shift_account.pay_period
+    form, range, start, end = read_range(request, bwp, form_class=CoverageForm)
+
+    slot_minutes = 60
+    if form.is_bound and form.is_valid():
+        slot_minutes = form.cleaned_data['slot_minutes']
+
+    context = services.get_staffing_coverage(
+        request.shift_account.account,
+        start_date=start,
+        end_date=end,
+        slot_minutes=slot_minutes
+    )
+
+    context['form'] = form
+    context['range'] = range
+    context['start'] = date.isoformat(start)
+    context['end'] = date.isoformat(end)
+
+    return render(request, 'coverage.html', context)
+
+
+@lightspeed_bound()
+@manager_required
+@login_required()
+def anomalies(request):
+    timezone.activate(request.shift_account.timezone)
+
+    bwp = request.shift_account.pay_period
+    form, range, start, end = read_range(request, bwp)
+
+    context = services.get_anomalies(
+        request.shift_account.account,
         start_date=start,
         end_date=end
     )
@@ -268,13 +393,97 @@ def aggregate(request):
     context['start'] = date.isoformat(start)
     context['end'] = date.isoformat(end)
 
-    return render(request, 'aggregate.html', context)
+    return render(request, 'anomalies.html', context)
 
 
+@lightspeed_bound()
+@cache_control(private=True, no_cache=True)
+@manager_required
+@login_required()
+def trends(request):
+    timezone.activate(request.shift_account.timezone)
+
+    form = TrendForm(request.GET or None)
+    num_periods = 6
+    if form.is_bound and form.is_valid():
+        num_periods = form.cleaned_data['periods']
+
+    context = services.get_trends(
+        request.shift_account.account,
+        num_periods=num_periods,
+        deadline=Deadline(settings.REQUEST_DEADLINE_SECONDS),
+        more='more' in request.GET
+    )
+
+    context['sections'] = [('Shops', context['shops']), ('Employees', context['employees'])]
+    context['sparkline_width'] = trend_report.SPARKLINE_WIDTH
+    context['sparkline_height'] = trend_report.SPARKLINE_HEIGHT
+    context['form'] = form
+    context['more_url'] = _more_url(request)
+
+    return render(request, 'trends.html', context)
+
+
+@lightspeed_bound()
+@cache_control(private=True, no_cache=True)
+@manager_required
+@login_required()
+def dashboard(request):
+    '''
+    current pay period across every account the user manages
+    '''
+    rows = owner_dashboard.collect(owner_dashboard.accounts_for(request.user),
+                                   admitted=request.shift_account.account_id)
 
+    return render(request, 'dashboard.html', {
+        'rows': rows,
+        'totals': owner_dashboard.merge(rows)
+    })
 
 
+@lightspeed_bound()
+@cache_control(private=True, no_cache=True)
+@manager_required
+@login_required()
+def dashboard_account(request):
+    '''
+    one account's dashboard row, for accounts the page rendered without
+    '''
+    accounts = [account for account in owner_dashboard.accounts_for(request.user)
+                if account.account_id == request.GET.get('account')]
+    if not accounts:
+        raise Http404('No such account.')
 
+    [row] = owner_dashboard.collect(accounts, admitted=request.shift_account.account_id)
+    return render(request, 'includes/dashboard_account.html', {'row': row})
 
 
+@manager_required
+@login_required()
+def live(request):
+    '''
+    open shifts per shop as JSON, for dashboards to poll. pass back the
+    cursor from the last response to get only what changed since. not
+    lightspeed_bound: most polls are answered from the board, and its
+    refreshes are already limited to one per LIVE_REFRESH_SECONDS
+    '''
+    return JsonResponse(live_board.on_the_clock(
+        request.shift_account.account,
+        cursor=request.GET.get('cursor')
+    ))
+
 
+@login_required()
+def lightspeed_status(request):
+    '''
+    how this process is sharing Lightspeed calls between accounts: queue
+    depth and wait times per account, the calls every process is making,
+    and how many requests admission control has turned away. staff only
+    '''
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse({
+        'scheduler': scheduler.get_scheduler().stats(),
+        'shared': scheduler.get_scheduler().shared_stats(),
+        'admission': admission.get_controller().stats()
+    })
@@ -50,32 +50,55 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # ETags report pages so unchanged ones come back as 304s
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'timecardsite.middleware.ShiftAccountMiddleware',
+    'timecardsite.middleware.AdmissionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'timesheet.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # compile each template once per process instead of on every render
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'timecardsite.context_processors.shift_account',
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
 
+# which engine renders the punch log and timecard rows: 'django', or
+# 'jinja2' if Jinja2 is installed. the rest of the site stays on django
+ROW_TEMPLATE_ENGINE = env.str('ROW_TEMPLATE_ENGINE', default='django')
+if ROW_TEMPLATE_ENGINE == 'jinja2':
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [],
+        'APP_DIRS': True,
+    })
+
 WSGI_APPLICATION = 'timesheet.wsgi.application'
 
 
@@ -85,9 +108,17 @@ WSGI_APPLICATION = 'timesheet.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, '../database/db.sqlite3')
+        'NAME': os.path.join(BASE_DIR, '../database/db.sqlite3'),
+        # seconds each worker keeps its connection open between requests
+        'CONN_MAX_AGE': env.int('DATABASE_CONN_MAX_AGE', default=60)
     }
 }
+# pragmas run on every new SQLite connection, see timecardsite/db.py.
+# the cache is per connection
+SQLITE_JOURNAL_MODE = env.str('SQLITE_JOURNAL_MODE', default='wal')
+SQLITE_BUSY_TIMEOUT_MS = env.int('SQLITE_BUSY_TIMEOUT_MS', default=5000)
+SQLITE_SYNCHRONOUS = env.str('SQLITE_SYNCHRONOUS', default='normal')
+SQLITE_CACHE_SIZE_KB = env.int('SQLITE_CACHE_SIZE_KB', default=20000)
 
 
 # Authentication & Password validation
@@ -120,6 +151,64 @@ LOGIN_REDIRECT_URL = 'post_login'
 LOGOUT_REDIRECT_URL = 'index'
 INVITATIONS_ACCEPT_INVITE_AFTER_SIGNUP = True
 SITE_ID = 1
+# seconds the non-secret profile and account fields may be served from a
+# signed copy in the session instead of the database. 0 turns it off
+SHIFT_ACCOUNT_SESSION_CACHE_SECONDS = env.int('SHIFT_ACCOUNT_SESSION_CACHE_SECONDS', default=0)
+# the on the clock board asks Lightspeed for changes at most this often,
+# however many dashboards are polling it
+LIVE_REFRESH_SECONDS = env.int('LIVE_REFRESH_SECONDS', default=5)
+# how long an account's shifts for a period are shared between the punch
+# log and every employee's timecard before being fetched again
+SHIFT_CACHE_SECONDS = env.int('SHIFT_CACHE_SECONDS', default=120)
+# past SHIFT_CACHE_SECONDS, reports keep showing the cached shifts (marked
+# "as of" when they were fetched) while fresh ones load in the background.
+# older than this, the page waits for the fetch
+SHIFT_CACHE_STALE_SECONDS = env.int('SHIFT_CACHE_STALE_SECONDS', default=900)
+# how long the shop and employee names are kept for the on the clock board
+# and the alert sync, which look for changes every few seconds. someone new
+# clocking in gets the names fetched again straight away
+NAME_CACHE_SECONDS = env.int('NAME_CACHE_SECONDS', default=600)
+# how long a report may spend fetching from Lightspeed before it shows the
+# shifts it has so far. keep it under the gunicorn timeout
+REQUEST_DEADLINE_SECONDS = env.int('REQUEST_DEADLINE_SECONDS', default=20)
+# warm the period cache on login and when pay periods roll over
+PREFETCH = env.bool('PREFETCH', default=not DEBUG)
+PREFETCH_WORKERS = env.int('PREFETCH_WORKERS', default=4)
+# each web process looks this often for logins other processes took, to
+# warm its own cache for them too
+PREFETCH_LOGIN_POLL_SECONDS = env.int('PREFETCH_LOGIN_POLL_SECONDS', default=2)
+# the owner dashboard fetches this many accounts at once, and gives each
+# one this long before rendering without it
+DASHBOARD_WORKERS = env.int('DASHBOARD_WORKERS', default=8)
+DASHBOARD_ACCOUNT_TIMEOUT_SECONDS = env.int('DASHBOARD_ACCOUNT_TIMEOUT_SECONDS', default=5)
+# sync_alerts worker processes per host, and how long an account claimed
+# by a worker that stops heartbeating stays claimed
+SYNC_WORKERS = env.int('SYNC_WORKERS', default=1)
+SYNC_LEASE_SECONDS = env.int('SYNC_LEASE_SECONDS', default=60)
+# outbound Lightspeed calls made at once, and how many of those one
+# account can have. waiting calls are served fairly by account, in
+# proportion to its weight (1 unless given here as {"account ID": weight})
+LIGHTSPEED_MAX_CONCURRENCY = env.int('LIGHTSPEED_MAX_CONCURRENCY', default=8)
+LIGHTSPEED_ACCOUNT_CONCURRENCY = env.int('LIGHTSPEED_ACCOUNT_CONCURRENCY', default=2)
+LIGHTSPEED_ACCOUNT_WEIGHTS = env.json('LIGHTSPEED_ACCOUNT_WEIGHTS', default={})
+# both limits hold across every process. one that dies mid fetch gives its
+# slot back after this long. fetches with no deadline of their own wait
+# this long for a slot before giving up
+LIGHTSPEED_SLOT_SECONDS = env.int('LIGHTSPEED_SLOT_SECONDS', default=120)
+LIGHTSPEED_SLOT_WAIT_SECONDS = env.int('LIGHTSPEED_SLOT_WAIT_SECONDS', default=30)
+# Lightspeed bound requests each web process runs at once, overall and per
+# account (0 for no limit). past them requests get cached data or a busy
+# page asking them to retry after ADMISSION_RETRY_AFTER_SECONDS
+ADMISSION_MAX_INFLIGHT = env.int('ADMISSION_MAX_INFLIGHT', default=16)
+ADMISSION_ACCOUNT_MAX_INFLIGHT = env.int('ADMISSION_ACCOUNT_MAX_INFLIGHT', default=4)
+ADMISSION_RETRY_AFTER_SECONDS = env.int('ADMISSION_RETRY_AFTER_SECONDS', default=5)
+# run_workers threads per process, how long a worker holds a task before
+# another may take it, the wait before a first retry (doubling after
+# that), and how often idle workers look for new tasks
+TASK_WORKERS = env.int('TASK_WORKERS', default=2)
+TASK_TIMEOUT_SECONDS = env.int('TASK_TIMEOUT_SECONDS', default=300)
+TASK_RETRY_BACKOFF_SECONDS = env.int('TASK_RETRY_BACKOFF_SECONDS', default=30)
+TASK_POLL_SECONDS = env.int('TASK_POLL_SECONDS', default=1)
 ACCOUNT_SESSION_REMEMBER=True
 ACCOUNT_EMAIL_VERIFICATION="none"
 
@@ -14,7 +14,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.urls import path, include, re_path
-from timecardsite import views
+from timecardsite import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -27,7 +27,18 @@ urlpatterns = [
 
     path('timecard/', views.timecard, name='timecard'),
     path('aggregate/', views.aggregate, name='aggregate'),
+    path('aggregate/day/', views.aggregate_day, name='aggregate_day'),
+    path('coverage/', views.coverage, name='coverage'),
+    path('anomalies/', views.anomalies, name='anomalies'),
+    path('trends/', views.trends, name='trends'),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/account/', views.dashboard_account, name='dashboard_account'),
+    path('live/', views.live, name='live'),
+
+    path('api/v1/punch-log', api.punch_log, name='api_punch_log'),
+    path('api/v1/timecard', api.timecard, name='api_timecard'),
     path('invite/', views.invite, name='invite'),
+    path('status/lightspeed/', views.lightspeed_status, name='lightspeed_status'),
 
     re_path(r'^invitations/', include('invitations.urls', namespace='invitations')),
     path('accounts/', include('allauth.urls')),
@@ -12,3 +12,10 @@ import os
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'timesheet.settings.base')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+
+if settings.PREFETCH:
+    # only web processes need their caches warmed. each warms its own, see prefetch.py
+    from timecardsite import prefetch
+    prefetch.start_prefetch_thread()